@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare looping over the single-item delete routes with the bulk routes.
+
+For each size N, N contacts and N subscribers are seeded, then deleted
+three ways through the ASGI app: one DELETE per item, one bulk request
+listing every key, and one bulk request by filter. Each pass is checked to
+have removed everything before it is timed.
+
+    python benchmarks/bulk_delete_benchmark.py --items 100 1000
+    python benchmarks/bulk_delete_benchmark.py --items 10000 --mongo-url mongodb://localhost:27017
+
+Runs against mongomock unless ``--mongo-url`` is given; mongomock numbers
+only show the per-request overhead saved, not Mongo's own batching.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SEED_START = datetime(2020, 1, 1)
+CUTOFF = datetime(2030, 1, 1)
+
+
+async def seed(db, n: int):
+    contacts, subscribers = [], []
+    for i in range(n):
+        ts = SEED_START + timedelta(seconds=i)
+        contacts.append({"id": str(uuid.uuid4()), "name": f"Lead {i}", "email": f"lead{i}@example.com",
+                         "phone": None, "service": "seo", "budget": None,
+                         "message": "Bulk delete benchmark row.", "created_at": ts})
+        subscribers.append({"id": str(uuid.uuid4()), "email": f"sub{i}@example.com", "subscribed_at": ts})
+    await db.contacts.insert_many(contacts)
+    await db.newsletters.insert_many(subscribers)
+    return [c["id"] for c in contacts], [s["email"] for s in subscribers]
+
+
+async def looped(client, ids, emails):
+    for contact_id in ids:
+        await client.delete(f"/api/contact/{contact_id}")
+    for email in emails:
+        await client.delete(f"/api/newsletter/{email}")
+
+
+async def by_keys(client, ids, emails):
+    await client.post("/api/contact/bulk-delete", json={"ids": ids})
+    await client.post("/api/newsletter/bulk-unsubscribe", json={"emails": emails})
+
+
+async def by_filter(client, ids, emails):
+    await client.post("/api/contact/bulk-delete", json={"created_before": CUTOFF.isoformat()})
+    await client.post("/api/newsletter/bulk-unsubscribe", json={"subscribed_before": CUTOFF.isoformat()})
+
+
+async def run(args) -> list:
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        mongo = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        mongo = AsyncMongoMockClient()
+    server.database.use(mongo[args.db])
+
+    results = []
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for n in args.items:
+                row = {"items": n}
+                for name, fn in (("loop", looped), ("keys", by_keys), ("filter", by_filter)):
+                    for collection in ("contacts", "newsletters"):
+                        await server.db[collection].delete_many({})
+                    ids, emails = await seed(server.db, n)
+                    started = time.perf_counter()
+                    await fn(client, ids, emails)
+                    row[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    left = sum([await server.db[c].count_documents({}) for c in ("contacts", "newsletters")])
+                    if left:
+                        raise SystemExit(f"{name} left {left} documents at {n} items")
+                row["keys_speedup"] = round(row["loop_ms"] / row["keys_ms"], 1)
+                row["filter_speedup"] = round(row["loop_ms"] / row["filter_ms"], 1)
+                results.append(row)
+                print(json.dumps(row))
+    if args.mongo_url:
+        await mongo.drop_database(args.db)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--mongo-url", help="use a real mongod instead of mongomock")
+    parser.add_argument("--db", default="impacts_bulk_delete_bench", help="scratch database, dropped afterwards")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Storage, index size and working set of contacts in the full and the compact layout.
+
+The same ``--contacts`` documents are seeded into two scratch collections
+on a mongod (``MONGO_URL``). One uses the full layout with ``INDEXES``. The
+other goes through :class:`CompactCollection` with the translated indexes.
+The script then reports ``collStats`` for both: data size, average document
+size, on-disk storage, total and per-index size. It also reports the working
+set, meaning uncompressed data plus indexes, which is what has to fit in the
+WiredTiger cache for reads to stay off disk.
+
+    python benchmarks/compact_storage_benchmark.py --contacts 10000000
+    python benchmarks/compact_storage_benchmark.py --estimate --contacts 10000000
+
+``--estimate`` needs no mongod. It BSON-encodes a sample in both layouts
+and extrapolates document bytes to ``--contacts``. It does not estimate
+indexes, whose size depends on WiredTiger prefix compression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bson  # noqa: E402
+
+from compact import CompactCollection  # noqa: E402
+from indexes import INDEXES  # noqa: E402
+from server import CONTACT_CODEC, BudgetRange, ServiceType  # noqa: E402
+
+MESSAGES = [
+    "We are looking to improve our search rankings over the next quarter.",
+    "Interested in a paid social campaign for a product launch in spring, budget flexible.",
+    "Can you help with our Meta ads? Current cost per lead is too high and we need a plan.",
+    "Please call me back about SEO for our three local stores.",
+]
+
+
+def contacts(count: int, seed: int = 7) -> Iterator[dict]:
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    services = [s.value for s in ServiceType]
+    budgets = [None] + [b.value for b in BudgetRange]
+    for i in range(count):
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "phone": f"+1 555 {i % 10_000_000:07d}" if rng.random() < 0.4 else None,
+            "service": rng.choice(services),
+            "budget": rng.choice(budgets),
+            "message": rng.choice(MESSAGES),
+            "created_at": start + timedelta(seconds=i * 3),
+        }
+
+
+def estimate(count: int, sample: int) -> dict:
+    full = compact = 0
+    for doc in contacts(sample):
+        full += len(bson.encode({"_id": bson.ObjectId(), **doc}))
+        compact += len(bson.encode(CONTACT_CODEC.encode(doc)))
+    return {
+        "contacts": count,
+        "sample": sample,
+        "full_avg_doc_bytes": round(full / sample, 1),
+        "compact_avg_doc_bytes": round(compact / sample, 1),
+        "full_data_mb": round(full / sample * count / 2**20, 1),
+        "compact_data_mb": round(compact / sample * count / 2**20, 1),
+        "reduction_pct": round(100 * (1 - compact / full), 1),
+    }
+
+
+async def seed(collection, count: int, batch_size: int, concurrency: int) -> float:
+    started = time.perf_counter()
+    source = contacts(count)
+    lock = asyncio.Lock()
+
+    async def worker():
+        while True:
+            async with lock:
+                batch = [doc for _, doc in zip(range(batch_size), source)]
+            if not batch:
+                return
+            await collection.insert_many(batch, ordered=False)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def measure(args) -> List[dict]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[args.db]
+    report = []
+    try:
+        for layout in ("full", "compact"):
+            name = f"contacts_{layout}"
+            await db.drop_collection(name)
+            collection = db[name] if layout == "full" else CompactCollection(db[name], CONTACT_CODEC)
+            await collection.create_indexes(INDEXES["contacts"])
+            seconds = await seed(collection, args.contacts, args.batch_size, args.concurrency)
+            stats = await db.command("collStats", name, scale=1)
+            report.append({
+                "layout": layout,
+                "contacts": stats["count"],
+                "seed_seconds": round(seconds, 1),
+                "avg_doc_bytes": stats.get("avgObjSize"),
+                "data_mb": round(stats["size"] / 2**20, 1),
+                "storage_mb": round(stats["storageSize"] / 2**20, 1),
+                "index_mb": round(stats["totalIndexSize"] / 2**20, 1),
+                "working_set_mb": round((stats["size"] + stats["totalIndexSize"]) / 2**20, 1),
+                "indexes_mb": {k: round(v / 2**20, 1) for k, v in stats["indexSizes"].items()},
+            })
+            print(json.dumps(report[-1]))
+        full, compact = report
+        for field in ("data_mb", "storage_mb", "index_mb", "working_set_mb"):
+            print(f"{field}: {full[field]} -> {compact[field]} "
+                  f"({100 * (1 - compact[field] / full[field]):.1f}% smaller)")
+        if not args.keep:
+            for layout in ("full", "compact"):
+                await db.drop_collection(f"contacts_{layout}")
+    finally:
+        client.close()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--estimate", action="store_true", help="extrapolate document sizes without a mongod")
+    parser.add_argument("--sample", type=int, default=10_000, help="documents encoded for --estimate")
+    parser.add_argument("--db", default="impacts_compact_benchmark")
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--keep", action="store_true", help="leave the seeded collections in place")
+    args = parser.parse_args()
+    if args.estimate:
+        print(json.dumps(estimate(args.contacts, args.sample), indent=2))
+        return
+    asyncio.run(measure(args))
+
+
+if __name__ == "__main__":
+    main()
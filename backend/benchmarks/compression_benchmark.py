@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Wire size and CPU cost of response compression for admin list payloads.
+
+Builds ``GET /api/contact``-shaped JSON pages (contacts with long
+``message`` fields) of several sizes and compresses each with every
+installed encoding at a range of levels. Reports the compressed size, the
+ratio, and the CPU time per response. That CPU time is paid once per
+cached list response: repeat polls reuse the cached compressed bytes.
+
+    python benchmarks/compression_benchmark.py --rows 10 100 1000
+    python benchmarks/compression_benchmark.py --rows 1000 --levels gzip=1,6,9 zstd=1,3,10
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compression import ENCODINGS, _compress  # noqa: E402
+
+DEFAULT_LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 10]}
+WORDS = ["marketing", "growth", "campaign", "budget", "brand", "launch", "audit", "content", "social",
+         "we", "need", "help", "with", "our", "online", "presence", "and", "the", "next", "quarter"]
+
+
+def page(rows: int) -> bytes:
+    rng = random.Random(rows)
+    start = datetime(2024, 1, 1)
+    docs = [{
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "name": f"Lead {i}",
+        "email": f"lead{i}@example.com",
+        "phone": "+1 555 0100" if i % 2 else None,
+        "service": rng.choice(["seo", "meta", "social", "all"]),
+        "budget": rng.choice(["1k-3k", "3k-5k", "5k-10k", "10k+", None]),
+        "message": " ".join(rng.choices(WORDS, k=300))[:2000],
+        "created_at": (start + timedelta(minutes=i)).isoformat(),
+    } for i in range(rows)]
+    return json.dumps(docs, separators=(",", ":")).encode()
+
+
+def per_call(fn, budget: float = 0.5) -> float:
+    """Seconds per call, repeating ``fn`` for about ``budget`` seconds."""
+    calls, started = 0, time.process_time()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.process_time() - started
+        if elapsed >= budget:
+            return elapsed / calls
+
+
+def parse_levels(specs: List[str]) -> Dict[str, List[int]]:
+    levels = {}
+    for spec in specs:
+        encoding, _, values = spec.partition("=")
+        levels[encoding] = [int(v) for v in values.split(",")]
+    return levels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--levels", nargs="+", help="encoding=level,level,... (default: a low, default and high level)")
+    args = parser.parse_args()
+
+    levels = parse_levels(args.levels) if args.levels else DEFAULT_LEVELS
+    for rows in args.rows:
+        body = page(rows)
+        for encoding in ENCODINGS:
+            for level in levels.get(encoding, []):
+                compressed = _compress(body, encoding, level)
+                print(json.dumps({
+                    "rows": rows,
+                    "encoding": encoding,
+                    "level": level,
+                    "plain_bytes": len(body),
+                    "wire_bytes": len(compressed),
+                    "ratio": round(len(body) / len(compressed), 1),
+                    "compress_us": round(per_call(lambda: _compress(body, encoding, level)) * 1e6, 1),
+                }))
+
+
+if __name__ == "__main__":
+    main()
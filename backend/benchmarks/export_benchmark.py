@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Benchmark the streaming export endpoints against a real mongod.
+
+Seeds a scratch database with N contacts and subscribers, starts the API
+under uvicorn in a subprocess, streams each export and reports
+time-to-first-byte, total time, bytes sent and the server's peak RSS.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/export_benchmark.py --docs 1000000
+
+The scratch database (``--db``) is dropped before seeding and after the run.
+Peak RSS is read from /proc, so the RSS column is Linux-only.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SEED_BATCH = 10_000
+
+
+def _rss_kb(pid: int, key: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+async def seed(db, docs: int) -> None:
+    start = datetime(2020, 1, 1)
+    for collection in ("contacts", "newsletters"):
+        await db[collection].drop()
+    for offset in range(0, docs, SEED_BATCH):
+        count = min(SEED_BATCH, docs - offset)
+        contacts, subscribers = [], []
+        for i in range(offset, offset + count):
+            ts = start + timedelta(seconds=i)
+            contacts.append({
+                "id": str(uuid.uuid4()), "name": f"Lead {i}", "email": f"lead{i}@example.com",
+                "phone": None, "service": "seo", "budget": "3k-5k",
+                "message": "Interested in a full SEO audit for our store. " * 4,
+                "created_at": ts,
+            })
+            subscribers.append({"id": str(uuid.uuid4()), "email": f"sub{i}@example.com", "subscribed_at": ts})
+        await db.contacts.insert_many(contacts, ordered=False)
+        await db.newsletters.insert_many(subscribers, ordered=False)
+
+
+async def measure(base_url: str, path: str, pid: int) -> dict:
+    rss_before = _rss_kb(pid, "VmRSS")
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    async with httpx.AsyncClient(timeout=None) as client:
+        async with client.stream("GET", base_url + path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                size += len(chunk)
+    return {
+        "path": path,
+        "ttfb_ms": round((ttfb or 0) * 1000, 2),
+        "total_s": round(time.perf_counter() - started, 3),
+        "bytes": size,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": _rss_kb(pid, "VmHWM"),
+    }
+
+
+async def wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                if (await client.get(base_url + "/api/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--db", default="impacts_export_bench")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[args.db]
+    if not args.skip_seed:
+        print(f"seeding {args.docs} documents per collection...", file=sys.stderr)
+        await seed(db, args.docs)
+
+    env = {**os.environ, "MONGO_URL": mongo_url, "DB_NAME": args.db}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        await wait_ready(base_url)
+        for path in (
+            "/api/contact/export",
+            "/api/contact/export?format=csv",
+            "/api/newsletter/export",
+            "/api/newsletter/export?format=csv",
+        ):
+            result = await measure(base_url, path, server.pid)
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=30)
+        if not args.skip_seed:
+            await client.drop_database(args.db)
+        client.close()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"docs": args.docs, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
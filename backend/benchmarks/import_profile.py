@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Import-time profile of ``server`` and cold-start time to the first HTTP answer.
+
+Each run imports ``server`` in a fresh interpreter under ``python -X
+importtime``. The script reports the median wall time of the import, with
+the cost of an empty interpreter subtracted, and each top-level package's
+share of it. The share is the summed self time of the package and its
+submodules, so the list shows what the import is spent on.
+
+``--cold-start`` also starts ``uvicorn server:app`` with ``MONGO_URL``
+pointing at a closed port, as an autoscaled worker would see a Mongo that
+is not reachable yet. It times how long until the worker answers
+``GET /api/health`` with any status.
+
+``--baseline REV`` measures a git revision the same way, in a temporary
+worktree, and prints before/after numbers side by side:
+
+    python benchmarks/import_profile.py --runs 7 --top 20
+    python benchmarks/import_profile.py --baseline HEAD~1 --cold-start
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND = Path(__file__).resolve().parent.parent
+_ROW = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env() -> Dict[str, str]:
+    # Enough configuration to import and start; nothing listens on port 1
+    return {**os.environ, "MONGO_URL": "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=2000",
+            "DB_NAME": "impacts_import_profile", "PYTHONDONTWRITEBYTECODE": "0"}
+
+
+def _run(cwd: Path, code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(args, cwd=cwd, env=_env(), capture_output=True, text=True)
+
+
+def profile_imports(backend: Path, runs: int) -> dict:
+    """Median import wall time and per-package self time for ``import server`` in ``backend``."""
+    _run(backend, "import server")  # compile and cache bytecode first
+    empty, walls = [], []
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(runs):
+        started = time.perf_counter()
+        _run(backend, "pass")
+        empty.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        result = _run(backend, "import server", importtime=True)
+        walls.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            raise SystemExit(f"import server failed in {backend}:\n{result.stderr[-2000:]}")
+        totals: Dict[str, float] = defaultdict(float)
+        for line in result.stderr.splitlines():
+            match = _ROW.match(line)
+            if match:
+                totals[match.group(4).split(".")[0]] += int(match.group(1)) / 1000
+        for name, ms in totals.items():
+            packages[name].append(ms)
+    return {
+        "import_ms": round((statistics.median(walls) - statistics.median(empty)) * 1000, 1),
+        "interpreter_ms": round(statistics.median(empty) * 1000, 1),
+        "packages_ms": {name: round(statistics.median(v + [0.0] * (runs - len(v))), 2)
+                        for name, v in packages.items()},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cold_start(backend: Path, timeout: float) -> Optional[float]:
+    """Seconds from spawning a worker until it answers /api/health, or None within ``timeout``."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                return None
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1)
+                return time.perf_counter() - started
+            except urllib.error.HTTPError:
+                # Any status means the worker is serving
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def measure(backend: Path, args) -> dict:
+    report = profile_imports(backend, args.runs)
+    if args.cold_start:
+        seconds = cold_start(backend, args.timeout)
+        report["cold_start_s"] = None if seconds is None else round(seconds, 3)
+    return report
+
+
+def _print_report(label: str, report: dict, top: int) -> None:
+    cold = report.get("cold_start_s", "n/a")
+    print(f"{label}: import server {report['import_ms']} ms "
+          f"(interpreter {report['interpreter_ms']} ms), first answer with Mongo down: {cold}")
+    for name, ms in sorted(report["packages_ms"].items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {ms:9.2f} ms  {name}")
+
+
+def _print_comparison(before: dict, after: dict, top: int) -> None:
+    print(f"import server: {before['import_ms']} ms -> {after['import_ms']} ms "
+          f"({after['import_ms'] - before['import_ms']:+.1f} ms)")
+    if "cold_start_s" in after:
+        print(f"first answer with Mongo down: {before.get('cold_start_s')} s -> {after.get('cold_start_s')} s "
+              "(None: no answer before --timeout)")
+    names = set(before["packages_ms"]) | set(after["packages_ms"])
+    rows = sorted(names, key=lambda n: -abs(after["packages_ms"].get(n, 0) - before["packages_ms"].get(n, 0)))
+    print(f"  {'before':>9}  {'after':>9}  {'delta':>9}  package")
+    for name in rows[:top]:
+        b, a = before["packages_ms"].get(name, 0.0), after["packages_ms"].get(name, 0.0)
+        print(f"  {b:9.2f}  {a:9.2f}  {a - b:+9.2f}  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="packages to list")
+    parser.add_argument("--cold-start", action="store_true", help="also time a worker to its first HTTP answer")
+    parser.add_argument("--timeout", type=float, default=45.0, help="seconds to wait for the cold-started worker")
+    parser.add_argument("--baseline", metavar="REV", help="git revision to compare against")
+    parser.add_argument("--json", action="store_true", help="print the raw reports as JSON")
+    args = parser.parse_args()
+
+    after = measure(BACKEND, args)
+    if not args.baseline:
+        if args.json:
+            print(json.dumps(after, indent=2))
+        else:
+            _print_report("current tree", after, args.top)
+        return
+
+    repo = BACKEND.parent
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "baseline"
+        subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.baseline],
+                       cwd=repo, check=True, capture_output=True)
+        try:
+            before = measure(worktree / BACKEND.name, args)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=repo, capture_output=True)
+    if args.json:
+        print(json.dumps({"baseline": args.baseline, "before": before, "after": after}, indent=2))
+        return
+    _print_report(f"before ({args.baseline})", before, args.top)
+    _print_report("after", after, args.top)
+    _print_comparison(before, after, args.top)
+
+
+if __name__ == "__main__":
+    main()
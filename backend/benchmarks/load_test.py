@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Reproducible load test for every route in ``server.api_router``.
+
+The app is booted in-process (startup and shutdown hooks included) and
+driven through ``httpx.ASGITransport``, so no network or remote preview URL
+is involved. Storage is the in-process engine from ``embedded.py`` (default,
+no services needed), ``mongomock-motor`` with ``--engine mongomock``, or a
+real mongod given with ``--mongo-url``.
+
+    python benchmarks/load_test.py --dataset 1k --concurrency 32 --output results.json
+    python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 --dataset 100k
+    python benchmarks/load_test.py --compare before.json after.json
+
+Each endpoint gets ``--requests`` calls from ``--concurrency`` workers and is
+reported with throughput and p50/p95/p99 latency. Results are written as
+JSON so runs from different commits can be diffed with ``--compare``.
+Every route must have a scenario below; the run aborts if one is missing.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+from status_rollup import rollup  # noqa: E402
+
+DATASETS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEED_BATCH = 10_000
+SERVICES = ["seo", "meta", "social", "all"]
+BUDGETS = ["1k-3k", "3k-5k", "5k-10k", "10k+", None]
+SEED_START = datetime(2020, 1, 1)
+# Long enough that a real mongod's TTL monitor keeps the (old) seeded pings
+SEED_RETENTION = timedelta(days=3650)
+
+
+class Dataset:
+    """Ids and emails the scenarios draw from, plus pools consumed by deletes."""
+
+    def __init__(self):
+        self.contact_ids: List[str] = []
+        self.deletable_contact_ids: List[str] = []
+        self.deletable_emails: List[str] = []
+        self.newest: datetime = SEED_START
+        self.counter = itertools.count()
+
+
+def contact_doc(i: int, created_at: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Lead {i}",
+        "email": f"lead{i}@example.com",
+        "phone": "+1 555 0100" if i % 2 else None,
+        "service": SERVICES[i % len(SERVICES)],
+        "budget": BUDGETS[i % len(BUDGETS)],
+        "message": "We would like help growing our online presence. " * (1 + i % 8),
+        "created_at": created_at,
+    }
+
+
+async def seed(db, size: int, deletable: int) -> Dataset:
+    data = Dataset()
+    for name in ("contacts", "newsletters", "status_checks", "status_clients"):
+        await db[name].delete_many({})
+    total = size + deletable
+    pings = []
+    for offset in range(0, total, SEED_BATCH):
+        contacts, subscribers = [], []
+        for i in range(offset, min(total, offset + SEED_BATCH)):
+            ts = SEED_START + timedelta(seconds=i)
+            doc = contact_doc(i, ts)
+            contacts.append(doc)
+            subscribers.append({"id": str(uuid.uuid4()), "email": f"sub{i}@example.com", "subscribed_at": ts})
+            if i < size:
+                pings.append({"id": str(uuid.uuid4()), "client_name": f"client-{i % 50}", "timestamp": ts})
+            if i >= size:
+                data.deletable_contact_ids.append(doc["id"])
+                data.deletable_emails.append(f"sub{i}@example.com")
+            elif len(data.contact_ids) < 10_000:
+                data.contact_ids.append(doc["id"])
+            data.newest = ts
+        await db.contacts.insert_many(contacts, ordered=False)
+        await db.newsletters.insert_many(subscribers, ordered=False)
+    # Rolled up in one go so no minute bucket is split across seed batches
+    buckets, clients = rollup(pings, SEED_RETENTION)
+    for offset in range(0, len(buckets), SEED_BATCH):
+        await db.status_checks.insert_many(buckets[offset:offset + SEED_BATCH], ordered=False)
+    await db.status_clients.insert_many(clients, ordered=False)
+    return data
+
+
+def scenarios(data: Dataset) -> Dict[Tuple[str, str], Callable[[], dict]]:
+    """One request factory per (method, route path)."""
+    recent = (data.newest - timedelta(minutes=5)).isoformat()
+
+    def new_contact():
+        i = next(data.counter)
+        return {"json": {
+            "name": f"Load {i}", "email": f"load{i}@example.com", "service": random.choice(SERVICES),
+            "budget": "3k-5k", "message": "Load test submission, please ignore. " * 3,
+        }}
+
+    def pop(pool: List[str]) -> str:
+        return pool.pop() if pool else "missing"
+
+    def pop_many(pool: List[str], n: int = 10) -> List[str]:
+        return [pop(pool) for _ in range(n)]
+
+    return {
+        ("GET", "/api/"): lambda: {"url": "/api/"},
+        ("GET", "/api/health"): lambda: {"url": "/api/health"},
+        ("GET", "/api/ready"): lambda: {"url": "/api/ready"},
+        ("POST", "/api/contact"): lambda: {"url": "/api/contact", **new_contact()},
+        ("GET", "/api/contact"): lambda: {"url": "/api/contact", "params": {"limit": 100}},
+        ("GET", "/api/contact/export"): lambda: {"url": "/api/contact/export", "params": {"since": recent}},
+        ("GET", "/api/contact/stats"): lambda: {
+            "url": "/api/contact/stats", "params": {"since": SEED_START.isoformat(), "until": data.newest.isoformat(), "bucket": "day"}},
+        ("GET", "/api/contact/{contact_id}"): lambda: {"url": f"/api/contact/{random.choice(data.contact_ids)}"},
+        ("DELETE", "/api/contact/{contact_id}"): lambda: {"url": f"/api/contact/{pop(data.deletable_contact_ids)}"},
+        ("POST", "/api/contact/bulk-delete"): lambda: {
+            "url": "/api/contact/bulk-delete", "json": {"ids": pop_many(data.deletable_contact_ids)}},
+        ("POST", "/api/newsletter"): lambda: {"url": "/api/newsletter", "json": {"email": f"nl{next(data.counter)}@example.com"}},
+        ("POST", "/api/newsletter/bulk"): lambda: {
+            "url": "/api/newsletter/bulk", "params": {"format": "csv"},
+            "content": "email\n" + "\n".join(f"bulk{next(data.counter)}@example.com" for _ in range(100)),
+        },
+        ("GET", "/api/newsletter"): lambda: {"url": "/api/newsletter", "params": {"limit": 100}},
+        ("GET", "/api/newsletter/export"): lambda: {"url": "/api/newsletter/export", "params": {"since": recent}},
+        ("DELETE", "/api/newsletter/{email}"): lambda: {"url": f"/api/newsletter/{pop(data.deletable_emails)}"},
+        ("POST", "/api/newsletter/bulk-unsubscribe"): lambda: {
+            "url": "/api/newsletter/bulk-unsubscribe", "json": {"emails": pop_many(data.deletable_emails)}},
+        ("POST", "/api/status"): lambda: {"url": "/api/status", "json": {"client_name": f"client-{random.randrange(50)}"}},
+        ("GET", "/api/status"): lambda: {"url": "/api/status"},
+        ("GET", "/api/status/history"): lambda: {
+            "url": "/api/status/history",
+            "params": {"client_name": f"client-{random.randrange(50)}", "until": data.newest.isoformat(), "resolution": "hour"}},
+        ("GET", "/api/cache/stats"): lambda: {"url": "/api/cache/stats"},
+    }
+
+
+def api_routes(router) -> List[Tuple[str, str]]:
+    routes = []
+    for route in router.routes:
+        for method in sorted(route.methods - {"HEAD", "OPTIONS"}):
+            routes.append((method, route.path))
+    return routes
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def drive(client: httpx.AsyncClient, method: str, factory: Callable[[], dict], requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            kwargs = factory()
+            started = time.perf_counter()
+            response = await client.request(method, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    errors = sum(n for code, n in statuses.items() if int(code) >= 500)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "status": statuses,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    # Every request comes from one client; measure the routes, not the abuse limiter
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        mongo = AsyncIOMotorClient(args.mongo_url)
+        server.database.use(mongo[args.db])
+    elif args.engine == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.database.use(AsyncMongoMockClient()[args.db])
+    else:
+        from embedded import EmbeddedDatabase
+
+        server.database.use(EmbeddedDatabase(args.db))
+    if args.cache:
+        server.cache = server.build_cache(args.cache, server.CACHE_TTL_SECONDS, server.CACHE_MAX_ENTRIES, os.environ.get("REDIS_URL"))
+
+    routes = api_routes(server.api_router)
+    size = DATASETS[args.dataset]
+    print(f"seeding {size} documents per collection...", file=sys.stderr)
+    data = await seed(server.db, size, deletable=(args.requests + args.warmup) * 11)
+    factories = scenarios(data)
+    missing = [f"{m} {p}" for m, p in routes if (m, p) not in factories]
+    if missing:
+        raise SystemExit(f"no load scenario for: {', '.join(missing)}")
+    selected = [r for r in routes if not args.only or any(s in f"{r[0]} {r[1]}" for s in args.only)]
+
+    results = {}
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for method, path in selected:
+                factory = factories[(method, path)]
+                for _ in range(args.warmup):
+                    await client.request(method, **factory())
+                result = await drive(client, method, factory, args.requests, args.concurrency)
+                results[f"{method} {path}"] = result
+                print(f"{method:6} {path:32} {result['rps']:>9} rps  p50 {result['p50_ms']:>8}ms  "
+                      f"p95 {result['p95_ms']:>8}ms  p99 {result['p99_ms']:>8}ms  {result['status']}", file=sys.stderr)
+    if args.mongo_url:
+        await mongo.drop_database(args.db)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "mongo": "mongod" if args.mongo_url else args.engine,
+            "dataset": args.dataset,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cache": args.cache or server.CACHE_BACKEND,
+        },
+        "endpoints": results,
+    }
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as fh:
+        before = json.load(fh)
+    with open(after_path) as fh:
+        after = json.load(fh)
+    print(f"{'endpoint':40} {'rps':>16} {'p50 ms':>16} {'p99 ms':>16}")
+    for name, new in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if old is None:
+            print(f"{name:40} (new)")
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{new[key]:>9} {change:+5.0f}%")
+        print(f"{name:40} " + " ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="1k")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--engine", choices=["embedded", "mongomock"], default="embedded",
+                        help="in-process storage when --mongo-url is not given")
+    parser.add_argument("--mongo-url", help="use a real mongod instead of an in-process engine")
+    parser.add_argument("--db", default="impacts_load_test", help="scratch database, dropped afterwards")
+    parser.add_argument("--cache", choices=["memory", "redis", "none"], help="override CACHE_BACKEND")
+    parser.add_argument("--only", nargs="+", help="only run endpoints containing one of these strings")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
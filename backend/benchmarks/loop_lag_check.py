@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Event-loop lag with list serialization on the loop and in a worker thread.
+
+A :class:`LoopMonitor` samples lag while ``--lists`` contact lists of
+``--rows`` rows are encoded back to back. This is run twice, once with
+``dump_documents`` on the loop and once with ``dump_documents_async``. The
+report gives p50/p99/max lag for both. The script also holds the loop with
+a deliberate ``time.sleep`` and checks that debug mode logged a stack
+naming it.
+
+    python benchmarks/loop_lag_check.py --rows 1000 --lists 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import loop_monitor  # noqa: E402
+from loop_monitor import LoopMonitor  # noqa: E402
+from serializers import dump_documents, dump_documents_async  # noqa: E402
+from server import Contact  # noqa: E402
+
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages: List[str] = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def contacts(rows: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [{
+        "id": str(uuid.uuid4()), "name": f"Lead {i}", "email": f"lead{i}@example.com", "phone": None,
+        "service": "seo", "budget": "3k-5k",
+        "message": "We would like help growing our online presence. " * 4,
+        "created_at": now - timedelta(seconds=i),
+    } for i in range(rows)]
+
+
+def lag_summary(samples: List[float]) -> dict:
+    samples = sorted(samples) or [0.0]
+    pick = lambda pct: round(samples[min(len(samples) - 1, int(len(samples) * pct / 100))] * 1000, 3)  # noqa: E731
+    return {"samples": len(samples), "p50_ms": pick(50), "p99_ms": pick(99), "max_ms": round(samples[-1] * 1000, 3)}
+
+
+async def measure(docs: List[dict], lists: int, offload: bool, interval: float) -> dict:
+    samples: List[float] = []
+    observe = loop_monitor.LOOP_LAG_SECONDS.observe
+    loop_monitor.LOOP_LAG_SECONDS.observe = lambda value, *labels: samples.append(value)
+    monitor = LoopMonitor(interval=interval)
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        for _ in range(lists):
+            if offload:
+                await dump_documents_async(docs, Contact, offload_rows=1)
+            else:
+                dump_documents(docs, Contact)
+            await asyncio.sleep(0)
+        # Let the sampler run a few more times so the final stall is recorded
+        await asyncio.sleep(interval * 3)
+    finally:
+        await monitor.stop()
+        loop_monitor.LOOP_LAG_SECONDS.observe = observe
+    return {"mode": "thread" if offload else "loop", "seconds": round(time.perf_counter() - started, 3),
+            **lag_summary(samples)}
+
+
+def hold_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def detect_block(threshold: float) -> bool:
+    captured = Captured()
+    logging.getLogger("loop_monitor").addHandler(captured)
+    monitor = LoopMonitor(interval=0.01, block_threshold=threshold)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    hold_the_loop(threshold * 4)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+    logging.getLogger("loop_monitor").removeHandler(captured)
+    return len(captured.messages) == 1 and "hold_the_loop" in captured.messages[0]
+
+
+async def run(args) -> int:
+    docs = contacts(args.rows)
+    report = [await measure(docs, args.lists, offload, args.interval / 1000) for offload in (False, True)]
+    for row in report:
+        print(json.dumps({"rows": args.rows, "lists": args.lists, **row}))
+    detected = await detect_block(args.threshold / 1000)
+    print(json.dumps({"blocking_call_logged": detected}))
+    return 0 if detected else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--lists", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=5.0, help="lag sampling interval in ms")
+    parser.add_argument("--threshold", type=float, default=50.0, help="blocking threshold in ms for the debug check")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Deliver lead notifications to a local webhook stand-in and check nothing is lost.
+
+The app is booted in-process on the embedded engine. A stdlib HTTP server on
+localhost plays the webhook and answers the first ``--fail`` requests with
+503, so the retry path is exercised too. The script then:
+
+1. posts ``--requests`` contacts and subscribers with notifications off and
+   with them on, and reports POST latency for both, so any cost added to the
+   request path shows up;
+2. waits until the stand-in has received an event for every insert, and
+   reports delivery lag, batches, retries and duplicate deliveries.
+
+    python benchmarks/notification_check.py --requests 2000 --fail 3
+
+Exits non-zero if an event is missing after ``--timeout`` seconds.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+
+class StandIn:
+    """Records every event POSTed to it; fails the first ``fail`` requests with 503."""
+
+    def __init__(self, fail: int):
+        self.fail = fail
+        self.requests = 0
+        self.batches = 0
+        self.received: Dict[str, float] = {}
+        self.duplicates = 0
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    failing = stand_in.requests <= stand_in.fail
+                    if not failing:
+                        stand_in.batches += 1
+                        now = time.monotonic()
+                        for event in json.loads(body)["events"]:
+                            if event["id"] in stand_in.received:
+                                stand_in.duplicates += 1
+                            stand_in.received.setdefault(event["id"], now)
+                self.send_response(503 if failing else 204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+async def post_all(client: httpx.AsyncClient, run: str, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for i in remaining:
+            if i % 2:
+                kwargs = {"url": "/api/newsletter", "json": {"email": f"{run}-sub{i}@example.com"}}
+            else:
+                kwargs = {"url": "/api/contact", "json": {
+                    "name": f"Lead {i}", "email": f"{run}-lead{i}@example.com", "service": "seo",
+                    "message": "Please get in touch about a campaign."}}
+            started = time.perf_counter()
+            response = await client.post(**kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                raise SystemExit(f"POST {kwargs['url']} answered {response.status_code}: {response.text}")
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"p50_ms": round(percentile(latencies, 50) * 1000, 3), "p99_ms": round(percentile(latencies, 99) * 1000, 3)}
+
+
+async def run(args) -> int:
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    import server
+    from embedded import EmbeddedDatabase
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("notifications").setLevel(logging.ERROR)
+    stand_in = StandIn(args.fail)
+    server.database.use(EmbeddedDatabase("impacts_notification_check"))
+    report = {}
+    for run_name, url in (("off", ""), ("on", stand_in.url)):
+        server.NOTIFY_WEBHOOK_URL = url
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+                started = time.monotonic()
+                report[f"post_{run_name}"] = await post_all(client, run_name, args.requests, args.concurrency)
+            if url:
+                deadline = time.monotonic() + args.timeout
+                while len(stand_in.received) < args.requests and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                finished = max(stand_in.received.values(), default=started)
+                report["delivery"] = {
+                    "expected": args.requests,
+                    "received": len(stand_in.received),
+                    "batches": stand_in.batches,
+                    "failed_requests": min(stand_in.requests, args.fail),
+                    "duplicates": stand_in.duplicates,
+                    "drain_seconds": round(finished - started, 3),
+                }
+    stand_in.server.shutdown()
+    print(json.dumps(report, indent=2))
+    return 0 if report["delivery"]["received"] == args.requests else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--fail", type=int, default=2, help="answer this many webhook calls with 503 first")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for every event")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
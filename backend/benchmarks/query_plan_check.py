@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Check that every route query, including every contact filter combination, uses an index at scale.
+
+Seeds a scratch database with N contacts (default 1,000,000) and matching
+subscribers and status checks, creates the declared indexes, then runs
+``indexes.verify_query_plans``. The planner's choices depend on the data, so
+an empty database proves little. Exits non-zero if any query plan contains a
+COLLSCAN.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/query_plan_check.py --docs 1000000
+
+Needs a real mongod: mongomock has neither ``explain()`` nor ``$text``.
+The scratch database (``--db``) is dropped before seeding and after the run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import indexes  # noqa: E402
+from status_rollup import rollup  # noqa: E402
+
+SEED_BATCH = 10_000
+SERVICES = ["seo", "meta", "social", "all"]
+BUDGETS = ["1k-3k", "3k-5k", "5k-10k", "10k+", None]
+WORDS = ["marketing", "growth", "seo", "ads", "brand", "launch", "audit", "content", "social", "budget"]
+SEED_START = datetime(2023, 1, 1)
+# Long enough that the TTL monitor keeps the (old) seeded pings during the check
+SEED_RETENTION = timedelta(days=3650)
+
+
+async def seed(db, docs: int) -> None:
+    rng = random.Random(0)
+    for offset in range(0, docs, SEED_BATCH):
+        contacts, subscribers, pings = [], [], []
+        for i in range(offset, min(docs, offset + SEED_BATCH)):
+            ts = SEED_START + timedelta(seconds=i * 30)
+            contacts.append({
+                "id": str(uuid.uuid4()),
+                "name": f"Lead {i}",
+                "email": f"lead{i % (docs // 3 or 1)}@example.com",
+                "phone": None,
+                "service": rng.choice(SERVICES),
+                "budget": rng.choice(BUDGETS),
+                "message": " ".join(rng.choices(WORDS, k=12)),
+                "created_at": ts,
+            })
+            subscribers.append({"id": str(uuid.uuid4()), "email": f"sub{i}@example.com", "subscribed_at": ts})
+            pings.append({"id": str(uuid.uuid4()), "client_name": f"client-{i % 50}", "timestamp": ts})
+        await db.contacts.insert_many(contacts, ordered=False)
+        await db.newsletters.insert_many(subscribers, ordered=False)
+        # Batches cover whole minutes, so buckets never straddle two of them
+        buckets, clients = rollup(pings, SEED_RETENTION)
+        await db.status_checks.insert_many(buckets, ordered=False)
+    # Every client pings in each batch, so the last batch holds their latest status
+    await db.status_clients.insert_many(clients, ordered=False)
+
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.mongo_url)
+    try:
+        await client.drop_database(args.db)
+        db = client[args.db]
+        print(f"seeding {args.docs} documents per collection...", file=sys.stderr)
+        await seed(db, args.docs)
+        await indexes.ensure_indexes(db)
+        failures = await indexes.verify_query_plans(db)
+    finally:
+        await client.drop_database(args.db)
+        client.close()
+    for failure in failures:
+        print(f"COLLSCAN  {failure}")
+    total = len(indexes.ROUTE_QUERIES)
+    print(f"{total - len(failures)}/{total} route queries use an index at {args.docs} documents")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="impacts_query_plan_check", help="scratch database, dropped afterwards")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
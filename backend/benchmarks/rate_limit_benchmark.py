@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Per-request overhead of ``RateLimitMiddleware`` in microseconds.
+
+A trivial ASGI app is called directly, with and without the middleware in
+front, using the ``POST /api/contact`` and ``POST /api/newsletter`` guards
+the server installs. The difference is the cost of the limiter itself: IP
+bucket, body buffering and JSON decode, email bucket and (for contacts) the
+duplicate fingerprint. Every request uses a fresh IP, email and message, so
+all of them pass and the bucket maps grow as they would under a flood.
+
+    python benchmarks/rate_limit_benchmark.py --requests 100000
+    python benchmarks/rate_limit_benchmark.py --redis-url redis://localhost:6379
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rate_limit import Guard, Rate, RateLimitMiddleware, build_limiter  # noqa: E402
+
+IP_RATE = Rate(20, 60)
+EMAIL_RATE = Rate(5, 600)
+# Shared across runs so no IP, email or payload is ever repeated
+_SEQUENCE = itertools.count()
+
+
+async def app(scope, receive, send):
+    message = await receive()
+    assert message["type"] == "http.request"
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def contact_body(i: int) -> bytes:
+    return json.dumps({
+        "name": f"Lead {i}", "email": f"lead{i}@example.com", "service": "seo", "budget": "3k-5k",
+        "message": f"We would like help growing our online presence, request {i}.",
+    }).encode()
+
+
+def newsletter_body(i: int) -> bytes:
+    return json.dumps({"email": f"sub{i}@example.com"}).encode()
+
+
+async def drive(handler, path: str, make_body, requests: int) -> float:
+    """Seconds per request through ``handler``."""
+    statuses = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses[message["status"]] = statuses.get(message["status"], 0) + 1
+
+    started = time.perf_counter()
+    for i in itertools.islice(_SEQUENCE, requests):
+        body = make_body(i)
+        scope = {"type": "http", "method": "POST", "path": path, "headers": [],
+                 "client": (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 50000)}
+
+        async def receive(body=body):
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await handler(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    if set(statuses) != {201}:
+        raise SystemExit(f"unexpected statuses on {path}: {statuses}")
+    return elapsed / requests
+
+
+async def run(args) -> list:
+    limiter = build_limiter("redis" if args.redis_url else "memory", redis_url=args.redis_url)
+    guarded = RateLimitMiddleware(app, limiter, [
+        Guard("/api/contact", ip=IP_RATE, email=EMAIL_RATE, duplicate_window=600),
+        Guard("/api/newsletter", ip=IP_RATE, email=EMAIL_RATE),
+    ])
+    results = []
+    try:
+        for path, make_body in (("/api/contact", contact_body), ("/api/newsletter", newsletter_body)):
+            await drive(guarded, path, make_body, min(1000, args.requests))  # warm up
+            bare = min([await drive(app, path, make_body, args.requests) for _ in range(args.repeat)])
+            limited = min([await drive(guarded, path, make_body, args.requests) for _ in range(args.repeat)])
+            results.append({
+                "route": f"POST {path}",
+                "backend": "redis" if args.redis_url else "memory",
+                "requests": args.requests,
+                "bare_us": round(bare * 1e6, 2),
+                "limited_us": round(limited * 1e6, 2),
+                "overhead_us": round((limited - bare) * 1e6, 2),
+            })
+            print(json.dumps(results[-1]))
+    finally:
+        await limiter.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--redis-url", help="measure the shared Redis backend instead of the in-process one")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Measure RPS scaling of serve.py from 1 to N worker processes.
+
+For each worker count the server is started with ``serve.py`` against a
+real mongod (workers are separate processes, so mongomock cannot be shared),
+driven by several load-generator processes, then stopped with SIGTERM so
+the graceful drain path runs too.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/scaling_benchmark.py --workers 1 2 4 8
+
+Routes covered: POST/GET /api/contact and POST/GET /api/newsletter.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ROUTES = [
+    ("POST", "/api/contact"),
+    ("GET", "/api/contact"),
+    ("POST", "/api/newsletter"),
+    ("GET", "/api/newsletter"),
+]
+
+
+def request_for(method: str, path: str, tag: str, n: int) -> dict:
+    if (method, path) == ("POST", "/api/contact"):
+        return {"json": {"name": "Scaling", "email": f"s{tag}-{n}@example.com", "service": "seo",
+                         "message": "Scaling benchmark submission."}}
+    if (method, path) == ("POST", "/api/newsletter"):
+        return {"json": {"email": f"s{tag}-{n}@example.com"}}
+    return {"params": {"limit": 100}}
+
+
+async def _generate(base_url: str, method: str, path: str, tag: str, concurrency: int, duration: float) -> int:
+    counter = itertools.count()
+    done = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal done
+            while time.perf_counter() < deadline:
+                response = await client.request(method, path, **request_for(method, path, tag, next(counter)))
+                if response.status_code < 500:
+                    done += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+def _generator_process(args) -> int:
+    return asyncio.run(_generate(*args))
+
+
+def wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(base_url + "/api/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight requests per generator")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per route")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--db", default="impacts_scaling_bench")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    env = {**os.environ, "DB_NAME": args.db}
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    # Every request comes from one IP; measure the routes, not the abuse limiter
+    env.setdefault("RATE_LIMIT_BACKEND", "none")
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for workers in sorted(set(args.workers)):
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            wait_ready(base_url)
+            row = {"workers": workers}
+            with multiprocessing.Pool(args.clients) as pool:
+                for method, path in ROUTES:
+                    jobs = [(base_url, method, path, f"{workers}-{c}", args.concurrency, args.duration)
+                            for c in range(args.clients)]
+                    row[f"{method} {path}"] = round(sum(pool.map(_generator_process, jobs)) / args.duration, 1)
+            results.append(row)
+            print(json.dumps(row))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+    with MongoClient(env["MONGO_URL"]) as mongo:
+        mongo.drop_database(args.db)
+
+    baseline = results[0] if results else {}
+    for row in results:
+        for method, path in ROUTES:
+            key = f"{method} {path}"
+            if baseline.get(key):
+                row[f"{key} speedup"] = round(row[key] / baseline[key], 2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"duration": args.duration, "clients": args.clients,
+                       "concurrency": args.concurrency, "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
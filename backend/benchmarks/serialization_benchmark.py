@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compare the model-per-row read path with the projected raw-dict path.
+
+The "model" path reproduces what the list endpoints used to do: build a
+``Contact`` per document, then let FastAPI validate the list against
+``response_model=List[Contact]`` and encode it. The "raw" path is what they
+do now (``serializers.dump_documents``). Both outputs are checked to be
+byte-identical before timing.
+
+    python benchmarks/serialization_benchmark.py --rows 1000 10000
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import serializers  # noqa: E402
+from server import Contact  # noqa: E402
+
+CONTACT_LIST = TypeAdapter(List[Contact])
+
+
+def make_docs(rows: int) -> List[dict]:
+    start = datetime(2024, 1, 1)
+    docs = []
+    for i in range(rows):
+        doc = Contact(
+            name=f"Lead {i}", email=f"lead{i}@example.com", phone="+1 555 0100",
+            service="seo", budget="3k-5k", message="Looking for help with our SEO. " * 20,
+            created_at=start + timedelta(seconds=i, milliseconds=i % 1000),
+        ).model_dump()
+        docs.append(doc)
+    return docs
+
+
+def model_path(docs: List[dict]) -> bytes:
+    models = [Contact(**doc) for doc in docs]
+    validated = CONTACT_LIST.validate_python(models)
+    content = jsonable_encoder(CONTACT_LIST.dump_python(validated, mode="json"))
+    return JSONResponse(content).body
+
+
+def raw_path(docs: List[dict]) -> bytes:
+    return serializers.dump_documents(docs, Contact)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        docs = make_docs(rows)
+        if model_path(docs) != raw_path(docs):
+            raise SystemExit(f"outputs differ at {rows} rows")
+        number = max(1, 10000 // rows)
+        timings = {}
+        for name, fn in (("model", model_path), ("raw", raw_path)):
+            best = min(timeit.repeat(lambda: fn(docs), number=number, repeat=args.repeat)) / number
+            timings[name] = best * 1000
+        results.append({
+            "rows": rows,
+            "encoder": "orjson" if serializers.orjson else "json",
+            "model_ms": round(timings["model"], 3),
+            "raw_ms": round(timings["raw"], 3),
+            "speedup": round(timings["model"] / timings["raw"], 1),
+        })
+        print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
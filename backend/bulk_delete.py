@@ -0,0 +1,65 @@
+"""Batch deletes: one ``delete_many`` per chunk instead of one request per item.
+
+Callers pass either explicit keys (contact ids, subscriber emails) or only a
+filter. Explicit keys are split into chunks. For each chunk, the keys that
+exist are read from the unique index and then removed with a single
+``delete_many`` on ``$in``. Keys that matched nothing come back as
+``not_found``, so every requested item has an outcome.
+
+A filter-only delete resolves its matches to keys the same way, one chunk at
+a time. Both modes therefore know exactly which keys went away, which lets
+callers drop per-item cache entries.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+BULK_DELETE_CHUNK_SIZE = 1000
+MAX_BULK_DELETE_KEYS = 100_000
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: int = 0
+    not_found: List[str] = []
+
+
+async def bulk_delete(
+    collection,
+    key: str,
+    keys: Optional[List[str]] = None,
+    filter: Optional[Dict[str, Any]] = None,
+    on_deleted: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+    chunk_size: int = BULK_DELETE_CHUNK_SIZE,
+) -> BulkDeleteResult:
+    """Delete by ``keys`` (narrowed by ``filter``) or, with ``keys=None``, everything ``filter`` matches.
+
+    ``on_deleted`` receives the keys removed by each chunk.
+    """
+    filter = filter or {}
+    result = BulkDeleteResult()
+    projection = {key: 1, "_id": 0}
+
+    async def delete_chunk(found: List[str]) -> None:
+        outcome = await collection.delete_many({**filter, key: {"$in": found}})
+        result.deleted += outcome.deleted_count
+        if on_deleted is not None:
+            await on_deleted(found)
+
+    if keys is None:
+        # Deleted documents drop out of the next find, so this walks the matches once
+        while True:
+            docs = await collection.find(filter, projection).limit(chunk_size).to_list(chunk_size)
+            if not docs:
+                break
+            await delete_chunk([doc[key] for doc in docs])
+        return result
+
+    unique = list(dict.fromkeys(keys))
+    for start in range(0, len(unique), chunk_size):
+        chunk = unique[start:start + chunk_size]
+        docs = await collection.find({**filter, key: {"$in": chunk}}, projection).to_list(len(chunk))
+        found = {doc[key] for doc in docs}
+        result.not_found.extend(k for k in chunk if k not in found)
+        if found:
+            await delete_chunk(list(found))
+    return result
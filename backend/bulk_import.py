@@ -0,0 +1,231 @@
+"""Streaming bulk import of newsletter subscribers.
+
+The upload is consumed as it arrives and split into lines, and only a
+bounded number of chunks are held at any time, however large the upload is.
+Chunks are validated with the same ``EmailStr`` rules as
+``NewsletterCreate``. Validation is the expensive step, mostly IDNA checks
+on the domain, so it runs in a small process pool. Several chunks validate
+in parallel while the previous chunk is being written.
+
+Each chunk is deduplicated and written with one ``insert_many(ordered=False)``.
+The unique index on ``email`` rejects addresses that are already
+subscribed, including repeats that fall in different chunks. Those
+rejections are counted as duplicates rather than treated as failures.
+
+A line longer than ``MAX_LINE_LENGTH`` bytes is counted as invalid and
+skipped up to the next newline. An upload without newlines therefore cannot
+grow the line buffer past that size.
+"""
+import asyncio
+import collections
+import csv
+import json
+import os
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+IMPORT_CHUNK_SIZE = 5000
+# Far above any address (254 characters) or a reasonable NDJSON record
+MAX_LINE_LENGTH = 8192
+MAX_INVALID_SAMPLES = 20
+DUPLICATE_KEY = 11000
+
+# Worker processes for email validation; 0 validates on a thread instead.
+IMPORT_PROCESSES = int(os.environ.get("BULK_IMPORT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+_email = TypeAdapter(EmailStr)
+_pool: Optional["ProcessPoolExecutor"] = None
+
+Row = Tuple[int, str]
+Invalid = Dict[str, object]
+
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    invalid_samples: List[Invalid] = []
+
+
+class LineTooLong(str):
+    """The first ``max_length`` bytes of a line that was cut off."""
+
+
+def _decode_line(line: bytes, max_length: int) -> str:
+    if len(line) > max_length:
+        return LineTooLong(line[:max_length].decode("utf-8", errors="replace"))
+    return line.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int = MAX_LINE_LENGTH) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without buffering the whole body.
+
+    A line longer than ``max_length`` bytes comes back as a :class:`LineTooLong`
+    holding its start; the rest of it is dropped as it arrives.
+    """
+    pending = b""
+    skipping = False
+    async for chunk in chunks:
+        if skipping:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            chunk = chunk[newline + 1:]
+            skipping = False
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield _decode_line(line, max_length)
+        if len(pending) > max_length:
+            yield _decode_line(pending, max_length)
+            pending = b""
+            skipping = True
+    if pending:
+        yield _decode_line(pending, max_length)
+
+
+def _extract(fmt: str, csv_column: int, line: str) -> Optional[str]:
+    if fmt == "csv":
+        row = next(csv.reader([line]), [])
+        return row[csv_column].strip() if len(row) > csv_column else None
+    value = json.loads(line)
+    if isinstance(value, dict):
+        value = value.get("email")
+    return value if isinstance(value, str) else None
+
+
+def validate_rows(fmt: str, csv_column: int, rows: List[Row]) -> Tuple[List[str], int, List[Invalid]]:
+    """Validate one chunk. Returns normalized unique emails, in-chunk duplicates and invalid rows.
+
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    seen = set()
+    emails = []
+    duplicates = 0
+    invalid = []
+    for line_no, raw in rows:
+        try:
+            email = _extract(fmt, csv_column, raw)
+            if not email:
+                raise ValueError("no email field")
+            email = _email.validate_python(email)
+        except (ValueError, ValidationError, csv.Error) as exc:
+            reason = exc.errors()[0]["msg"] if isinstance(exc, ValidationError) else str(exc)
+            invalid.append({"line": line_no, "value": raw[:200], "error": reason})
+            continue
+        if email in seen:
+            duplicates += 1
+            continue
+        seen.add(email)
+        emails.append(email)
+    return emails, duplicates, invalid
+
+
+def _csv_email_column(header_line: str) -> Optional[int]:
+    header = [cell.strip().lower() for cell in next(csv.reader([header_line]), [])]
+    return header.index("email") if "email" in header else None
+
+
+def _validation_pool() -> Optional["ProcessPoolExecutor"]:
+    global _pool
+    if IMPORT_PROCESSES > 0 and _pool is None:
+        # Imported here so workers that never take an upload do not load multiprocessing
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        _pool = ProcessPoolExecutor(IMPORT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_validation_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def import_subscribers(
+    collection,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    make_document: Callable[[str], dict],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    max_line_length: int = MAX_LINE_LENGTH,
+) -> BulkImportResult:
+    result = BulkImportResult()
+    loop = asyncio.get_running_loop()
+    pool = _validation_pool()
+    max_in_flight = max(1, IMPORT_PROCESSES)
+    validating: Deque[asyncio.Future] = collections.deque()
+    pending_write: Optional[asyncio.Task] = None
+    csv_column: Optional[int] = None if fmt == "csv" else 0
+
+    async def write(documents: List[dict]) -> None:
+        try:
+            outcome = await collection.insert_many(documents, ordered=False)
+            result.inserted += len(outcome.inserted_ids)
+        except BulkWriteError as exc:
+            details = exc.details
+            result.inserted += details.get("nInserted", 0)
+            errors = details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            result.duplicates += len(errors)
+
+    async def drain_one() -> None:
+        nonlocal pending_write
+        emails, duplicates, invalid = await validating.popleft()
+        result.duplicates += duplicates
+        result.invalid += len(invalid)
+        room = MAX_INVALID_SAMPLES - len(result.invalid_samples)
+        result.invalid_samples.extend(invalid[:max(0, room)])
+        documents = [make_document(email) for email in emails]
+        if pending_write is not None:
+            await pending_write
+            pending_write = None
+        if documents:
+            pending_write = asyncio.ensure_future(write(documents))
+
+    async def submit(rows: List[Row]) -> None:
+        validating.append(loop.run_in_executor(pool, validate_rows, fmt, csv_column, rows))
+        if len(validating) > max_in_flight:
+            await drain_one()
+
+    rows: List[Row] = []
+    try:
+        line_no = 0
+        async for line in iter_lines(chunks, max_line_length):
+            line_no += 1
+            if isinstance(line, LineTooLong):
+                result.invalid += 1
+                if len(result.invalid_samples) < MAX_INVALID_SAMPLES:
+                    result.invalid_samples.append({
+                        "line": line_no, "value": line[:200], "error": f"line longer than {max_line_length} bytes"})
+                continue
+            if not line.strip():
+                continue
+            if csv_column is None:
+                csv_column = _csv_email_column(line)
+                if csv_column is not None:
+                    continue  # header row
+                csv_column = 0
+            rows.append((line_no, line))
+            if len(rows) >= chunk_size:
+                await submit(rows)
+                rows = []
+        if rows:
+            await submit(rows)
+        while validating:
+            await drain_one()
+    finally:
+        for future in validating:
+            future.cancel()
+        if pending_write is not None:
+            await pending_write
+    return result
@@ -0,0 +1,238 @@
+"""Read-through response cache for the admin list and lookup endpoints.
+
+Entries are grouped into namespaces (``contacts:list``, ``contacts:item``,
+...) so writes can drop everything a change affects in one call. Two
+backends are provided:
+
+* :class:`MemoryCache` - in-process LRU with a per-entry TTL. The default.
+* :class:`RedisCache` - any Redis-protocol server (Redis, Valkey, KeyDB, or
+  ``fakeredis`` locally) so several workers share one cache. Each namespace
+  is a hash, which makes both lookups and invalidation a single round trip.
+
+Values are opaque ``bytes``; callers store pre-encoded response bodies.
+
+A read that loads a page while a write invalidates it must not store the
+old page afterwards. Every namespace therefore has a generation that
+``delete`` and ``invalidate`` bump. A read takes :meth:`Cache.generation`
+before it queries and passes it to ``set``, which drops the value if the
+namespace has been invalidated since.
+"""
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+_EXPIRY = struct.Struct("!d")
+
+_SET_IF_CURRENT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[3]) then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+class CacheStats:
+    """Hit/miss counters per namespace."""
+
+    def __init__(self):
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def record(self, namespace: str, hit: bool) -> None:
+        counter = self.hits if hit else self.misses
+        counter[namespace] = counter.get(namespace, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            ns: {"hits": self.hits.get(ns, 0), "misses": self.misses.get(ns, 0)}
+            for ns in namespaces
+        }
+
+
+class Cache:
+    """Backend interface. ``get`` records hits and misses in ``stats``."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    async def get(self, namespace: str, key: str) -> Optional[bytes]:
+        value = await self._get(namespace, key)
+        self.stats.record(namespace, value is not None)
+        return value
+
+    async def _get(self, namespace: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def generation(self, namespace: str) -> int:
+        """Counter bumped whenever entries of ``namespace`` are dropped."""
+        raise NotImplementedError
+
+    async def set(self, namespace: str, key: str, value: bytes, generation: Optional[int] = None) -> None:
+        """Store ``value``; skipped if ``generation`` is given and ``namespace`` has moved past it."""
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def invalidate(self, *namespaces: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class NullCache(Cache):
+    """Caching disabled: every lookup misses and nothing is stored."""
+
+    async def _get(self, namespace, key):
+        return None
+
+    async def generation(self, namespace):
+        return 0
+
+    async def set(self, namespace, key, value, generation=None):
+        pass
+
+    async def delete(self, namespace, *keys):
+        pass
+
+    async def invalidate(self, *namespaces):
+        pass
+
+
+class MemoryCache(Cache):
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, bytes]]" = OrderedDict()
+        self._keys: Dict[str, Set[str]] = {}
+        self._generations: Dict[str, int] = {}
+
+    async def _get(self, namespace, key):
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(namespace, key)
+            return None
+        self._entries.move_to_end((namespace, key))
+        return value
+
+    async def generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    async def set(self, namespace, key, value, generation=None):
+        if generation is not None and generation != self._generations.get(namespace, 0):
+            return
+        self._entries[(namespace, key)] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((namespace, key))
+        self._keys.setdefault(namespace, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            (old_ns, old_key), _ = self._entries.popitem(last=False)
+            self._keys.get(old_ns, set()).discard(old_key)
+
+    async def delete(self, namespace, *keys):
+        self._bump(namespace)
+        for key in keys:
+            self._remove(namespace, key)
+
+    async def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self._bump(namespace)
+            for key in self._keys.pop(namespace, set()):
+                self._entries.pop((namespace, key), None)
+
+    def _bump(self, namespace: str) -> None:
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def _remove(self, namespace: str, key: str) -> None:
+        self._entries.pop((namespace, key), None)
+        self._keys.get(namespace, set()).discard(key)
+
+
+class RedisCache(Cache):
+    """Shared cache on a Redis-protocol server.
+
+    Each entry is stored as ``<expiry timestamp><value>`` inside the
+    namespace's hash; the hash itself also expires ``ttl`` after its last
+    write so idle namespaces do not linger. A namespace's generation is a
+    counter next to the hash, checked and written in one script.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = "impacts:cache:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+        self._set_if_current = client.register_script(_SET_IF_CURRENT)
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float, **kwargs) -> "RedisCache":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url), ttl, **kwargs)
+
+    def _name(self, namespace: str) -> str:
+        return self.prefix + namespace
+
+    def _generation_name(self, namespace: str) -> str:
+        return self.prefix + "generation:" + namespace
+
+    async def _get(self, namespace, key):
+        raw = await self.client.hget(self._name(namespace), key)
+        if raw is None:
+            return None
+        (expires_at,) = _EXPIRY.unpack_from(raw)
+        if expires_at <= time.time():
+            return None
+        return raw[_EXPIRY.size:]
+
+    async def generation(self, namespace):
+        return int(await self.client.get(self._generation_name(namespace)) or 0)
+
+    async def set(self, namespace, key, value, generation=None):
+        name = self._name(namespace)
+        payload = _EXPIRY.pack(time.time() + self.ttl) + value
+        expire = max(1, int(self.ttl + 0.999))
+        if generation is not None:
+            await self._set_if_current(keys=[name, self._generation_name(namespace)],
+                                       args=[key, payload, generation, expire])
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(name, key, payload)
+            pipe.expire(name, expire)
+            await pipe.execute()
+
+    async def delete(self, namespace, *keys):
+        if keys:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.incr(self._generation_name(namespace))
+                pipe.hdel(self._name(namespace), *keys)
+                await pipe.execute()
+
+    async def invalidate(self, *namespaces):
+        if namespaces:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for ns in namespaces:
+                    pipe.incr(self._generation_name(ns))
+                pipe.delete(*(self._name(ns) for ns in namespaces))
+                await pipe.execute()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def build_cache(backend: str, ttl: float, max_entries: int = 1024, redis_url: Optional[str] = None) -> Cache:
+    """Create the cache selected by configuration (``memory``, ``redis`` or ``none``)."""
+    if backend == "none" or ttl <= 0:
+        return NullCache(ttl)
+    if backend == "redis":
+        if not redis_url:
+            raise RuntimeError("CACHE_BACKEND=redis requires REDIS_URL")
+        return RedisCache.from_url(redis_url, ttl)
+    if backend == "memory":
+        return MemoryCache(ttl, max_entries)
+    raise RuntimeError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,409 @@
+"""Opt-in compact storage format, mapped back to the API shape at the collection boundary.
+
+A contact written from the ``Contact`` model spends most of its bytes on
+overhead rather than data:
+
+* a 36-byte UUID string ``id`` next to Mongo's own 12-byte ``_id``. The
+  ``id_unique`` index holds it a second time, and every ``..._id`` compound
+  index a third time;
+* ``service`` and ``budget`` as enum strings, repeated in each document and
+  in each index entry that contains them;
+* full field names in every document, and ``null`` for unset optional
+  fields.
+
+A :class:`DocumentCodec` describes a denser layout. Field names become short
+keys, enum fields become small integer codes, the UUID becomes 16 bytes of
+BSON binary (subtype 4), and ``None`` fields are left out. When the UUID
+field maps to ``_id``, the separate ``id`` value and its unique index
+disappear altogether.
+
+:class:`CompactCollection` wraps a (Motor-compatible) collection and speaks
+the API shape on both sides. Filters, projections, sorts, updates, index
+declarations and aggregation pipelines are translated on the way in.
+Documents are translated back on the way out. Handlers, pagination, export,
+bulk delete and stats therefore work unchanged on either format. A UUID
+string and its binary form sort in the same order, so keyset cursors keep
+working. Values outside the code tables, or ids that are not UUIDs, are
+stored as they are and read back as they are.
+
+Existing data is converted with the migration tool, which copies into a
+new collection and then swaps the names::
+
+    python compact.py contacts contacts_compact            # copy, resumable
+    python compact.py contacts contacts_compact --swap     # copy, then rename into place
+    python compact.py contacts_compact contacts_full --expand   # back to the full format, resumable
+"""
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from bson.binary import Binary, UUID_SUBTYPE
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+_LOGICAL = frozenset({"$and", "$or", "$nor"})
+_VALUE_OPERATORS = frozenset({"$eq", "$ne", "$lt", "$lte", "$gt", "$gte"})
+_LIST_OPERATORS = frozenset({"$in", "$nin", "$all"})
+
+
+class DocumentCodec:
+    """Mapping between the API shape of a document and its compact stored form.
+
+    ``fields`` maps API names to stored names. ``codes`` maps a field to its
+    list of allowed values, and a value is stored as its index in that list.
+    Only ever append to these lists, because the stored codes depend on the
+    order. ``uuids`` lists the fields that hold UUID strings.
+    """
+
+    def __init__(self, fields: Mapping[str, str], codes: Optional[Mapping[str, Sequence[str]]] = None,
+                 uuids: Iterable[str] = ()):
+        self.fields = dict(fields)
+        self.names = {short: name for name, short in self.fields.items()}
+        self.codes = {name: list(values) for name, values in (codes or {}).items()}
+        self._code_of = {name: {v: i for i, v in enumerate(values)} for name, values in self.codes.items()}
+        self.uuids = frozenset(uuids)
+
+    # -- values --
+
+    def encode_value(self, name: str, value: Any) -> Any:
+        if name in self._code_of and isinstance(value, str):
+            return self._code_of[name].get(value, value)
+        if name in self.uuids and isinstance(value, str):
+            try:
+                return Binary(uuid.UUID(value).bytes, UUID_SUBTYPE)
+            except ValueError:
+                return value
+        return value
+
+    def decode_value(self, name: str, value: Any) -> Any:
+        if name in self.codes and isinstance(value, int) and not isinstance(value, bool):
+            values = self.codes[name]
+            return values[value] if 0 <= value < len(values) else value
+        if name in self.uuids and isinstance(value, bytes) and len(value) == 16:
+            return str(uuid.UUID(bytes=bytes(value)))
+        return value
+
+    def short(self, name: str) -> str:
+        return self.fields.get(name, name)
+
+    # -- documents --
+
+    def encode(self, doc: Mapping[str, Any]) -> Dict[str, Any]:
+        return {self.short(k): self.encode_value(k, v) for k, v in doc.items() if v is not None}
+
+    def decode(self, doc: Mapping[str, Any]) -> Dict[str, Any]:
+        out = {}
+        for short, value in doc.items():
+            name = self.names.get(short, short)
+            out[name] = self.decode_value(name, value)
+        return out
+
+    # -- queries --
+
+    def encode_filter(self, query: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, cond in (query or {}).items():
+            if key in _LOGICAL:
+                out[key] = [self.encode_filter(q) for q in cond]
+            elif key.startswith("$"):
+                out[key] = cond
+            else:
+                out[self.short(key)] = self._encode_condition(key, cond)
+        return out
+
+    def _encode_condition(self, name: str, cond: Any) -> Any:
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            out = {}
+            for op, arg in cond.items():
+                if op in _VALUE_OPERATORS:
+                    out[op] = self.encode_value(name, arg)
+                elif op in _LIST_OPERATORS:
+                    out[op] = [self.encode_value(name, a) for a in arg]
+                elif op == "$not":
+                    out[op] = self._encode_condition(name, arg)
+                else:
+                    out[op] = arg
+            return out
+        return self.encode_value(name, cond)
+
+    def encode_projection(self, projection: Optional[Any]) -> Optional[Dict[str, Any]]:
+        if projection is None:
+            return None
+        if not isinstance(projection, Mapping):
+            projection = {name: 1 for name in projection}
+        out = {}
+        for name, value in projection.items():
+            if name == "_id" and value == 0 and self.short("id") == "_id" and projection.get("id"):
+                # The id lives in _id, so it cannot be excluded
+                continue
+            out[self.short(name)] = value
+        return out
+
+    def encode_sort(self, key_or_list: Any, direction: Optional[int] = None) -> Any:
+        if isinstance(key_or_list, str):
+            return [(self.short(key_or_list), 1 if direction is None else direction)]
+        return [(self.short(name), order) for name, order in key_or_list]
+
+    def encode_update(self, update: Any) -> Any:
+        if isinstance(update, list):
+            return [self.encode_stage(stage) for stage in update]
+        if not any(k.startswith("$") for k in update):
+            return self.encode(update)
+        out = {}
+        for op, fields in update.items():
+            if op in ("$set", "$setOnInsert", "$min", "$max"):
+                out[op] = {self.short(k): self.encode_value(k, v) for k, v in fields.items()}
+            else:
+                out[op] = {self.short(k): v for k, v in fields.items()}
+        return out
+
+    def encode_index(self, model: IndexModel) -> Optional[IndexModel]:
+        """The index on stored names; None for a unique index on a field that now lives in ``_id``."""
+        options = dict(model.document)
+        keys = [(self.short(name), order) for name, order in options.pop("key").items()]
+        if keys == [("_id", 1)] or keys == [("_id", -1)]:
+            return None
+        if "partialFilterExpression" in options:
+            options["partialFilterExpression"] = self.encode_filter(options["partialFilterExpression"])
+        if "weights" in options:
+            options["weights"] = {self.short(k): v for k, v in options["weights"].items()}
+        return IndexModel(keys, **options)
+
+    # -- aggregation --
+
+    def encode_expression(self, expr: Any) -> Any:
+        """Rename field paths; coded fields are decoded in place so ``$group`` output keeps API values."""
+        if isinstance(expr, str) and expr.startswith("$") and not expr.startswith("$$"):
+            name = expr[1:]
+            path = "$" + self.short(name)
+            if name in self.codes:
+                return {"$cond": [{"$isNumber": path}, {"$arrayElemAt": [self.codes[name], path]}, path]}
+            return path
+        if isinstance(expr, list):
+            return [self.encode_expression(e) for e in expr]
+        if isinstance(expr, dict):
+            if "$literal" in expr:
+                return expr
+            return {k: self.encode_expression(v) for k, v in expr.items()}
+        return expr
+
+    def encode_stage(self, stage: Mapping[str, Any]) -> Dict[str, Any]:
+        (name, body), = stage.items()
+        if name == "$match":
+            return {name: self.encode_filter(body)}
+        if name == "$sort":
+            return {name: {self.short(k): v for k, v in body.items()}}
+        return {name: self.encode_expression(body)}
+
+
+class _CompactCursor:
+    _CHAINED = frozenset({"limit", "skip", "batch_size", "max_time_ms", "allow_disk_use", "collation"})
+
+    def __init__(self, cursor, codec: DocumentCodec, decode: bool = True):
+        self._cursor = cursor
+        self._codec = codec
+        self._decode = decode
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in self._CHAINED:
+            return lambda *args, **kwargs: _CompactCursor(attr(*args, **kwargs), self._codec, self._decode)
+        return attr
+
+    def sort(self, key_or_list, direction=None):
+        return _CompactCursor(self._cursor.sort(self._codec.encode_sort(key_or_list, direction)),
+                              self._codec, self._decode)
+
+    def hint(self, index):
+        if not isinstance(index, str):
+            index = self._codec.encode_sort(index)
+        return _CompactCursor(self._cursor.hint(index), self._codec, self._decode)
+
+    async def to_list(self, length=None):
+        docs = await self._cursor.to_list(length)
+        return [self._codec.decode(d) for d in docs] if self._decode else docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        doc = await self._cursor.__anext__()
+        return self._codec.decode(doc) if self._decode else doc
+
+
+class CompactCollection:
+    """Collection proxy storing documents through ``codec`` while callers use the API shape."""
+
+    def __init__(self, collection, codec: DocumentCodec):
+        self._collection = collection
+        self.codec = codec
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find(self, filter=None, projection=None, *args, **kwargs):
+        codec = self.codec
+        if "sort" in kwargs and kwargs["sort"] is not None:
+            kwargs["sort"] = codec.encode_sort(kwargs["sort"])
+        cursor = self._collection.find(codec.encode_filter(filter), codec.encode_projection(projection), *args, **kwargs)
+        return _CompactCursor(cursor, codec)
+
+    async def find_one(self, filter=None, projection=None, *args, **kwargs):
+        codec = self.codec
+        if kwargs.get("sort") is not None:
+            kwargs["sort"] = codec.encode_sort(kwargs["sort"])
+        doc = await self._collection.find_one(
+            codec.encode_filter(filter), codec.encode_projection(projection), *args, **kwargs)
+        return None if doc is None else codec.decode(doc)
+
+    async def insert_one(self, document, *args, **kwargs):
+        return await self._collection.insert_one(self.codec.encode(document), *args, **kwargs)
+
+    async def insert_many(self, documents, *args, **kwargs):
+        return await self._collection.insert_many([self.codec.encode(d) for d in documents], *args, **kwargs)
+
+    async def update_one(self, filter, update, *args, **kwargs):
+        return await self._collection.update_one(
+            self.codec.encode_filter(filter), self.codec.encode_update(update), *args, **kwargs)
+
+    async def update_many(self, filter, update, *args, **kwargs):
+        return await self._collection.update_many(
+            self.codec.encode_filter(filter), self.codec.encode_update(update), *args, **kwargs)
+
+    async def delete_one(self, filter, *args, **kwargs):
+        return await self._collection.delete_one(self.codec.encode_filter(filter), *args, **kwargs)
+
+    async def delete_many(self, filter, *args, **kwargs):
+        return await self._collection.delete_many(self.codec.encode_filter(filter), *args, **kwargs)
+
+    async def count_documents(self, filter, *args, **kwargs):
+        return await self._collection.count_documents(self.codec.encode_filter(filter), *args, **kwargs)
+
+    async def distinct(self, key, filter=None, *args, **kwargs):
+        values = await self._collection.distinct(self.codec.short(key), self.codec.encode_filter(filter),
+                                                 *args, **kwargs)
+        return [self.codec.decode_value(key, v) for v in values]
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        # Output shapes are defined by the pipeline, so rows are returned as they come
+        stages = [self.codec.encode_stage(stage) for stage in pipeline]
+        return _CompactCursor(self._collection.aggregate(stages, *args, **kwargs), self.codec, decode=False)
+
+    async def create_indexes(self, indexes, *args, **kwargs):
+        models = [m for m in (self.codec.encode_index(i) for i in indexes) if m is not None]
+        return await self._collection.create_indexes(models, *args, **kwargs) if models else []
+
+
+# ============== Migration ==============
+
+
+async def migrate(source, target, transform, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Copy every document of ``source`` into ``target`` through ``transform``; returns documents written.
+
+    Documents are read in ``_id`` order and written unordered. Documents
+    already in ``target`` fail on a duplicate key and are skipped, so an
+    interrupted run can simply be started again. That needs a key that is
+    the same on every run: the ``_id`` when ``transform`` keeps or derives
+    it, otherwise a unique index that must exist on ``target`` before the
+    copy starts (see :func:`expand_transform`).
+    """
+    written = 0
+    batch: List[dict] = []
+
+    async def flush():
+        nonlocal written
+        try:
+            result = await target.insert_many(batch, ordered=False)
+            written += len(result.inserted_ids)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(e.get("code") != DUPLICATE_KEY for e in errors):
+                raise
+            written += exc.details.get("nInserted", 0)
+        batch.clear()
+
+    async for doc in source.find({}).sort("_id", 1).batch_size(batch_size):
+        batch.append(transform(doc))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return written
+
+
+def compact_transform(codec: DocumentCodec):
+    """Full document (with its own ``_id``) -> compact document."""
+    def transform(doc: dict) -> dict:
+        doc = {k: v for k, v in doc.items() if k != "_id" or codec.short("id") != "_id"}
+        return codec.encode(doc)
+    return transform
+
+
+def expand_transform(codec: DocumentCodec):
+    """Compact document -> full document.
+
+    When the codec stores ``id`` in ``_id``, Mongo assigns the full document
+    a new ``_id``. A rerun can then only recognise copied documents by the
+    unique ``id`` index, so create the target's indexes before migrating.
+    """
+    def transform(doc: dict) -> dict:
+        # Fields left out because they were None come back as explicit nulls, as the models write them
+        return {**{name: None for name in codec.fields}, **codec.decode(doc)}
+    return transform
+
+
+async def _main() -> int:
+    # Imported here so importing the codec (server, database) never loads argparse
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="collection to read, e.g. contacts")
+    parser.add_argument("target", help="collection to write, e.g. contacts_compact")
+    parser.add_argument("--expand", action="store_true", help="convert compact documents back to the full format")
+    parser.add_argument("--swap", action="store_true",
+                        help="after copying, rename source to <source>_previous and target to source")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from indexes import INDEXES
+    from server import CONTACT_CODEC
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    try:
+        db = client[os.environ["DB_NAME"]]
+        source, target = db[args.source], db[args.target]
+        transform = expand_transform(CONTACT_CODEC) if args.expand else compact_transform(CONTACT_CODEC)
+        models = INDEXES.get("contacts", [])
+        if args.expand:
+            # Expanded documents get fresh _ids; id_unique is what makes a rerun skip copied ones
+            await target.create_indexes(models)
+        written = await migrate(source, target, transform, args.batch_size)
+        copied, total = await target.count_documents({}), await source.count_documents({})
+        print(f"wrote {written} documents; {args.target} has {copied} of {total}")
+        if copied != total:
+            print("counts differ (writes during the copy?); run again before swapping")
+            return 1
+        if not args.expand:
+            await CompactCollection(target, CONTACT_CODEC).create_indexes(models)
+        if args.swap:
+            await source.rename(f"{args.source}_previous")
+            await target.rename(args.source)
+            print(f"{args.source} -> {args.source}_previous, {args.target} -> {args.source}")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,153 @@
+"""Negotiated response compression (zstd, brotli, gzip).
+
+:class:`CompressionMiddleware` compresses any complete response of at least
+``minimum_size`` bytes whose type is text-like, using the best encoding
+the client accepts. The order is ``zstd`` > ``br`` > ``gzip``, limited to
+the codecs installed. ``brotli`` and ``zstandard`` are optional; gzip is
+always there. Streaming responses (the exports) pass through untouched.
+
+Bodies of at least ``offload_size`` bytes are compressed in a worker
+thread, so a 1000-contact page does not stall the event loop. The codecs
+release the GIL while they work.
+
+The middleware also records the request's ``Accept-Encoding`` in a context
+variable. Handlers that cache their response bytes (the admin lists) can
+then call :meth:`Compressor.encoding_for` and cache the compressed variant
+next to the plain one. Repeat polls then skip serialization and
+compression. A response that already has ``Content-Encoding`` is left
+alone. Compressed responses get a weak ETag, as RFC 9110 expects for a
+transformed representation. ``If-None-Match`` comparison is weak, so
+conditional requests keep working.
+"""
+import asyncio
+import gzip
+from contextvars import ContextVar
+from importlib.util import find_spec
+from typing import Dict, List, Optional
+
+# Preference order when the client accepts several. The optional codecs are only
+# checked for here and imported on first use, which keeps them off the startup path.
+ENCODINGS = [e for e, module in (("zstd", "zstandard"), ("br", "brotli")) if find_spec(module)] + ["gzip"]
+DEFAULT_LEVELS = {"gzip": 5, "br": 4, "zstd": 3}
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+_accept_encoding: ContextVar[str] = ContextVar("accept_encoding", default="")
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"unsupported encoding: {encoding}")
+
+
+def negotiate(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """The first of ``available`` the ``Accept-Encoding`` header allows (q > 0), or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    for encoding in available:
+        if weights.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class Compressor:
+    def __init__(
+        self,
+        minimum_size: int = 1024,
+        levels: Optional[Dict[str, int]] = None,
+        offload_size: int = 64 * 1024,
+        encodings: Optional[List[str]] = None,
+    ):
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.offload_size = offload_size
+        self.encodings = [e for e in (encodings or ENCODINGS) if e in ENCODINGS]
+
+    def encoding_for(self, size: int) -> Optional[str]:
+        """Encoding to use for a ``size``-byte body in the current request, or None to send it as is."""
+        if size < self.minimum_size:
+            return None
+        return negotiate(_accept_encoding.get(), self.encodings)
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        level = self.levels[encoding]
+        if len(body) >= self.offload_size:
+            return await asyncio.to_thread(_compress, body, encoding, level)
+        return _compress(body, encoding, level)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, compressor: Compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        token = _accept_encoding.set(accept)
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            body = message.get("body", b"")
+            headers = list(pending.get("headers", []))
+            names = {name.lower() for name, _ in headers}
+            content_type = next((v.decode("latin-1") for n, v in headers if n.lower() == b"content-type"), "")
+            compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+            if compressible and b"vary" not in names:
+                headers.append((b"vary", b"Accept-Encoding"))
+            encoding = None
+            if (compressible and not message.get("more_body", False) and b"content-encoding" not in names
+                    and pending["status"] not in (204, 304)):
+                encoding = self.compressor.encoding_for(len(body))
+            if encoding is not None:
+                body = await self.compressor.compress(body, encoding)
+                headers = [(n, weak_etag(v.decode("latin-1")).encode("latin-1") if n.lower() == b"etag" else v)
+                           for n, v in headers if n.lower() != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode())]
+                message = {**message, "body": body}
+            await send({**pending, "headers": headers})
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _accept_encoding.reset(token)
@@ -0,0 +1,222 @@
+"""Config-driven Motor client, created in the app lifespan rather than at import.
+
+:class:`MongoSettings` reads the connection and pool settings from the
+environment when the app starts. :class:`Database` owns the client: it
+connects, warms the pool, exposes the (instrumented) database handle, and
+closes the client on shutdown. Importing the server therefore needs neither
+``MONGO_URL`` nor a reachable Mongo.
+
+Pool behaviour is tuned with:
+
+* ``MONGO_MAX_POOL_SIZE`` / ``MONGO_MIN_POOL_SIZE`` - connections per worker
+* ``MONGO_WAIT_QUEUE_TIMEOUT_MS`` - how long a request may wait for a connection
+* ``MONGO_COMPRESSORS`` - e.g. ``zstd,snappy`` (needs ``zstandard``/``python-snappy``)
+* ``MONGO_READ_PREFERENCE`` - e.g. ``primaryPreferred``
+* ``MONGO_WARMUP_CONNECTIONS`` - connections opened before serving (default: min pool size)
+
+Checkout waits and pool occupancy are exported as ``mongo_pool_*`` metrics so
+pools can be sized for multi-worker deployments.
+"""
+import asyncio
+import copy
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+from pymongo import monitoring
+
+from compact import CompactCollection, DocumentCodec
+from metrics import REGISTRY, Counter, Gauge, Histogram, instrument_database
+
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class MongoSettings(BaseModel):
+    url: str
+    db_name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    wait_queue_timeout_ms: Optional[int] = None
+    compressors: Optional[str] = None
+    read_preference: str = "primary"
+    warmup_connections: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        url = os.environ.get("MONGO_URL")
+        db_name = os.environ.get("DB_NAME")
+        if not url or not db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set")
+        env = os.environ.get
+        return cls(
+            url=url,
+            db_name=db_name,
+            max_pool_size=int(env("MONGO_MAX_POOL_SIZE", "100")),
+            min_pool_size=int(env("MONGO_MIN_POOL_SIZE", "0")),
+            wait_queue_timeout_ms=int(env("MONGO_WAIT_QUEUE_TIMEOUT_MS")) if env("MONGO_WAIT_QUEUE_TIMEOUT_MS") else None,
+            compressors=env("MONGO_COMPRESSORS") or None,
+            read_preference=env("MONGO_READ_PREFERENCE", "primary"),
+            warmup_connections=int(env("MONGO_WARMUP_CONNECTIONS")) if env("MONGO_WARMUP_CONNECTIONS") else None,
+        )
+
+    def client_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "readPreference": self.read_preference,
+        }
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.compressors:
+            options["compressors"] = self.compressors
+        return options
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener feeding the ``mongo_pool_*`` metrics.
+
+    PyMongo calls listeners from its own threads, so unlike the request
+    metrics these are guarded by a lock and copied at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.wait = Histogram(
+            "mongo_pool_checkout_wait_seconds", "Time spent waiting to check out a pooled connection.",
+            buckets=POOL_WAIT_BUCKETS)
+        self.checkouts = Counter(
+            "mongo_pool_checkouts_total", "Connection checkouts by result.", ("result",))
+        self.checked_out = Gauge(
+            "mongo_pool_connections_checked_out", "Connections currently checked out of the pool.")
+        self.open = Gauge("mongo_pool_connections_open", "Connections currently open.")
+
+    def collect(self):
+        with self._lock:
+            return [copy.deepcopy(m) for m in (self.wait, self.checkouts, self.checked_out, self.open)]
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.wait.observe(waited)
+            self.checkouts.inc("ok")
+            self.checked_out.inc()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkouts.inc(str(event.reason))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out.dec()
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open.inc()
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+REGISTRY.add_collector(pool_metrics.collect)
+
+
+class Database:
+    """Lazily connected database handle.
+
+    Attribute and item access (``database.contacts``, ``database["contacts"]``)
+    are forwarded to the connected database, so handlers can use it exactly
+    like a Motor database once the lifespan has run. Collections registered
+    with :meth:`store_compact` are wrapped so they are stored in the compact
+    format (see compact.py) while callers keep using the API shape.
+    """
+
+    def __init__(self):
+        self.settings: Optional[MongoSettings] = None
+        self.client = None
+        self._db = None
+        self.codecs: Dict[str, DocumentCodec] = {}
+
+    def store_compact(self, name: str, codec: DocumentCodec) -> None:
+        self.codecs[name] = codec
+
+    @property
+    def connected(self) -> bool:
+        return self._db is not None
+
+    def use(self, database) -> None:
+        """Serve from an existing database object (mongomock, a test db, ...).
+
+        No client is created and ``connect``/``close`` leave it alone.
+        """
+        self._db = instrument_database(database)
+
+    async def connect(self, settings: Optional[MongoSettings] = None, warm_up: bool = True):
+        """Create the client; with ``warm_up=False`` no I/O happens and Mongo need not be reachable yet."""
+        if self._db is not None:
+            return self._db
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.settings = settings or MongoSettings.from_env()
+        self.client = AsyncIOMotorClient(
+            self.settings.url, event_listeners=[pool_metrics], **self.settings.client_options()
+        )
+        self._db = instrument_database(self.client[self.settings.db_name])
+        if warm_up:
+            try:
+                await self.warm_up()
+            except BaseException:
+                await self.close()
+                raise
+        return self._db
+
+    async def warm_up(self) -> None:
+        """Open connections up front so the first requests don't pay for handshakes."""
+        if self.client is None:
+            return
+        count = self.settings.warmup_connections
+        if count is None:
+            count = self.settings.min_pool_size
+        # Concurrent pings each need their own connection, growing the pool to ``count``.
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(max(1, count))))
+
+    async def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self._db = None
+
+    def __getitem__(self, name: str):
+        if self._db is None:
+            raise RuntimeError("Database is not connected; the app lifespan has not started")
+        codec = self.codecs.get(name)
+        if codec is not None:
+            return CompactCollection(self._db[name], codec)
+        return self._db[name]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,1309 @@
+"""Embedded storage engine: an in-process, Motor-compatible database.
+
+Handlers, and the helpers they use, talk to storage only through the
+subset of the Motor collection API listed below. This module implements that
+same subset over plain Python dicts, so the API can run, and be load-tested,
+on one box with no Mongo at all (``STORAGE_BACKEND=embedded``). Benchmarks
+and parity checks can also ``database.use(EmbeddedDatabase())`` directly.
+
+Supported: ``insert_one``/``insert_many``, ``find``/``find_one`` with
+projection, ``sort``/``skip``/``limit``/``batch_size``, ``update_one``/
+``update_many``/``replace_one``/``find_one_and_update``/
+``find_one_and_delete`` (``$set``, ``$setOnInsert``, ``$inc``, ``$min``,
+``$max``, ``$unset``, upserts), ``delete_one``/``delete_many``, ``bulk_write``, ``count_documents``,
+``estimated_document_count``, ``distinct``, ``create_index(es)``, ``explain``
+and ``aggregate`` with ``$match``/``$group``/``$sort``/``$limit``/``$project``/
+``$count`` (and the expressions the app's pipelines use, including the
+``$cond``/``$isNumber``/``$arrayElemAt`` that compact.py emits). The query
+language covers comparisons, ``$in``/``$nin``, ``$exists``, ``$regex``,
+``$and``/``$or``/``$nor`` and ``$text``.
+
+Indexes declared through ``create_indexes`` are real secondary indexes:
+
+* single-field unique indexes are hash maps and enforce uniqueness
+  (``DuplicateKeyError``/``BulkWriteError`` with code 11000, like Mongo);
+* every other index is a sorted list of keys. A query is answered by
+  seeking to the equality prefix plus a range (including the range implied
+  by a keyset ``$or``) and walking in order, so sorted, limited pages never
+  touch the rest of the collection;
+* text indexes are inverted indexes on lower-cased words (no stemming, unlike
+  Mongo, so ``market`` does not match ``marketing``);
+* single-field indexes with ``expireAfterSeconds`` expire documents like
+  Mongo's TTL monitor, sweeping at most every ``TTL_SWEEP_SECONDS`` on the
+  next read or insert.
+
+Values are stored the way BSON would round-trip them: datetimes are
+truncated to milliseconds and made naive UTC, and documents are copied on
+the way in and out. Every operation runs to completion on the event loop
+without awaiting, so each one is atomic. Cursors iterated with ``async for``
+hand control back to the loop after each batch.
+
+Data lives in the worker process, so it is lost on restart and is not
+shared between workers. ``serve.py`` runs a single worker with this backend.
+"""
+import asyncio
+import bisect
+import copy
+import heapq
+import itertools
+import math
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+DUPLICATE_KEY = 11000
+DEFAULT_BATCH_SIZE = 101
+# Above this many documents, sorted indexes are rebuilt in one pass instead of per document
+_BATCH_THRESHOLD = 64
+# Mongo's TTL monitor runs once a minute
+TTL_SWEEP_SECONDS = 60.0
+
+# ============== Values and ordering ==============
+
+
+class _Max:
+    """Sorts after every key component; closes open-ended index ranges."""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+
+_MAX = _Max()
+_MISSING = object()
+
+
+def _rank(value: Any) -> int:
+    """BSON comparison order between types: null < numbers < strings < objects < arrays < binary
+    < ObjectId < bool < dates."""
+    if value is None or value is _MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime):
+        return 8
+    return 9
+
+
+def _component(value: Any) -> Tuple[int, Any]:
+    rank = _rank(value)
+    if rank == 0:
+        return 0, 0
+    if rank in (3, 4, 9):
+        return rank, repr(value)
+    if rank == 5:
+        # Binary orders by length, then subtype, then bytes
+        return rank, (len(value), getattr(value, "subtype", 0), bytes(value))
+    return rank, value
+
+
+def _sort_key(doc: dict, fields: Sequence[str]) -> tuple:
+    key: List[Any] = []
+    for field in fields:
+        key.extend(_component(_get(doc, field)))
+    return tuple(key)
+
+
+def _normalize(value: Any) -> Any:
+    """What the value would look like after a BSON round trip."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, str) and type(value) is not str:
+        return str.__str__(value)
+    if isinstance(value, bytes) and type(value) is not bytes and getattr(value, "subtype", 0) == 0:
+        # Binary subtype 0 comes back as plain bytes
+        return bytes(value)
+    return value
+
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _get(doc: dict, path: str) -> Any:
+    if "." not in path:
+        return doc.get(path, _MISSING)
+    value: Any = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _set(doc: dict, path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: dict, path: str) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+# ============== Query matching ==============
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _words(text: Any) -> List[str]:
+    return _WORD.findall(text.lower()) if isinstance(text, str) else []
+
+
+def _is_operator_dict(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(k.startswith("$") for k in value)
+
+
+def _equals(value: Any, target: Any) -> bool:
+    if target is None:
+        return value is None or value is _MISSING
+    if value is _MISSING:
+        return False
+    if isinstance(value, list) and not isinstance(target, list):
+        return any(_equals(v, target) for v in value)
+    if _rank(value) != _rank(target):
+        return False
+    return value == target
+
+
+def _compare(value: Any, target: Any, op: str) -> bool:
+    candidates = value if isinstance(value, list) else [value]
+    for candidate in candidates:
+        if candidate is _MISSING or _rank(candidate) != _rank(target):
+            continue
+        a, b = _component(candidate), _component(target)
+        if (op == "$lt" and a < b) or (op == "$lte" and a <= b) or (op == "$gt" and a > b) or (op == "$gte" and a >= b):
+            return True
+    return False
+
+
+def _match_operator(value: Any, op: str, arg: Any, cond: dict) -> bool:
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op in ("$lt", "$lte", "$gt", "$gte"):
+        return _compare(value, arg, op)
+    if op == "$in":
+        return any(_equals(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_equals(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$regex":
+        flags = re.IGNORECASE if "i" in cond.get("$options", "") else 0
+        pattern = arg if isinstance(arg, re.Pattern) else re.compile(arg, flags)
+        values = value if isinstance(value, list) else [value]
+        return any(isinstance(v, str) and pattern.search(v) for v in values)
+    if op == "$options":
+        return True
+    if op == "$not":
+        return not _match_condition(value, arg)
+    raise OperationFailure(f"unknown operator: {op}")
+
+
+def _match_condition(value: Any, cond: Any) -> bool:
+    if _is_operator_dict(cond):
+        return all(_match_operator(value, op, arg, cond) for op, arg in cond.items())
+    if isinstance(cond, re.Pattern):
+        return isinstance(value, str) and bool(cond.search(value))
+    return _equals(value, cond)
+
+
+class _TextQuery:
+    def __init__(self, search: str):
+        self.phrases = [p.lower() for p in re.findall(r'"([^"]+)"', search)]
+        rest = re.sub(r'"[^"]*"', " ", search)
+        self.excluded = {w for token in rest.split() if token.startswith("-") for w in _words(token)}
+        self.terms = {w for token in rest.split() if not token.startswith("-") for w in _words(token)}
+        for phrase in self.phrases:
+            self.terms.update(_words(phrase))
+
+    def matches(self, doc: dict, fields: Sequence[str]) -> bool:
+        text = " ".join(v for v in (_get(doc, f) for f in fields) if isinstance(v, str)).lower()
+        words = set(_words(text))
+        if words & self.excluded:
+            return False
+        if self.phrases:
+            return all(phrase in text for phrase in self.phrases)
+        return bool(words & self.terms)
+
+
+def _matches(doc: dict, query: dict, text_fields: Sequence[str] = ()) -> bool:
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(_matches(doc, c, text_fields) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, c, text_fields) for c in cond):
+                return False
+        elif key == "$nor":
+            if any(_matches(doc, c, text_fields) for c in cond):
+                return False
+        elif key == "$text":
+            if not _TextQuery(cond["$search"]).matches(doc, text_fields):
+                return False
+        elif not _match_condition(_get(doc, key), cond):
+            return False
+    return True
+
+
+# ============== Projection and updates ==============
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return _clone(doc)
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    # {"_id": 1} on its own is an inclusion projection too
+    if include or all(k == "_id" and v for k, v in projection.items()):
+        out = {}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        for field in include:
+            value = _get(doc, field)
+            if value is not _MISSING:
+                _set(out, field, _clone(value))
+        return out
+    out = _clone(doc)
+    for field, keep in projection.items():
+        if not keep:
+            _unset(out, field)
+    return out
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool) -> None:
+    if not _is_operator_dict(update):
+        raise OperationFailure("update document must contain only update operators")
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                _set(doc, path, _normalize(value))
+        elif op == "$setOnInsert":
+            continue
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op in ("$min", "$max"):
+            for path, value in fields.items():
+                value = _normalize(value)
+                current = _get(doc, path)
+                if (current is _MISSING
+                        or (op == "$min" and _component(value) < _component(current))
+                        or (op == "$max" and _component(value) > _component(current))):
+                    _set(doc, path, value)
+        elif op == "$unset":
+            for path in fields:
+                _unset(doc, path)
+        else:
+            raise OperationFailure(f"unsupported update operator: {op}")
+
+
+def _upsert_seed(query: dict) -> dict:
+    """Fields an upsert copies from its filter: plain equalities and ``$eq``."""
+    doc: dict = {}
+    for key, cond in query.items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(cond):
+            if "$eq" in cond:
+                _set(doc, key, _normalize(cond["$eq"]))
+        else:
+            _set(doc, key, _normalize(cond))
+    return doc
+
+
+# ============== Indexes ==============
+
+
+class _Index:
+    def __init__(self, name: str, fields: List[Tuple[str, Any]], unique: bool):
+        self.name = name
+        self.fields = [f for f, _ in fields]
+        self.directions = [d for _, d in fields]
+        self.unique = unique
+        self.expire_after: Optional[float] = None
+
+    def spec(self) -> dict:
+        info = {"key": list(zip(self.fields, self.directions))}
+        if self.unique:
+            info["unique"] = True
+        if self.expire_after is not None:
+            info["expireAfterSeconds"] = self.expire_after
+        return info
+
+
+class _HashIndex(_Index):
+    """Single-field unique index: value -> row id."""
+
+    def __init__(self, name, fields, unique=True):
+        super().__init__(name, fields, unique)
+        self.entries: Dict[Tuple[int, Any], int] = {}
+
+    def key(self, doc: dict) -> Tuple[int, Any]:
+        return _component(_get(doc, self.fields[0]))
+
+    def conflict(self, doc: dict, row: int) -> bool:
+        existing = self.entries.get(self.key(doc))
+        return existing is not None and existing != row
+
+    def add(self, doc, row):
+        self.entries[self.key(doc)] = row
+
+    def remove(self, doc, row):
+        key = self.key(doc)
+        if self.entries.get(key) == row:
+            del self.entries[key]
+
+
+class _SortedIndex(_Index):
+    """Compound (or non-unique) index: sorted list of flattened keys ending in the row id.
+
+    Keys are stored ascending whatever the declared directions. An in-order
+    walk serves all-ascending sorts and a reverse walk all-descending ones.
+    """
+
+    def __init__(self, name, fields, unique=False):
+        super().__init__(name, fields, unique)
+        self.keys: List[tuple] = []
+
+    def key(self, doc: dict, row: int) -> tuple:
+        return _sort_key(doc, self.fields) + (row,)
+
+    def conflict(self, doc: dict, row: int) -> bool:
+        if not self.unique:
+            return False
+        prefix = _sort_key(doc, self.fields)
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + (_MAX,))
+        return any(self.keys[i][-1] != row for i in range(lo, hi))
+
+    def add(self, doc, row):
+        bisect.insort(self.keys, self.key(doc, row))
+
+    def add_many(self, items: List[Tuple[dict, int]]) -> None:
+        # Timsort merges the new run into the sorted list in about linear time,
+        # instead of one list shift per document.
+        self.keys.extend(self.key(doc, row) for doc, row in items)
+        self.keys.sort()
+
+    def remove_many(self, items: List[Tuple[dict, int]]) -> None:
+        gone = {row for _, row in items}
+        self.keys = [key for key in self.keys if key[-1] not in gone]
+
+    def remove(self, doc, row):
+        key = self.key(doc, row)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def scan(self, lo: tuple, hi: tuple, reverse: bool) -> Iterator[int]:
+        start = bisect.bisect_left(self.keys, lo)
+        end = bisect.bisect_left(self.keys, hi)
+        keys = self.keys
+        if reverse:
+            for i in range(end - 1, start - 1, -1):
+                yield keys[i][-1]
+        else:
+            for i in range(start, end):
+                yield keys[i][-1]
+
+    def count(self, lo: tuple, hi: tuple) -> int:
+        return bisect.bisect_left(self.keys, hi) - bisect.bisect_left(self.keys, lo)
+
+
+class _TextIndex(_Index):
+    """Inverted index from lower-cased word to row ids."""
+
+    def __init__(self, name, fields, unique=False):
+        super().__init__(name, fields, unique)
+        self.postings: Dict[str, set] = {}
+
+    def _tokens(self, doc) -> set:
+        return {w for f in self.fields for w in _words(_get(doc, f))}
+
+    def conflict(self, doc, row):
+        return False
+
+    def add(self, doc, row):
+        for word in self._tokens(doc):
+            self.postings.setdefault(word, set()).add(row)
+
+    def remove(self, doc, row):
+        for word in self._tokens(doc):
+            rows = self.postings.get(word)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self.postings[word]
+
+
+def _bounds(query: dict, field: str) -> Tuple[tuple, tuple]:
+    """Key range ``[lo, hi)`` on ``field`` implied by ``query`` (top level and ``$or`` branches)."""
+    lo: tuple = ()
+    hi: tuple = (_MAX,)
+    cond = query.get(field, _MISSING)
+    if cond is not _MISSING:
+        if _is_operator_dict(cond):
+            for op, arg in cond.items():
+                if op in ("$eq", "$lt", "$lte", "$gt", "$gte"):
+                    op_lo, op_hi = _operator_bounds(op, arg)
+                    lo, hi = max(lo, op_lo), min(hi, op_hi)
+        else:
+            c = _component(cond)
+            lo, hi = max(lo, c), min(hi, c + (_MAX,))
+    for clause in query.get("$and", []):
+        c_lo, c_hi = _bounds(clause, field)
+        lo, hi = max(lo, c_lo), min(hi, c_hi)
+    branches = query.get("$or")
+    if branches:
+        ranges = [_bounds(branch, field) for branch in branches]
+        lo, hi = max(lo, min(r[0] for r in ranges)), min(hi, max(r[1] for r in ranges))
+    return lo, hi
+
+
+def _operator_bounds(op: str, arg: Any) -> Tuple[tuple, tuple]:
+    rank, value = _component(arg)
+    if op == "$eq":
+        return (rank, value), (rank, value, _MAX)
+    if op == "$lt":
+        return (rank,), (rank, value)
+    if op == "$lte":
+        return (rank,), (rank, value, _MAX)
+    if op == "$gt":
+        return (rank, value, _MAX), (rank, _MAX)
+    return (rank, value), (rank, _MAX)
+
+
+def _equality(query: dict, field: str) -> Any:
+    cond = query.get(field, _MISSING)
+    if cond is _MISSING:
+        return _MISSING
+    if _is_operator_dict(cond):
+        return cond.get("$eq", _MISSING)
+    if isinstance(cond, (list, dict, re.Pattern)):
+        return _MISSING
+    return cond
+
+
+def _in_values(query: dict, field: str) -> Optional[list]:
+    cond = query.get(field)
+    if _is_operator_dict(cond) and "$in" in cond and not isinstance(cond["$in"], dict):
+        return list(cond["$in"])
+    return None
+
+
+class _Plan:
+    def __init__(self, stage: str, rows: Iterable[int], index: Optional[str] = None, ordered: bool = False):
+        self.stage = stage
+        self.rows = rows
+        self.index = index
+        self.ordered = ordered
+
+    def explain(self, sorting: bool) -> dict:
+        plan = {"stage": self.stage} if self.index is None else {
+            "stage": "FETCH", "inputStage": {"stage": self.stage, "indexName": self.index}}
+        if sorting and not self.ordered:
+            plan = {"stage": "SORT", "inputStage": plan}
+        return plan
+
+
+# ============== Collection ==============
+
+
+class EmbeddedCollection:
+    def __init__(self, database: "EmbeddedDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[int, dict] = {}
+        self._next_row = itertools.count()
+        self._indexes: Dict[str, _Index] = {"_id_": _HashIndex("_id_", [("_id", 1)])}
+        self._last_sweep = time.monotonic()
+
+    # ---- indexes ----
+
+    async def create_indexes(self, models) -> List[str]:
+        return [self._create_index(list(m.document["key"].items()), **{
+            k: v for k, v in m.document.items() if k != "key"}) for m in models]
+
+    async def create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        return self._create_index(list(keys), **kwargs)
+
+    def _create_index(self, fields: List[Tuple[str, Any]], name: Optional[str] = None,
+                      unique: bool = False, **options) -> str:
+        name = name or "_".join(f"{f}_{d}" for f, d in fields)
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing.fields != [f for f, _ in fields] or existing.unique != unique:
+                raise OperationFailure(f"An index with name {name} already exists with a different spec",
+                                       code=86)
+            return name
+        if any(d == "text" for _, d in fields):
+            if any(isinstance(i, _TextIndex) for i in self._indexes.values()):
+                raise OperationFailure("only one text index per collection", code=85)
+            index: _Index = _TextIndex(name, [(f, d) for f, d in fields if d == "text"])
+        elif unique and len(fields) == 1:
+            index = _HashIndex(name, fields)
+        else:
+            index = _SortedIndex(name, fields, unique)
+        if isinstance(index, _SortedIndex) and not index.unique:
+            index.add_many([(doc, row) for row, doc in self._docs.items()])
+        else:
+            for row, doc in self._docs.items():
+                if index.conflict(doc, row):
+                    raise OperationFailure(f"E11000 duplicate key error building index {name}", code=DUPLICATE_KEY)
+                index.add(doc, row)
+        if "expireAfterSeconds" in options and isinstance(index, _SortedIndex) and len(fields) == 1:
+            index.expire_after = options["expireAfterSeconds"]
+        self._indexes[name] = index
+        return name
+
+    async def index_information(self) -> Dict[str, dict]:
+        return {name: index.spec() for name, index in self._indexes.items()}
+
+    async def drop_index(self, name: str) -> None:
+        if name == "_id_" or name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self._indexes[name]
+
+    def _text_index(self) -> Optional[_TextIndex]:
+        for index in self._indexes.values():
+            if isinstance(index, _TextIndex):
+                return index
+        return None
+
+    def _text_fields(self) -> Sequence[str]:
+        index = self._text_index()
+        return index.fields if index is not None else ()
+
+    def _expire(self) -> None:
+        """Remove documents whose TTL index date has passed, at most once per sweep interval."""
+        now = time.monotonic()
+        if now - self._last_sweep < TTL_SWEEP_SECONDS:
+            return
+        self._last_sweep = now
+        for index in list(self._indexes.values()):
+            if index.expire_after is None:
+                continue
+            cutoff = _normalize(datetime.utcnow() - timedelta(seconds=index.expire_after))
+            # Only date values expire, as in Mongo
+            lo, hi = _operator_bounds("$lt", cutoff)
+            self._remove_rows(list(index.scan(lo, hi, reverse=False)))
+
+    # ---- storage ----
+
+    def _check_unique(self, doc: dict, row: int) -> None:
+        for index in self._indexes.values():
+            if index.conflict(doc, row):
+                key = {f: _get(doc, f) for f in index.fields}
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.database.name}.{self.name} "
+                    f"index: {index.name} dup key: {key}",
+                    DUPLICATE_KEY, {"code": DUPLICATE_KEY, "keyPattern": dict(index.spec()["key"]), "keyValue": key},
+                )
+
+    def _insert(self, document: dict) -> Any:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        doc = _normalize(document)
+        row = next(self._next_row)
+        self._check_unique(doc, row)
+        self._docs[row] = doc
+        for index in self._indexes.values():
+            index.add(doc, row)
+        return doc["_id"]
+
+    def _remove(self, row: int) -> dict:
+        doc = self._docs.pop(row)
+        for index in self._indexes.values():
+            index.remove(doc, row)
+        return doc
+
+    def _insert_batch(self, documents: List[dict], ordered: bool) -> Tuple[List[Any], List[dict]]:
+        """Insert many documents, deferring sorted-index maintenance to one merge per index."""
+        sorted_indexes = [i for i in self._indexes.values() if isinstance(i, _SortedIndex)]
+        if len(documents) < _BATCH_THRESHOLD or any(i.unique for i in sorted_indexes):
+            ids, errors = [], []
+            for i, document in enumerate(documents):
+                try:
+                    ids.append(self._insert(document))
+                except DuplicateKeyError as exc:
+                    errors.append(_write_error(i, exc, document))
+                    if ordered:
+                        break
+            return ids, errors
+        others = [i for i in self._indexes.values() if not isinstance(i, _SortedIndex)]
+        ids, errors, added = [], [], []
+        for i, document in enumerate(documents):
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            doc = _normalize(document)
+            row = next(self._next_row)
+            try:
+                self._check_unique(doc, row)
+            except DuplicateKeyError as exc:
+                errors.append(_write_error(i, exc, document))
+                if ordered:
+                    break
+                continue
+            self._docs[row] = doc
+            for index in others:
+                index.add(doc, row)
+            added.append((doc, row))
+            ids.append(doc["_id"])
+        for index in sorted_indexes:
+            index.add_many(added)
+        return ids, errors
+
+    def _remove_rows(self, rows: List[int]) -> None:
+        if len(rows) < _BATCH_THRESHOLD:
+            for row in rows:
+                self._remove(row)
+            return
+        removed = [(self._docs.pop(row), row) for row in rows]
+        for index in self._indexes.values():
+            if isinstance(index, _SortedIndex):
+                index.remove_many(removed)
+            else:
+                for doc, row in removed:
+                    index.remove(doc, row)
+
+    def _replace(self, row: int, new: dict) -> None:
+        old = self._docs[row]
+        for index in self._indexes.values():
+            index.remove(old, row)
+        try:
+            self._check_unique(new, row)
+        except DuplicateKeyError:
+            for index in self._indexes.values():
+                index.add(old, row)
+            raise
+        self._docs[row] = new
+        for index in self._indexes.values():
+            index.add(new, row)
+
+    # ---- query planning ----
+
+    def _plan(self, query: dict, sort: Optional[List[Tuple[str, int]]]) -> _Plan:
+        """Pick the index that answers ``query`` (already normalized) with the fewest rows."""
+        if "$text" in query:
+            index = self._text_index()
+            if index is None:
+                raise OperationFailure("text index required for $text query", code=27)
+            terms = _TextQuery(query["$text"]["$search"]).terms
+            rows = set().union(*(index.postings.get(t, ()) for t in terms)) if terms else set()
+            return _Plan("TEXT_MATCH", sorted(rows), index.name)
+
+        for index in self._indexes.values():
+            if not isinstance(index, _HashIndex):
+                continue
+            field = index.fields[0]
+            value = _equality(query, field)
+            values = [value] if value is not _MISSING else _in_values(query, field)
+            if values is not None:
+                found = (index.entries.get(_component(v)) for v in values)
+                return _Plan("IXSCAN", sorted({row for row in found if row is not None}), index.name)
+
+        sort_fields = [f for f, _ in sort] if sort else []
+        sort_reverse = bool(sort) and all(d == -1 for _, d in sort)
+        sort_forward = bool(sort) and all(d == 1 for _, d in sort)
+        best = None
+        for index in self._indexes.values():
+            if not isinstance(index, _SortedIndex):
+                continue
+            prefix: tuple = ()
+            depth = 0
+            for field in index.fields:
+                value = _equality(query, field)
+                if value is _MISSING:
+                    break
+                prefix += _component(value)
+                depth += 1
+            rest = index.fields[depth:]
+            lo, hi = prefix, prefix + (_MAX,)
+            bounded = depth > 0
+            if rest:
+                r_lo, r_hi = _bounds(query, rest[0])
+                if r_lo != () or r_hi != (_MAX,):
+                    lo, hi = prefix + r_lo, prefix + r_hi
+                    bounded = True
+            ordered = bool(sort_fields) and rest[:len(sort_fields)] == sort_fields and (sort_forward or sort_reverse)
+            if not bounded and not ordered:
+                continue
+            count = index.count(lo, hi)
+            rank = (count if not ordered else count // 2, not ordered)
+            if best is None or rank < best[0]:
+                best = (rank, index, lo, hi, ordered)
+        if best is not None:
+            _, index, lo, hi, ordered = best
+            return _Plan("IXSCAN", index.scan(lo, hi, reverse=ordered and sort_reverse), index.name, ordered)
+        return _Plan("COLLSCAN", list(self._docs))
+
+    def _select(self, query: dict, sort, skip: int = 0, limit: int = 0) -> Tuple[List[int], _Plan]:
+        """Row ids matching ``query`` in ``sort`` order."""
+        self._expire()
+        norm = _normalize(query or {})
+        plan = self._plan(norm, sort)
+        text_fields = self._text_fields()
+        docs = self._docs
+        matching = (row for row in plan.rows if row in docs and _matches(docs[row], norm, text_fields))
+        if sort and not plan.ordered:
+            keys = [(f, d) for f, d in sort]
+
+            def order(row):
+                doc = docs[row]
+                return tuple(_Descending(_component(_get(doc, f))) if d == -1 else _component(_get(doc, f))
+                             for f, d in keys)
+
+            if limit:
+                rows = heapq.nsmallest(skip + limit, matching, key=order)
+            else:
+                rows = sorted(matching, key=order)
+            return rows[skip:], plan
+        end = skip + limit if limit else None
+        return list(itertools.islice(matching, skip, end)), plan
+
+    # ---- reads ----
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> "EmbeddedCursor":
+        cursor = EmbeddedCursor(self, filter or {}, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        if kwargs.get("skip"):
+            cursor.skip(kwargs["skip"])
+        return cursor
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        rows, _ = self._select(filter, None, kwargs.get("skip", 0), kwargs.get("limit", 0))
+        return len(rows)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        rows, _ = self._select(filter or {}, None)
+        seen: Dict[Tuple[int, Any], Any] = {}
+        for row in rows:
+            value = _get(self._docs[row], key)
+            for v in (value if isinstance(value, list) else [value]):
+                if v is not _MISSING:
+                    seen.setdefault(_component(v), v)
+        return [seen[k] for k in sorted(seen)]
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> "EmbeddedCursor":
+        return _AggregateCursor(self, pipeline)
+
+    # ---- writes ----
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        self._expire()
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        self._expire()
+        ids, errors = self._insert_batch(list(documents), ordered)
+        if errors:
+            raise BulkWriteError(_bulk_result(inserted=len(ids), errors=errors))
+        return InsertManyResult(ids, True)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        rows, _ = self._select(filter, None, limit=1)
+        self._remove_rows(rows)
+        return DeleteResult({"n": len(rows), "ok": 1.0}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        rows, _ = self._select(filter, None)
+        self._remove_rows(rows)
+        return DeleteResult({"n": len(rows), "ok": 1.0}, True)
+
+    def _update(self, filter: dict, update: dict, upsert: bool, multi: bool, replace: bool = False,
+                sort=None) -> Tuple[dict, Optional[dict], Optional[dict]]:
+        """Returns the raw result plus the first matched document before and after the change."""
+        rows, _ = self._select(filter, sort, limit=0 if multi else 1)
+        if not rows:
+            if not upsert:
+                return {"n": 0, "nModified": 0, "ok": 1.0}, None, None
+            doc = _upsert_seed(filter)
+            if replace:
+                doc = {**({"_id": doc["_id"]} if "_id" in doc else {}), **_normalize(update)}
+            else:
+                _apply_update(doc, update, inserting=True)
+            self._insert(doc)
+            return {"n": 1, "nModified": 0, "upserted": doc["_id"], "ok": 1.0}, None, _clone(doc)
+        modified = 0
+        before = after = None
+        for row in rows:
+            old = self._docs[row]
+            if replace:
+                new = {"_id": old["_id"], **_normalize(update)}
+            else:
+                new = _clone(old)
+                _apply_update(new, update, inserting=False)
+            if new != old:
+                self._replace(row, new)
+                modified += 1
+            if before is None:
+                before, after = _clone(old), _clone(new)
+        return {"n": len(rows), "nModified": modified, "ok": 1.0}, before, after
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=False)[0], True)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=True)[0], True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self._update(filter, replacement, upsert, multi=False, replace=True)[0], True)
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection: Optional[dict] = None,
+                                  sort=None, upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE, **kwargs):
+        _, before, after = self._update(filter, update, upsert, multi=False, sort=_sort_spec(sort))
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return _project(doc, projection) if doc is not None else None
+
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None, sort=None, **kwargs):
+        rows, _ = self._select(filter, _sort_spec(sort), limit=1)
+        if not rows:
+            return None
+        return _project(self._remove(rows[0]), projection)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        counts = {"inserted": 0, "matched": 0, "modified": 0, "removed": 0}
+        upserted, errors = [], []
+        for i, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    counts["inserted"] += 1
+                elif isinstance(request, (ReplaceOne, UpdateOne, UpdateMany)):
+                    raw, _, _ = self._update(request._filter, request._doc, request._upsert,
+                                             multi=isinstance(request, UpdateMany),
+                                             replace=isinstance(request, ReplaceOne))
+                    if "upserted" in raw:
+                        upserted.append({"index": i, "_id": raw["upserted"]})
+                    else:
+                        counts["matched"] += raw["n"]
+                        counts["modified"] += raw["nModified"]
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    rows, _ = self._select(request._filter, None, limit=1 if isinstance(request, DeleteOne) else 0)
+                    self._remove_rows(rows)
+                    counts["removed"] += len(rows)
+                else:
+                    raise TypeError(f"unsupported bulk operation: {request!r}")
+            except DuplicateKeyError as exc:
+                errors.append(_write_error(i, exc, request))
+                if ordered:
+                    break
+        result = _bulk_result(errors=errors, upserted=upserted, **counts)
+        if errors:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    async def drop(self) -> None:
+        self.database._collections.pop(self.name, None)
+
+
+def _write_error(index: int, exc: DuplicateKeyError, op: Any) -> dict:
+    return {"index": index, "code": DUPLICATE_KEY, "errmsg": str(exc),
+            "keyValue": (exc.details or {}).get("keyValue"), "op": op}
+
+
+def _bulk_result(inserted=0, matched=0, modified=0, removed=0, errors=(), upserted=()) -> dict:
+    return {
+        "writeErrors": list(errors), "writeConcernErrors": [], "nInserted": inserted,
+        "nUpserted": len(upserted), "nMatched": matched, "nModified": modified,
+        "nRemoved": removed, "upserted": list(upserted),
+    }
+
+
+def _sort_spec(key_or_list, direction=None) -> Optional[List[Tuple[str, int]]]:
+    if key_or_list is None:
+        return None
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return [(k, d) for k, d in key_or_list]
+
+
+class _Descending:
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+# ============== Cursors ==============
+
+
+class EmbeddedCursor:
+    def __init__(self, collection: EmbeddedCollection, filter: dict, projection: Optional[dict]):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort: Optional[List[Tuple[str, int]]] = None
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._pending: Optional[List[int]] = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None) -> "EmbeddedCursor":
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "EmbeddedCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "EmbeddedCursor":
+        self._limit = abs(limit)
+        return self
+
+    def batch_size(self, batch_size: int) -> "EmbeddedCursor":
+        self._batch_size = max(1, batch_size)
+        return self
+
+    def hint(self, index) -> "EmbeddedCursor":
+        return self
+
+    def max_time_ms(self, max_time_ms) -> "EmbeddedCursor":
+        return self
+
+    def allow_disk_use(self, allow_disk_use) -> "EmbeddedCursor":
+        return self
+
+    def _rows(self) -> List[int]:
+        rows, _ = self._collection._select(self._filter, self._sort, self._skip, self._limit)
+        return rows
+
+    def _fetch(self, rows: Iterable[int]) -> List[dict]:
+        docs = self._collection._docs
+        return [_project(docs[row], self._projection) for row in rows if row in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        if self._pending is None:
+            rows = self._rows()
+        else:
+            rows = self._pending[self._position:]
+            self._position = len(self._pending)
+        if length:
+            rows = rows[:length]
+        return self._fetch(rows)
+
+    async def explain(self) -> dict:
+        _, plan = self._collection._select(self._filter, self._sort, self._skip, self._limit)
+        return {"queryPlanner": {"winningPlan": plan.explain(bool(self._sort))}}
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._pending is None:
+            # Snapshot the matching row ids; documents are read batch by batch,
+            # skipping rows deleted in the meantime.
+            self._pending = self._rows()
+        while self._position < len(self._pending):
+            if self._position and self._position % self._batch_size == 0:
+                await asyncio.sleep(0)
+            row = self._pending[self._position]
+            self._position += 1
+            doc = self._collection._docs.get(row)
+            if doc is not None:
+                return _project(doc, self._projection)
+        raise StopAsyncIteration
+
+
+class _AggregateCursor:
+    def __init__(self, collection: EmbeddedCollection, pipeline: List[dict]):
+        self._collection = collection
+        self._pipeline = pipeline
+        self._results: Optional[List[dict]] = None
+        self._position = 0
+
+    def _run(self) -> List[dict]:
+        stages = list(self._pipeline)
+        query: dict = {}
+        if stages and "$match" in stages[0]:
+            query = stages.pop(0)["$match"]
+        rows, _ = self._collection._select(query, None)
+        docs = [self._collection._docs[row] for row in rows]
+        for stage in stages:
+            (name, spec), = stage.items()
+            if name == "$match":
+                norm = _normalize(spec)
+                docs = [d for d in docs if _matches(d, norm, self._collection._text_fields())]
+            elif name == "$group":
+                docs = _group(docs, spec)
+            elif name == "$sort":
+                for field, direction in reversed(list(spec.items())):
+                    docs = sorted(docs, key=lambda d: _component(_get(d, field)), reverse=direction == -1)
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$project":
+                docs = [_aggregate_project(d, spec) for d in docs]
+            elif name == "$count":
+                docs = [{spec: len(docs)}] if docs else []
+            else:
+                raise OperationFailure(f"unsupported aggregation stage: {name}")
+        return [_clone(d) for d in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        if self._results is None:
+            self._results = self._run()
+        rows = self._results[self._position:]
+        self._position = len(self._results)
+        return rows[:length] if length else rows
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._results is None:
+            self._results = self._run()
+        if self._position >= len(self._results):
+            raise StopAsyncIteration
+        self._position += 1
+        return self._results[self._position - 1]
+
+
+def _evaluate(expr: Any, doc: dict) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, list):
+        return [_evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if not _is_operator_dict(expr):
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+    (op, args), = expr.items()
+    if op == "$literal":
+        return args
+    values = [_evaluate(a, doc) for a in (args if isinstance(args, list) else [args])]
+    if op == "$cond":
+        condition, then, otherwise = values
+        return then if condition else otherwise
+    if op == "$isNumber":
+        return isinstance(values[0], (int, float)) and not isinstance(values[0], bool)
+    if any(v is None for v in values) and op not in ("$ifNull", "$eq", "$ne"):
+        return None
+    if op == "$arrayElemAt":
+        array, index = values
+        if not isinstance(index, int) or isinstance(index, bool):
+            raise OperationFailure("$arrayElemAt's second argument must be an integer")
+        return array[index] if -len(array) <= index < len(array) else None
+    if op == "$subtract":
+        a, b = values
+        if isinstance(a, datetime) and isinstance(b, datetime):
+            return (a - b) // timedelta(milliseconds=1)
+        if isinstance(a, datetime):
+            return a - timedelta(milliseconds=b)
+        return a - b
+    if op == "$add":
+        dates = [v for v in values if isinstance(v, datetime)]
+        total = sum(v for v in values if not isinstance(v, datetime))
+        return dates[0] + timedelta(milliseconds=total) if dates else total
+    if op == "$mod":
+        a, b = values
+        if isinstance(a, int) and isinstance(b, int):
+            # Truncated remainder (sign of the dividend), as in Mongo
+            return (abs(a) % abs(b)) * (1 if a >= 0 else -1)
+        return math.fmod(a, b)
+    if op == "$multiply":
+        result = 1
+        for v in values:
+            result *= v
+        return result
+    if op == "$divide":
+        return values[0] / values[1]
+    if op == "$ifNull":
+        return next((v for v in values if v is not None), None)
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$ne":
+        return values[0] != values[1]
+    if op == "$toLower":
+        return str(values[0]).lower()
+    raise OperationFailure(f"unsupported aggregation expression: {op}")
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _group(docs: List[dict], spec: dict) -> List[dict]:
+    accumulators = [(field, *next(iter(acc.items()))) for field, acc in spec.items() if field != "_id"]
+    groups: Dict[Any, dict] = {}
+    for doc in docs:
+        key = _evaluate(spec["_id"], doc)
+        out = groups.get(_freeze(key))
+        if out is None:
+            out = groups[_freeze(key)] = {"_id": key}
+            for field, op, _ in accumulators:
+                out[field] = {"$sum": 0, "$push": [], "$addToSet": [], "$avg": [0, 0]}.get(op, _MISSING)
+                if isinstance(out[field], list):
+                    out[field] = list(out[field])
+        for field, op, expr in accumulators:
+            value = _evaluate(expr, doc)
+            current = out[field]
+            if op == "$sum":
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    out[field] = current + value
+            elif op in ("$min", "$max"):
+                if value is not None and (
+                    current is _MISSING
+                    or (op == "$min" and _component(value) < _component(current))
+                    or (op == "$max" and _component(value) > _component(current))
+                ):
+                    out[field] = value
+            elif op == "$first":
+                if current is _MISSING:
+                    out[field] = value
+            elif op == "$last":
+                out[field] = value
+            elif op == "$push":
+                current.append(value)
+            elif op == "$addToSet":
+                if value not in current:
+                    current.append(value)
+            elif op == "$avg":
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    current[0] += value
+                    current[1] += 1
+            else:
+                raise OperationFailure(f"unsupported accumulator: {op}")
+    results = list(groups.values())
+    for out in results:
+        for field, op, _ in accumulators:
+            if op == "$avg":
+                total, n = out[field]
+                out[field] = total / n if n else None
+            elif out[field] is _MISSING:
+                out[field] = None
+    return results
+
+
+def _aggregate_project(doc: dict, spec: dict) -> dict:
+    if all(v in (0, 1, True, False) for v in spec.values()):
+        return _project(doc, spec)
+    out = {"_id": doc.get("_id")} if spec.get("_id", 1) else {}
+    for field, expr in spec.items():
+        if field == "_id":
+            continue
+        out[field] = _get(doc, field) if expr in (1, True) else _evaluate(expr, doc)
+    return out
+
+
+# ============== Database ==============
+
+
+class EmbeddedDatabase:
+    """Collections are created on first access, as in Mongo."""
+
+    def __init__(self, name: str = "impacts"):
+        self.name = name
+        self._collections: Dict[str, EmbeddedCollection] = {}
+
+    def __getitem__(self, name: str) -> EmbeddedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = EmbeddedCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> EmbeddedCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str) -> EmbeddedCollection:
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    async def drop_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, command, **kwargs) -> dict:
+        if command in ("ping", {"ping": 1}):
+            return {"ok": 1.0}
+        raise OperationFailure(f"unsupported command: {command}")
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        """Deep copy of every collection's documents, for debugging and parity checks."""
+        return {name: copy.deepcopy(list(c._docs.values())) for name, c in self._collections.items()}
@@ -0,0 +1,62 @@
+"""Strong ETags and ``If-None-Match`` handling for the admin read endpoints.
+
+Tags are derived from a cheap fingerprint of the collection rather than from
+the response body: the document count plus the sort key of the newest
+document, both answered from metadata and the timestamp index. Together with
+the request parameters that shape the page this pins down the exact bytes
+the endpoint would return, so a matching tag can be answered with 304
+before running the page query or serializing anything.
+"""
+import hashlib
+from typing import Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+ETAG_HEADER = "ETag"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def matched_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The entry of an ``If-None-Match`` header matching ``etag`` (weak comparison, RFC 9110), or None.
+
+    The entry is returned as the client sent it, so ``W/`` shows that the
+    client holds the compressed representation.
+    """
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == etag:
+            return candidate
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an ``If-None-Match`` header against ``etag`` (weak comparison, RFC 9110)."""
+    return matched_etag(if_none_match, etag) is not None
+
+
+async def collection_version(collection, sort: Sequence[Tuple[str, int]]) -> str:
+    """Fingerprint that changes whenever a document is added to or removed from ``collection``.
+
+    Documents are never updated in place and their timestamps are assigned by
+    the server, so every insert moves the newest sort key and every delete
+    moves the count.
+    """
+    fields = {name: 1 for name, _ in sort}
+    newest = await collection.find_one({}, {"_id": 0, **fields}, sort=list(sort))
+    count = await collection.estimated_document_count()
+    if newest is None:
+        return "0"
+    return ":".join([str(count)] + [str(newest.get(name)) for name, _ in sort])
+
+
+def not_modified(etag: str) -> Response:
+    """304 carrying the tag and ``Vary`` the 200 would have had; JSON responses vary by compression."""
+    return Response(status_code=304, headers={ETAG_HEADER: etag, "Vary": "Accept-Encoding"})
@@ -0,0 +1,38 @@
+"""Query filters for the contact listing.
+
+Every filter is an equality or a ``created_at`` range, so any combination
+is served by one of the ``<field>_created_at_id`` compound indexes. The
+index also returns rows already in the listing's newest-first order, so the
+keyset pagination in ``pagination.py`` still seeks instead of sorting.
+Free-text search goes through the ``name_message_text`` index, and its matches
+are then sorted newest first.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def contact_filter(
+    service: Optional[str] = None,
+    budget: Optional[str] = None,
+    email: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the Mongo filter for GET /api/contact; ``since`` is inclusive, ``until`` exclusive."""
+    query: Dict[str, Any] = {}
+    if service is not None:
+        query["service"] = service
+    if budget is not None:
+        query["budget"] = budget
+    if email is not None:
+        query["email"] = email
+    if since is not None or until is not None:
+        created_at = query["created_at"] = {}
+        if since is not None:
+            created_at["$gte"] = since
+        if until is not None:
+            created_at["$lt"] = until
+    if q:
+        query["$text"] = {"$search": q}
+    return query
@@ -0,0 +1,288 @@
+"""``Idempotency-Key`` support for the public POST endpoints.
+
+Mobile clients retry a POST whenever the response is lost. Without a key,
+every retry stores another contact or counts another status ping. A client
+that sends ``Idempotency-Key: <any unique string>`` instead gets the
+original response back for every retry. The retry does not reach the
+handler or the main collections. In ``server.py`` the middleware sits
+inside the per-IP bucket, so a flood of freshly keyed requests is shed
+before any key is claimed. It sits outside the per-email bucket and the
+duplicate check, so a replay spends no email token and is not a duplicate.
+
+:class:`IdempotencyMiddleware` handles a keyed request in this order:
+
+1. **In-process LRU.** A completed response for the key is replayed from
+   memory, with no database round trip.
+2. **In-flight requests in this worker.** A retry that arrives while the
+   first request is still running waits for it and replays its response.
+3. **Claim in the store.** The key is inserted into the ``idempotency_keys``
+   collection as ``pending``. Only one worker's insert can succeed on
+   ``_id``. A worker that loses finds either the completed response, which
+   it replays, or a pending claim. For a pending claim it polls for up to
+   ``wait`` seconds and then answers ``409`` with ``Retry-After``.
+
+Responses with status below 500 are stored, except ``408`` and ``429``.
+They are kept for ``ttl`` seconds under a TTL index. On a 5xx, or when the
+handler raises, the claim is released, so the retry runs again. A claim left
+by a worker that died expires after ``lock_timeout`` and can be taken over.
+
+The body has to be buffered to be hashed, so keyed requests whose body is
+larger than ``max_body`` are refused with ``413`` before it is read. The
+public POST models accept a few kilobytes at most.
+
+The key is bound to the request it was first used with, meaning the method,
+path and a hash of the body. Reusing it for a different payload gets
+``422``. This also stops a guessed key from replaying somebody else's
+response.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+MAX_KEY_LENGTH = 255
+MAX_BODY_SIZE = 64 * 1024
+# Responses that are worth replaying: anything but server errors and "try again later"
+_NOT_STORED = frozenset({408, 429})
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class IdempotencyStore:
+    """Completed responses in a TTL-indexed collection, fronted by an in-process LRU.
+
+    ``outcomes`` counts keyed requests by what happened to them (``stored``, ``replayed``, ...).
+    """
+
+    def __init__(self, db, ttl: float = 24 * 3600, lock_timeout: float = 60.0, max_entries: int = 10_000):
+        self.db = db
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.max_entries = max_entries
+        self.outcomes: Dict[str, int] = {}
+        self._recent: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+
+    @property
+    def collection(self):
+        return self.db[IDEMPOTENCY_COLLECTION]
+
+    def recent(self, key: str) -> Optional[StoredResponse]:
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._recent[key]
+            return None
+        self._recent.move_to_end(key)
+        return response
+
+    def remember(self, key: str, response: StoredResponse, ttl: Optional[float] = None) -> None:
+        self._recent[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), response)
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[Optional[str], Optional[dict]]:
+        """Claim ``key``; returns (token, None) when claimed, else (None, the existing document)."""
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        claim = {"fingerprint": fingerprint, "state": "pending", "claim": token,
+                 "expire_at": now + timedelta(seconds=self.lock_timeout)}
+        try:
+            await self.collection.insert_one({"_id": key, **claim})
+            return token, None
+        except DuplicateKeyError:
+            pass
+        # A claim whose worker died is taken over once its lock has timed out
+        taken = await self.collection.update_one(
+            {"_id": key, "state": "pending", "expire_at": {"$lte": now}}, {"$set": claim})
+        if taken.modified_count:
+            return token, None
+        existing = await self.collection.find_one({"_id": key})
+        if existing is None:
+            # Released between the insert and the lookup
+            return await self.claim(key, fingerprint)
+        return None, existing
+
+    async def complete(self, key: str, token: str, response: StoredResponse) -> None:
+        expire_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        await self.collection.update_one({"_id": key, "claim": token}, {
+            "$set": {"state": "done", "status": response.status, "body": response.body,
+                     "headers": [[n.decode("latin-1"), v.decode("latin-1")] for n, v in response.headers],
+                     "expire_at": expire_at},
+            "$unset": {"claim": ""},
+        })
+        self.remember(key, response)
+
+    async def release(self, key: str, token: str) -> None:
+        await self.collection.delete_one({"_id": key, "claim": token})
+
+    def load(self, key: str, doc: dict) -> StoredResponse:
+        """StoredResponse for a completed document, also kept in the LRU for the rest of its TTL."""
+        response = StoredResponse(
+            doc["fingerprint"], doc["status"],
+            [(n.encode("latin-1"), v.encode("latin-1")) for n, v in doc["headers"]], bytes(doc["body"]),
+        )
+        remaining = (doc["expire_at"] - datetime.utcnow()).total_seconds()
+        if remaining > 0:
+            self.remember(key, response, remaining)
+        return response
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, store: IdempotencyStore, paths: Iterable[str], wait: float = 5.0,
+                 poll_interval: float = 0.05, max_body: int = MAX_BODY_SIZE):
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+        self.max_body = max_body
+        # How long a retry waits for a request still running in another worker before answering 409
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        key = None
+        content_length = None
+        for name, value in scope.get("headers", ()):
+            if name == b"idempotency-key":
+                key = value.decode("latin-1").strip()
+            elif name == b"content-length":
+                content_length = value
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._error(send, "invalid", 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body:
+            await self._error(send, "too_large", 413, f"Request body exceeds {self.max_body} bytes")
+            return
+
+        body, disconnected = await self._read_body(receive, self.max_body)
+        if disconnected:
+            return
+        if body is None:
+            # No or a wrong Content-Length; the limit was only found while reading
+            await self._error(send, "too_large", 413, f"Request body exceeds {self.max_body} bytes")
+            return
+        record = f"{scope['path']} {key}"
+        fingerprint = hashlib.blake2b(b"POST " + scope["path"].encode() + b"\n" + body, digest_size=16).hexdigest()
+
+        deadline = time.monotonic() + self.wait
+        while True:
+            response = self.store.recent(record)
+            if response is not None:
+                await self._replay(send, response, fingerprint, "replayed")
+                return
+            pending = self._inflight.get(record)
+            if pending is not None:
+                # Same worker: wait for the first request instead of polling the store
+                await asyncio.shield(pending)
+                continue
+            token, existing = await self.store.claim(record, fingerprint)
+            if token is not None:
+                break
+            if existing["state"] == "done":
+                await self._replay(send, self.store.load(record, existing), fingerprint, "replayed_from_store")
+                return
+            if existing["fingerprint"] != fingerprint:
+                await self._error(send, "mismatch", 422, "Idempotency-Key was already used with a different request")
+                return
+            if time.monotonic() >= deadline:
+                await self._error(send, "in_progress", 409,
+                                  "A request with this Idempotency-Key is still in progress", retry_after=1)
+                return
+            await asyncio.sleep(self.poll_interval)
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[record] = done
+        try:
+            await self._execute(scope, body, send, record, token, fingerprint)
+        finally:
+            del self._inflight[record]
+            done.set_result(None)
+
+    async def _execute(self, scope, body: bytes, send, record: str, token: str, fingerprint: str) -> None:
+        start = None
+        chunks: List[bytes] = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            await self.store.release(record, token)
+            raise
+        status = start["status"] if start is not None else 500
+        if status >= 500 or status in _NOT_STORED:
+            await self.store.release(record, token)
+            self._count("not_stored")
+            return
+        headers = [(n, v) for n, v in start.get("headers", []) if n.lower() != b"content-length"]
+        await self.store.complete(record, token, StoredResponse(fingerprint, status, headers, b"".join(chunks)))
+        self._count("stored")
+
+    @staticmethod
+    async def _read_body(receive, limit: int) -> Tuple[Optional[bytes], bool]:
+        """Returns (body, disconnected); body is None once more than ``limit`` bytes arrived."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return b"", True
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                return None, False
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks), False
+
+    async def _replay(self, send, response: StoredResponse, fingerprint: str, outcome: str) -> None:
+        if response.fingerprint != fingerprint:
+            await self._error(send, "mismatch", 422, "Idempotency-Key was already used with a different request")
+            return
+        self._count(outcome)
+        headers = response.headers + [(b"content-length", str(len(response.body)).encode()),
+                                      (b"idempotent-replayed", b"true")]
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+    async def _error(self, send, outcome: str, status: int, detail: str, retry_after: Optional[int] = None) -> None:
+        self._count(outcome)
+        headers = [(b"content-type", b"application/json")]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+    def _count(self, outcome: str) -> None:
+        outcomes = self.store.outcomes
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
@@ -0,0 +1,210 @@
+"""Index declarations for every Mongo collection the API touches.
+
+``INDEXES`` is the single source of truth for what each collection needs;
+``ensure_indexes`` applies it at startup. ``ROUTE_QUERIES`` mirrors the
+query shape issued by each route so that ``verify_query_plans`` can run
+``explain()`` on them and flag any that would fall back to a collection scan.
+
+Run ``python indexes.py`` against a local mongod (``MONGO_URL``/``DB_NAME``)
+to create the indexes and check every plan; it exits non-zero if any route
+query is not served by an index. With ``CONTACT_STORAGE=compact`` the
+contact indexes and queries are translated to the compact layout first.
+``tests/test_indexes.py`` runs the same check on the embedded engine.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from filters import contact_filter
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "contacts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        # Listing filters: equality prefix, then the newest-first keyset order
+        IndexModel([("service", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="service_created_at_id"),
+        IndexModel([("budget", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="budget_created_at_id"),
+        IndexModel([("email", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="email_created_at_id"),
+        IndexModel([("service", ASCENDING), ("budget", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="service_budget_created_at_id"),
+        IndexModel([("name", TEXT), ("message", TEXT)], name="name_message_text"),
+        # Covers the stats aggregation: range on created_at, group on service/budget
+        IndexModel([("created_at", ASCENDING), ("service", ASCENDING), ("budget", ASCENDING)],
+                   name="created_at_service_budget"),
+    ],
+    "newsletters": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("subscribed_at", DESCENDING), ("id", DESCENDING)], name="subscribed_at_id"),
+    ],
+    # Per-minute ping rollups and latest ping per client (see status_rollup.py);
+    # expire_at already includes the retention, hence expireAfterSeconds=0
+    "status_checks": [
+        IndexModel([("client_name", ASCENDING), ("minute", ASCENDING)], name="client_name_minute_unique", unique=True,
+                   partialFilterExpression={"minute": {"$exists": True}}),
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    # Notification outbox (see notifications.py): one index per branch of the claim query
+    "outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        IndexModel([("claim", ASCENDING)], name="claim"),
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    "status_clients": [
+        IndexModel([("client_name", ASCENDING)], name="client_name_unique", unique=True),
+        IndexModel([("timestamp", ASCENDING), ("client_name", ASCENDING)], name="timestamp_client_name"),
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+    # Stored responses for Idempotency-Key retries (see idempotency.py); looked up by _id only
+    "idempotency_keys": [
+        IndexModel([("expire_at", ASCENDING)], name="expire_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+class RouteQuery(NamedTuple):
+    """The filter/sort a route sends to Mongo, with placeholder values."""
+
+    route: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Sequence[Tuple[str, int]]] = None
+
+
+_SAMPLE_TIME = datetime(2024, 1, 1)
+_SAMPLE_FILTERS: Dict[str, Any] = {
+    "service": "seo",
+    "budget": "3k-5k",
+    "email": "x@example.com",
+    "since": _SAMPLE_TIME,
+    "until": _SAMPLE_TIME,
+    "q": "marketing",
+}
+
+ROUTE_QUERIES: List[RouteQuery] = [
+    RouteQuery("GET /api/contact", "contacts", {},
+               [("created_at", DESCENDING), ("id", DESCENDING)]),
+    RouteQuery("GET /api/contact?after=", "contacts",
+               {"$or": [{"created_at": {"$lt": _SAMPLE_TIME}},
+                        {"created_at": _SAMPLE_TIME, "id": {"$lt": "x"}}]},
+               [("created_at", DESCENDING), ("id", DESCENDING)]),
+    *(
+        RouteQuery(f"GET /api/contact?{'&'.join(names)}", "contacts",
+                   contact_filter(**{name: _SAMPLE_FILTERS[name] for name in names}),
+                   [("created_at", DESCENDING), ("id", DESCENDING)])
+        for size in range(1, len(_SAMPLE_FILTERS) + 1)
+        for names in itertools.combinations(_SAMPLE_FILTERS, size)
+    ),
+    RouteQuery("GET /api/contact/export?since=", "contacts",
+               {"created_at": {"$gte": _SAMPLE_TIME}}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    RouteQuery("GET /api/contact/stats", "contacts",
+               {"created_at": {"$gte": _SAMPLE_TIME, "$lt": _SAMPLE_TIME}}),
+    RouteQuery("GET /api/contact/{id}", "contacts", {"id": "x"}),
+    RouteQuery("DELETE /api/contact/{id}", "contacts", {"id": "x"}),
+    RouteQuery("POST /api/contact/bulk-delete", "contacts", {"id": {"$in": ["x", "y"]}}),
+    RouteQuery("POST /api/contact/bulk-delete (filter)", "contacts",
+               {"created_at": {"$lt": _SAMPLE_TIME}, "service": "seo"}),
+    RouteQuery("POST /api/contact/bulk-delete (before)", "contacts", {"created_at": {"$lt": _SAMPLE_TIME}}),
+    RouteQuery("POST /api/newsletter", "newsletters", {"email": "x@example.com"}),
+    RouteQuery("GET /api/newsletter", "newsletters", {},
+               [("subscribed_at", DESCENDING), ("id", DESCENDING)]),
+    RouteQuery("GET /api/newsletter?after=", "newsletters",
+               {"$or": [{"subscribed_at": {"$lt": _SAMPLE_TIME}},
+                        {"subscribed_at": _SAMPLE_TIME, "id": {"$lt": "x"}}]},
+               [("subscribed_at", DESCENDING), ("id", DESCENDING)]),
+    RouteQuery("GET /api/newsletter/export?since=", "newsletters",
+               {"subscribed_at": {"$gte": _SAMPLE_TIME}}, [("subscribed_at", ASCENDING), ("id", ASCENDING)]),
+    RouteQuery("DELETE /api/newsletter/{email}", "newsletters", {"email": "x@example.com"}),
+    RouteQuery("POST /api/newsletter/bulk-unsubscribe", "newsletters",
+               {"email": {"$in": ["x@example.com", "y@example.com"]}}),
+    RouteQuery("POST /api/newsletter/bulk-unsubscribe (before)", "newsletters",
+               {"subscribed_at": {"$lt": _SAMPLE_TIME}}),
+    RouteQuery("POST /api/status (bucket)", "status_checks", {"client_name": "x", "minute": _SAMPLE_TIME}),
+    RouteQuery("POST /api/status (client)", "status_clients", {"client_name": "x"}),
+    RouteQuery("GET /api/status", "status_clients", {}, [("timestamp", DESCENDING), ("client_name", DESCENDING)]),
+    RouteQuery("GET /api/status (etag)", "status_clients", {}, [("timestamp", DESCENDING)]),
+    RouteQuery("GET /api/status/history", "status_checks",
+               {"client_name": "x", "minute": {"$gte": _SAMPLE_TIME, "$lt": _SAMPLE_TIME}}),
+    RouteQuery("outbox claim", "outbox",
+               {"$or": [{"status": "pending", "next_attempt_at": {"$lte": _SAMPLE_TIME}},
+                        {"status": "sending", "lease_until": {"$lte": _SAMPLE_TIME}}]},
+               [("next_attempt_at", ASCENDING)]),
+    RouteQuery("outbox claimed batch", "outbox", {"claim": "x"}),
+    RouteQuery("idempotency key takeover", "idempotency_keys",
+               {"_id": "x", "state": "pending", "expire_at": {"$lte": _SAMPLE_TIME}}),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create every declared index. Existing indexes are left untouched."""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as exc:
+            # Most likely pre-existing duplicates blocking a unique index; keep
+            # serving and let the operator clean up rather than failing startup.
+            logger.error("Could not create indexes on %s: %s", collection, exc)
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def verify_query_plans(db) -> List[str]:
+    """Explain every route query and return a description of each COLLSCAN."""
+    failures = []
+    for query in ROUTE_QUERIES:
+        cursor = db[query.collection].find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(list(query.sort))
+        explain = await cursor.explain()
+        winning = explain["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(winning)
+        if "COLLSCAN" in stages:
+            failures.append(f"{query.route}: {' <- '.join(s for s in stages if s)}")
+    return failures
+
+
+async def _main() -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    try:
+        db = client[os.environ["DB_NAME"]]
+        if os.environ.get("CONTACT_STORAGE", "full").lower() == "compact":
+            # Same wrapping as the app, so indexes and plans use the compact field names
+            from server import database
+            database.use(db)
+            db = database
+        await ensure_indexes(db)
+        failures = await verify_query_plans(db)
+    finally:
+        client.close()
+    for failure in failures:
+        print(f"COLLSCAN  {failure}")
+    print(f"{len(ROUTE_QUERIES) - len(failures)}/{len(ROUTE_QUERIES)} route queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
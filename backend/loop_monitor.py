@@ -0,0 +1,103 @@
+"""Event-loop health: scheduling lag as a metric, and stack traces of blocking calls.
+
+Every handler runs on one event loop per worker, so any synchronous work
+that holds it delays every other request in flight. :class:`LoopMonitor`
+measures that directly:
+
+* A task sleeps for ``interval`` seconds and records how late it woke up as
+  ``event_loop_lag_seconds``. An idle, healthy loop reports well under a
+  millisecond.
+* With ``block_threshold`` set (debug mode), a watchdog thread checks the
+  task's heartbeat. When the loop has not run it for longer than the
+  threshold, the watchdog logs the loop thread's current stack, which is the
+  code holding the loop, while the stall is still going on. It logs once per
+  stall and counts it in ``event_loop_blocked_total``. Metrics are only
+  touched from the loop, so the count is handed to the loop with
+  ``call_soon_threadsafe`` and lands as soon as the stall ends.
+
+asyncio's own debug mode (``slow_callback_duration``) only reports after
+the fact and names the callback, not the line. It also slows every
+callback, so it is not used here.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "event_loop_lag_seconds", "Delay between when the loop monitor was due to run and when it ran.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "event_loop_blocked_total", "Times the event loop was held longer than the blocking threshold.")
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.1, block_threshold: Optional[float] = None):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._sample())
+        if self.block_threshold:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        while True:
+            due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            LOOP_LAG_SECONDS.observe(max(0.0, now - due))
+
+    def _watch(self) -> None:
+        # A heartbeat is expected every ``interval``; anything beyond that plus the threshold is a stall
+        limit = self.interval + self.block_threshold
+        reported = None
+        while not self._stopped.wait(self.block_threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled <= limit or reported == heartbeat:
+                continue
+            reported = heartbeat
+            try:
+                self._loop.call_soon_threadsafe(LOOP_BLOCKED.inc)
+            except RuntimeError:
+                # The loop closed under us; nothing left to count for
+                return
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+            logger.warning("Event loop blocked for %.0f ms so far; loop thread is at:\n%s", stalled * 1000, stack)
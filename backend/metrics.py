@@ -0,0 +1,301 @@
+"""In-process metrics with Prometheus text exposition.
+
+Everything here runs on the event loop thread, so counters and histograms
+are plain Python numbers updated without locks. Label sets are kept small
+and bounded: routes are labelled with their path template, never the raw
+URL.
+
+Three pieces fit together:
+
+* :class:`MetricsMiddleware` times every HTTP request and tracks in-flight
+  counts and status codes per route.
+* :func:`phase` and :func:`instrument_database` attribute time inside a
+  request to ``mongo``, ``validation`` and ``serialization``; the middleware
+  reports the per-request totals as ``http_request_phase_seconds``.
+* :data:`REGISTRY` renders all of it, plus any registered collectors, for
+  ``GET /metrics``.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def render(self):
+        lines = self.header()
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(self._sums[labels])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        """Register a callable producing metrics computed at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route, method and status code.", ("route", "method", "status"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+PHASE_SECONDS = REGISTRY.histogram(
+    "http_request_phase_seconds", "Time spent per request in mongo, validation and serialization.",
+    ("route", "method", "phase"))
+
+# ============== Phase timing ==============
+
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the wall time of the block to ``name`` for the current request."""
+    if _phases.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+class _TimedCursor:
+    """Motor cursor proxy that charges fetches to the ``mongo`` phase."""
+
+    _CHAINED = frozenset({"sort", "limit", "skip", "batch_size", "hint", "max_time_ms", "allow_disk_use"})
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in self._CHAINED:
+            return lambda *args, **kwargs: _TimedCursor(attr(*args, **kwargs))
+        return attr
+
+    async def to_list(self, length=None):
+        with phase("mongo"):
+            return await self._cursor.to_list(length)
+
+    async def explain(self):
+        with phase("mongo"):
+            return await self._cursor.explain()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        with phase("mongo"):
+            return await self._cursor.__anext__()
+
+
+class _TimedCollection:
+    _CURSORS = frozenset({"find", "aggregate"})
+    _AWAITABLE = frozenset({
+        "insert_one", "insert_many", "find_one", "find_one_and_update", "find_one_and_delete",
+        "update_one", "update_many", "delete_one", "delete_many", "replace_one", "bulk_write",
+        "count_documents", "estimated_document_count", "distinct", "create_index", "create_indexes",
+    })
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self._CURSORS:
+            return lambda *args, **kwargs: _TimedCursor(attr(*args, **kwargs))
+        if name in self._AWAITABLE:
+            async def timed(*args, **kwargs):
+                with phase("mongo"):
+                    return await attr(*args, **kwargs)
+            return timed
+        return attr
+
+
+class _TimedDatabase:
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, _TimedCollection] = {}
+
+    def __getitem__(self, name: str) -> _TimedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = _TimedCollection(self._database[name])
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+def instrument_database(database):
+    """Wrap a Motor database so collection calls are timed as the ``mongo`` phase."""
+    return _TimedDatabase(database)
+
+# ============== ASGI middleware ==============
+
+
+class MetricsMiddleware:
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        phases: Dict[str, float] = {}
+        token = _phases.set(phases)
+        IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec(method)
+            _phases.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(path, method, status)
+            REQUEST_SECONDS.observe(elapsed, path, method)
+            for name, seconds in phases.items():
+                PHASE_SECONDS.observe(seconds, path, method, name)
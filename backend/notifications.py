@@ -0,0 +1,235 @@
+"""Outbound notifications for new leads and subscribers, delivered off the request path.
+
+Handlers only write an event into the ``outbox`` collection next to the
+document they store. That is one more insert and no third-party call.
+:class:`OutboxDispatcher` runs in the background of every worker and
+delivers events in batches through a :class:`WebhookNotifier`:
+
+* **Claiming.** Due events are claimed with a lease (``status: "sending"``,
+  ``lease_until``) by a conditional ``update_many`` tagged with a per-batch
+  token. Workers that share the outbox therefore never deliver the same
+  batch twice. An event whose lease runs out (the worker died mid-delivery)
+  becomes due again.
+* **Bounded pool with backpressure.** Claimed batches go into a queue
+  holding at most ``concurrency`` batches, drained by ``concurrency``
+  delivery tasks. When the receiver is slow, claiming stops and events wait
+  in Mongo rather than in memory.
+* **Retries.** A failed batch goes back to ``pending`` with exponential
+  backoff. After ``max_attempts`` attempts, or on a 4xx answer, it is
+  parked as ``dead`` for an operator to look at. Delivery is
+  at-least-once: receivers dedupe on the event ``id``.
+
+Delivered and dead events carry an ``expire_at`` under a TTL index, so the
+outbox does not grow without bound. A change stream would avoid the extra
+insert, but it needs a replica set, which neither the embedded engine nor
+mongomock (nor a plain standalone mongod) has. The outbox works everywhere.
+"""
+import asyncio
+import json
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "outbox"
+# How long delivered and dead events are kept for inspection
+OUTBOX_RETENTION = timedelta(days=7)
+
+
+def outbox_event(kind: str, data: Dict[str, Any], now: Optional[datetime] = None) -> dict:
+    """Outbox document for a ``kind`` event (``contact.created``, ...) about ``data``."""
+    now = now or datetime.utcnow()
+    return {
+        "_id": str(uuid.uuid4()),
+        "type": kind,
+        "data": data,
+        "created_at": now,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+    }
+
+
+class DeliveryError(Exception):
+    """A batch could not be delivered; ``permanent`` failures are not retried."""
+
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class WebhookNotifier:
+    """POSTs ``{"events": [...]}`` to one URL. 5xx and network errors are retried, 4xx are not."""
+
+    def __init__(self, url: str, timeout: float = 5.0, client: Optional["httpx.AsyncClient"] = None):
+        # Imported here so workers without a webhook never load httpx
+        import httpx
+
+        self.url = url
+        self.client = client or httpx.AsyncClient(timeout=timeout)
+
+    async def deliver(self, events: List[dict]) -> None:
+        import httpx
+
+        body = json.dumps({"events": [
+            {"id": e["_id"], "type": e["type"], "created_at": e["created_at"], "data": e["data"]} for e in events
+        ]}, default=_json_default)
+        try:
+            response = await self.client.post(self.url, content=body, headers={"Content-Type": "application/json"})
+        except httpx.HTTPError as exc:
+            raise DeliveryError(f"{type(exc).__name__}: {exc}") from exc
+        if response.status_code >= 400:
+            raise DeliveryError(f"webhook answered {response.status_code}",
+                                permanent=response.status_code < 500 and response.status_code != 429)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        collection,
+        notifier,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        max_attempts: int = 8,
+        poll_interval: float = 1.0,
+        lease: float = 60.0,
+        backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ):
+        self.collection = collection
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.delivered = 0
+        self.failed = 0
+        self._batches: "asyncio.Queue[Optional[List[dict]]]" = asyncio.Queue(maxsize=concurrency)
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._claim_loop())]
+        self._tasks += [loop.create_task(self._deliver_loop()) for _ in range(self.concurrency)]
+
+    def wake(self) -> None:
+        """Called after an event is written so it is picked up without waiting for the next poll."""
+        self._wake.set()
+
+    async def close(self) -> None:
+        """Finish the batches already claimed, then stop; unclaimed events stay in the outbox."""
+        if not self._tasks:
+            return
+        self._closing = True
+        self._wake.set()
+        claimer, workers = self._tasks[0], self._tasks[1:]
+        await claimer
+        for _ in workers:
+            await self._batches.put(None)
+        await asyncio.gather(*workers)
+        self._tasks = []
+
+    async def _claim_loop(self) -> None:
+        while not self._closing:
+            # Cleared before claiming, so a wake-up during the claim is not lost
+            self._wake.clear()
+            try:
+                batch = await self._claim()
+            except Exception:
+                logger.exception("Could not claim outbox events")
+                batch = []
+            if batch:
+                # Blocks while every worker is busy and the queue is full: backpressure
+                await self._batches.put(batch)
+                if len(batch) == self.batch_size:
+                    continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> List[dict]:
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "lease_until": {"$lte": now}},
+        ]}
+        ids = [doc["_id"] async for doc in self.collection.find(due, {"_id": 1}).sort(
+            "next_attempt_at", 1).limit(self.batch_size)]
+        if not ids:
+            return []
+        token = str(uuid.uuid4())
+        # Re-checks the due condition, so ids another worker claimed in between are skipped
+        await self.collection.update_many(
+            {"_id": {"$in": ids}, **due},
+            {"$set": {"status": "sending", "claim": token, "lease_until": now + self.lease}},
+        )
+        return await self.collection.find({"claim": token}).to_list(self.batch_size)
+
+    async def _deliver_loop(self) -> None:
+        while True:
+            batch = await self._batches.get()
+            if batch is None:
+                return
+            try:
+                try:
+                    await self.notifier.deliver(batch)
+                except Exception as exc:
+                    await self._failed(batch, exc)
+                else:
+                    await self._delivered(batch)
+            except Exception:
+                # The lease runs out and the batch is claimed again
+                logger.exception("Could not record the outcome of %d outbox events", len(batch))
+
+    async def _delivered(self, batch: List[dict]) -> None:
+        now = datetime.utcnow()
+        await self.collection.update_many(
+            {"_id": {"$in": [e["_id"] for e in batch]}, "claim": batch[0]["claim"]},
+            {"$set": {"status": "sent", "sent_at": now, "expire_at": now + OUTBOX_RETENTION},
+             "$unset": {"claim": "", "lease_until": ""}, "$inc": {"attempts": 1}},
+        )
+        self.delivered += len(batch)
+
+    async def _failed(self, batch: List[dict], exc: Exception) -> None:
+        now = datetime.utcnow()
+        permanent = isinstance(exc, DeliveryError) and exc.permanent
+        writes = []
+        for event in batch:
+            attempts = event["attempts"] + 1
+            if permanent or attempts >= self.max_attempts:
+                update = {"$set": {"status": "dead", "error": str(exc), "expire_at": now + OUTBOX_RETENTION}}
+                self.failed += 1
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+                update = {"$set": {"status": "pending", "error": str(exc),
+                                   "next_attempt_at": now + timedelta(seconds=delay)}}
+            update["$set"]["attempts"] = attempts
+            update["$unset"] = {"claim": "", "lease_until": ""}
+            writes.append(UpdateOne({"_id": event["_id"], "claim": event["claim"]}, update))
+        logger.warning("Delivery of %d outbox events failed: %s", len(batch), exc)
+        await self.collection.bulk_write(writes, ordered=False)
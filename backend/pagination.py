@@ -0,0 +1,80 @@
+"""Keyset pagination helpers for the admin list endpoints.
+
+Pages are ordered newest-first on ``(<timestamp>, id)`` and the position of
+the last row is handed back to the client as an opaque cursor. Resuming from
+a cursor is a range seek on the matching compound index, so every page costs
+the same regardless of how deep into the collection it is.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Without ``limit`` a list returns what it returned before pagination existed (up to 1000 rows),
+# so clients that never look at X-Next-Cursor keep getting everything they used to
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, doc_id: str) -> str:
+    """Encode the sort key of the last row on a page as an opaque token."""
+    raw = json.dumps({"t": timestamp.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises a 400 ``HTTPException`` for anything that was not issued by us.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(field: str, after: Optional[str]) -> Dict[str, Any]:
+    """Build the query selecting rows strictly after ``after`` in sort order."""
+    if not after:
+        return {}
+    timestamp, doc_id = decode_cursor(after)
+    return {
+        "$or": [
+            {field: {"$lt": timestamp}},
+            {field: timestamp, "id": {"$lt": doc_id}},
+        ]
+    }
+
+
+async def fetch_page(
+    collection,
+    field: str,
+    limit: int,
+    after: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    filter: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one newest-first page of the documents matching ``filter``.
+
+    Returns the documents and the cursor for the next page, or ``None`` when
+    this was the last page. One extra row is read to detect the end without a
+    separate count query. ``filter`` must not use a top-level ``$or``; the
+    keyset condition occupies it.
+    """
+    query = {**(filter or {}), **keyset_filter(field, after)}
+    cursor = collection.find(query, projection).sort(
+        [(field, -1), ("id", -1)]
+    ).limit(limit + 1)
+    docs = await cursor.to_list(limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last[field], last["id"])
@@ -0,0 +1,325 @@
+"""Rate limiting and duplicate-submission shedding for the public POST endpoints.
+
+``POST /api/contact`` and ``POST /api/newsletter`` are unauthenticated, so a
+bot flood would otherwise cost one Mongo write per request.
+:class:`RateLimitMiddleware` sits in front of the app and rejects abusive
+requests before FastAPI parses or validates anything:
+
+1. a token bucket per client IP, checked from the connection alone;
+2. a token bucket per submitted email, read from the raw body with a single
+   JSON decode and no model validation;
+3. on routes with duplicate detection, a fingerprint of the canonical JSON
+   payload. An identical payload seen again within the window is dropped.
+   The fingerprint is released again unless the app answers 2xx, so a
+   submission that failed validation or hit a server error can be retried.
+
+Rate-limited requests get ``429`` with ``Retry-After``. Duplicates get
+``409``. The body is buffered once and replayed to the app, so a request
+that passes is handled exactly as before. A path's rules may be split
+across two instances sharing one limiter, so other middleware can run
+between the IP bucket and the body checks.
+
+Two backends share the interface, mirroring ``cache.py``:
+
+* :class:`MemoryLimiter` keeps buckets and fingerprints in bounded
+  in-process LRU maps. Each worker limits on its own, so with ``N`` workers
+  a client can get up to ``N`` times the configured rate.
+* :class:`RedisLimiter` keeps them on a Redis-protocol server shared by
+  every worker. The bucket refill and spend run in one Lua script, so it
+  costs one round trip per check.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Bodies larger than this are passed through unparsed; the models reject them anyway
+MAX_INSPECTED_BODY = 64 * 1024
+
+
+class Rate(NamedTuple):
+    """``burst`` requests at once, refilled at ``burst`` per ``period`` seconds."""
+
+    burst: int
+    period: float
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Rate"]:
+        """``"20/60"`` means 20 requests per 60 seconds; empty or ``"0"`` disables the rule."""
+        spec = spec.strip()
+        if not spec or spec == "0":
+            return None
+        burst, _, period = spec.partition("/")
+        return cls(int(burst), float(period or 1))
+
+    @property
+    def per_second(self) -> float:
+        return self.burst / self.period
+
+
+class Limiter:
+    """Backend interface. ``rejected`` counts requests shed per (path, rule)."""
+
+    def __init__(self):
+        self.rejected: Dict[Tuple[str, str], int] = {}
+
+    async def hit(self, key: str, rate: Rate) -> float:
+        """Spend one token from ``key``'s bucket; returns 0 if allowed, else seconds until the next token."""
+        raise NotImplementedError
+
+    async def first_seen(self, key: str, window: float) -> bool:
+        """Remember ``key`` for ``window`` seconds; False if it was already remembered."""
+        raise NotImplementedError
+
+    async def forget(self, key: str) -> None:
+        """Drop ``key`` remembered by :meth:`first_seen`."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class NullLimiter(Limiter):
+    """Limiting disabled: everything is allowed."""
+
+    async def hit(self, key, rate):
+        return 0.0
+
+    async def first_seen(self, key, window):
+        return True
+
+    async def forget(self, key):
+        pass
+
+
+class MemoryLimiter(Limiter):
+    def __init__(self, max_keys: int = 100_000):
+        super().__init__()
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    async def hit(self, key, rate):
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (rate.burst, now))
+        tokens = min(rate.burst, tokens + (now - updated) * rate.per_second)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate.per_second
+        # Re-inserted at the end, so the least recently seen client is evicted first
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def first_seen(self, key, window):
+        now = time.monotonic()
+        expires_at = self._seen.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+        self._seen.pop(key, None)
+        self._seen[key] = now + window
+        # Windows are equal, so insertion order is expiry order
+        while self._seen and (len(self._seen) > self.max_keys or next(iter(self._seen.values())) <= now):
+            self._seen.popitem(last=False)
+        return True
+
+    async def forget(self, key):
+        self._seen.pop(key, None)
+
+
+_TOKEN_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local burst, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisLimiter(Limiter):
+    """Buckets and fingerprints shared by every worker through a Redis-protocol server."""
+
+    def __init__(self, client, prefix: str = "impacts:ratelimit:"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self._token_bucket = client.register_script(_TOKEN_BUCKET)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisLimiter":
+        import redis.asyncio as redis
+
+        return cls(redis.from_url(url), **kwargs)
+
+    async def hit(self, key, rate):
+        wait = await self._token_bucket(keys=[self.prefix + key], args=[rate.burst, rate.per_second, time.time()])
+        return float(wait)
+
+    async def first_seen(self, key, window):
+        return bool(await self.client.set(self.prefix + key, b"1", nx=True, px=max(1, int(window * 1000))))
+
+    async def forget(self, key):
+        await self.client.delete(self.prefix + key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def build_limiter(backend: str, max_keys: int = 100_000, redis_url: Optional[str] = None) -> Limiter:
+    """Create the limiter selected by configuration (``memory``, ``redis`` or ``none``)."""
+    if backend == "none":
+        return NullLimiter()
+    if backend == "redis":
+        if not redis_url:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires REDIS_URL")
+        return RedisLimiter.from_url(redis_url)
+    if backend == "memory":
+        return MemoryLimiter(max_keys)
+    raise RuntimeError(f"Unknown rate limit backend: {backend}")
+
+
+class Guard(NamedTuple):
+    """Limits for one ``POST`` path."""
+
+    path: str
+    ip: Optional[Rate] = None
+    email: Optional[Rate] = None
+    # Drop identical payloads seen again within this many seconds; 0 disables it
+    duplicate_window: float = 0.0
+
+
+def _loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def _fingerprint(payload) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: Limiter, guards: Iterable[Guard], trust_forwarded: bool = False):
+        self.app = app
+        self.limiter = limiter
+        self.guards: Dict[str, Guard] = {g.path: g for g in guards}
+        # Only honour X-Forwarded-For behind a proxy that sets it; clients can forge it otherwise
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope, receive, send):
+        guard = self.guards.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if guard is None:
+            await self.app(scope, receive, send)
+            return
+
+        if guard.ip is not None:
+            wait = await self.limiter.hit(f"ip:{guard.path}:{self._client_ip(scope)}", guard.ip)
+            if wait:
+                await self._reject(send, guard, "ip", 429, "Too many requests", wait)
+                return
+
+        if guard.email is None and not guard.duplicate_window:
+            await self.app(scope, receive, send)
+            return
+        body, more_body, disconnected = await self._read_body(receive)
+        duplicate_key = None
+        payload = None
+        if not more_body and not disconnected:
+            try:
+                payload = _loads(body)
+            except ValueError:
+                pass
+        if isinstance(payload, dict):
+            email = payload.get("email")
+            if guard.email is not None and isinstance(email, str) and email:
+                wait = await self.limiter.hit(f"email:{guard.path}:{email.strip().lower()}", guard.email)
+                if wait:
+                    await self._reject(send, guard, "email", 429, "Too many requests", wait)
+                    return
+            if guard.duplicate_window:
+                duplicate_key = f"dup:{guard.path}:{_fingerprint(payload)}"
+                if not await self.limiter.first_seen(duplicate_key, guard.duplicate_window):
+                    await self._reject(send, guard, "duplicate", 409, "Duplicate submission")
+                    return
+        replay = self._replay(body, more_body, disconnected, receive)
+        if duplicate_key is None:
+            await self.app(scope, replay, send)
+            return
+
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, replay, send_wrapper)
+        finally:
+            # Only a stored submission counts as seen; a rejected or failed one may be sent again
+            if status is None or not 200 <= status < 300:
+                await self.limiter.forget(duplicate_key)
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _read_body(receive) -> Tuple[bytes, bool, bool]:
+        """Buffer up to ``MAX_INSPECTED_BODY`` bytes; returns (body, more_body, disconnected)."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return b"".join(chunks), False, True
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks), False, False
+            if size > MAX_INSPECTED_BODY:
+                return b"".join(chunks), True, False
+
+    @staticmethod
+    def _replay(body: bytes, more_body: bool, disconnected: bool, receive):
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                if disconnected:
+                    return {"type": "http.disconnect"}
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+
+        return replay
+
+    async def _reject(self, send, guard: Guard, rule: str, status: int, detail: str,
+                      retry_after: Optional[float] = None) -> None:
+        key = (guard.path, rule)
+        self.limiter.rejected[key] = self.limiter.rejected.get(key, 0) + 1
+        headers = [(b"content-type", b"application/json")]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(max(1, int(retry_after + 0.999))).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Production entry point: N uvicorn workers sharing one Mongo connection budget.
+
+    python serve.py --workers 4 --port 8001 --mongo-connection-budget 200
+
+Workers are separate processes with nothing shared in memory. Each one
+opens its own Motor pool in the app lifespan; the pool size is the total
+connection budget divided across workers, so scaling out does not
+multiply the load on Mongo. State that lives in-process (the memory cache,
+write-behind queues, metrics) is per worker. Use ``CACHE_BACKEND=redis`` when
+several workers should share cached reads.
+
+On SIGTERM or SIGINT each worker stops accepting connections, waits up to
+``--graceful-timeout`` seconds for in-flight requests to finish, then runs
+the lifespan shutdown. That drains the write-behind queues and closes the
+Mongo client.
+
+Behind a reverse proxy, pass the proxy's address as ``--forwarded-allow-ips``
+(``FORWARDED_ALLOW_IPS``). Uvicorn then takes the client address from
+``X-Forwarded-For``. Otherwise every request appears to come from the proxy,
+and the per-IP rate limit on the public POST endpoints applies to all
+visitors together.
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+def pool_size_per_worker(budget: int, workers: int) -> int:
+    return max(1, budget // max(1, workers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument(
+        "--mongo-connection-budget", type=int, default=int(os.environ.get("MONGO_CONNECTION_BUDGET", "100")),
+        help="total Mongo connections across all workers",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=float(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+        help="seconds to wait for in-flight requests on shutdown",
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips", default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="comma-separated proxy addresses trusted to set X-Forwarded-For, or '*'",
+    )
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    # Workers inherit the environment, so this sizes every worker's pool.
+    pool_size = pool_size_per_worker(args.mongo_connection_budget, args.workers)
+    os.environ["MONGO_MAX_POOL_SIZE"] = str(pool_size)
+    if int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")) > pool_size:
+        os.environ["MONGO_MIN_POOL_SIZE"] = str(pool_size)
+    if args.workers > 1 and os.environ.get("STORAGE_BACKEND", "mongo").lower() == "embedded":
+        logger.warning("STORAGE_BACKEND=embedded keeps data in-process; running 1 worker instead of %d",
+                       args.workers)
+        args.workers = 1
+    if args.workers > 1 and os.environ.get("CACHE_BACKEND", "memory").lower() == "memory":
+        logger.info("CACHE_BACKEND=memory with %d workers: each worker caches separately, "
+                    "cross-worker staleness is bounded by CACHE_TTL_SECONDS", args.workers)
+    if args.forwarded_allow_ips == "127.0.0.1":
+        logger.info("trusting X-Forwarded-For only from 127.0.0.1; behind a remote proxy set "
+                    "--forwarded-allow-ips, or per-IP rate limits apply to the proxy's address")
+    logger.info("starting %d workers with a Mongo pool of %d connections each", args.workers, pool_size)
+
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        lifespan="on",
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+    )
+
+
+if __name__ == "__main__":
+    main()
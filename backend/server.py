@@ -1,28 +1,169 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
+from bulk_delete import MAX_BULK_DELETE_KEYS, BulkDeleteResult, bulk_delete
+from bulk_import import BulkImportResult, import_subscribers, shutdown_validation_pool
+from cache import build_cache
+from compact import DocumentCodec
+from compression import CompressionMiddleware, Compressor, weak_etag
+from database import Database
+from etags import ETAG_HEADER, collection_version, etag_matches, make_etag, matched_etag, not_modified
+from filters import contact_filter
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from indexes import ensure_indexes
+from loop_monitor import LoopMonitor
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REGISTRY,
+    Counter,
+    MetricsMiddleware,
+    phase,
+)
+from pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    fetch_page,
+)
+from rate_limit import Guard, Rate, RateLimitMiddleware, build_limiter
+from stats import ContactStats, contact_stats, invalidate_stats
+from status_rollup import StatusHistory, latest_statuses, record_ping, status_history
+from serializers import RawJSONResponse, dump_document, dump_documents_async, projection_for
+from timebuckets import as_utc
+from write_queue import WriteBehindQueue
+
+# export and notifications are imported by the routes and startup hooks that use them
+if TYPE_CHECKING:
+    from notifications import OutboxDispatcher
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-if not MONGO_URL or not DB_NAME:
+# MongoDB connection, opened in the lifespan (see database.py for pool settings)
+database = Database()
+db = database
+
+# "mongo" (default) or "embedded": the in-process engine in embedded.py, no Mongo needed
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+# "background" (default): start serving at once and warm up Mongo and build indexes behind it;
+# /api/health answers immediately, /api/ready returns 503 until Mongo is ready.
+# "blocking": do both before the worker accepts requests.
+MONGO_STARTUP = os.environ.get('MONGO_STARTUP', 'background').lower()
+mongo_status = "connecting"
+mongo_error: Optional[str] = None
+prepare_task: Optional[asyncio.Task] = None
+# "full" (default) or "compact": short field names, binary ids and enum codes for contacts.
+# Switching an existing database needs the migration in compact.py.
+CONTACT_STORAGE = os.environ.get('CONTACT_STORAGE', 'full').lower()
+
+# Optional write-behind batching for contact inserts
+WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')
+WRITE_QUEUE_BATCH_SIZE = int(os.environ.get('WRITE_QUEUE_BATCH_SIZE', '500'))
+WRITE_QUEUE_FLUSH_MS = float(os.environ.get('WRITE_QUEUE_FLUSH_MS', '5'))
+# "flush": respond once the batch is written; "enqueue": respond once queued
+WRITE_QUEUE_ACK = os.environ.get('WRITE_QUEUE_ACK', 'flush').lower()
+write_queues: Dict[str, WriteBehindQueue] = {}
+
+# Read-through cache for admin reads: "memory" (default), "redis" or "none"
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '5'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+cache = build_cache(CACHE_BACKEND, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, os.environ.get('REDIS_URL'))
+
+# Negotiated zstd/br/gzip for responses of at least COMPRESSION_MINIMUM_SIZE bytes;
+# bodies from COMPRESSION_OFFLOAD_SIZE up are compressed in a worker thread
+compressor = Compressor(
+    minimum_size=int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1024')),
+    levels={
+        'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', '5')),
+        'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', '4')),
+        'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', '3')),
+    },
+    offload_size=int(os.environ.get('COMPRESSION_OFFLOAD_SIZE', str(64 * 1024))),
+)
 
+# Abuse shedding on the public POST endpoints: "memory" (default, per worker), "redis" or "none".
+# Rates are "<burst>/<seconds>"; "0" disables a rule. The per-IP bucket is keyed on the client
+# address uvicorn reports. Behind a proxy that address is the proxy's unless serve.py
+# --forwarded-allow-ips lists it (or RATE_LIMIT_TRUST_FORWARDED is set), and every visitor
+# would then share one bucket of 20 posts a minute.
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_PER_IP = Rate.parse(os.environ.get('RATE_LIMIT_PER_IP', '20/60'))
+RATE_LIMIT_PER_EMAIL = Rate.parse(os.environ.get('RATE_LIMIT_PER_EMAIL', '5/600'))
+CONTACT_DUPLICATE_WINDOW_SECONDS = float(os.environ.get('CONTACT_DUPLICATE_WINDOW_SECONDS', '600'))
+# Take the client IP from X-Forwarded-For; only enable behind a proxy that sets it
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', '').lower() in ('1', 'true', 'yes')
+limiter = build_limiter(RATE_LIMIT_BACKEND, redis_url=os.environ.get('REDIS_URL'))
+
+# Responses to POSTs carrying an Idempotency-Key are replayed to retries for this long (see idempotency.py)
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_CACHE_ENTRIES = int(os.environ.get('IDEMPOTENCY_CACHE_ENTRIES', '10000'))
+idempotency_store = IdempotencyStore(db, ttl=IDEMPOTENCY_TTL_SECONDS, max_entries=IDEMPOTENCY_CACHE_ENTRIES)
+
+# Webhook notified of new leads and subscribers through the outbox (see notifications.py); unset disables it
+NOTIFY_WEBHOOK_URL = os.environ.get('NOTIFY_WEBHOOK_URL', '')
+NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', '50'))
+NOTIFY_CONCURRENCY = int(os.environ.get('NOTIFY_CONCURRENCY', '4'))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '8'))
+NOTIFY_TIMEOUT_SECONDS = float(os.environ.get('NOTIFY_TIMEOUT_SECONDS', '5'))
+dispatcher: Optional["OutboxDispatcher"] = None
+
+# How long health-ping rollups are kept after a client's last ping (see status_rollup.py)
+STATUS_RETENTION = timedelta(seconds=float(os.environ.get('STATUS_RETENTION_SECONDS', str(7 * 24 * 3600))))
+
+# Event-loop lag sampled every LOOP_MONITOR_INTERVAL_MS into event_loop_lag_seconds (0 disables).
+# LOOP_BLOCK_THRESHOLD_MS > 0 turns on debug mode: the loop thread's stack is logged when it is held that long.
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get('LOOP_MONITOR_INTERVAL_MS', '100'))
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '0'))
+loop_monitor: Optional[LoopMonitor] = None
+# Lists of at least this many rows are encoded to JSON in a worker thread (0 never)
+SERIALIZE_OFFLOAD_ROWS = int(os.environ.get('SERIALIZE_OFFLOAD_ROWS', '200'))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global mongo_status, prepare_task
+    start_loop_monitor()
+    mongo_status = "connecting"
+    if STORAGE_BACKEND == 'embedded' and not database.connected:
+        from embedded import EmbeddedDatabase
+
+        database.use(EmbeddedDatabase(os.environ.get('DB_NAME', 'impacts')))
+    # An in-process database (embedded, mongomock) has nothing to wait for
+    if MONGO_STARTUP == 'blocking' or database.connected:
+        await database.connect()
+        await create_indexes()
+        mongo_status = "ready"
+    else:
+        # Creating the client does no I/O; the pool and indexes are prepared behind the first requests
+        await database.connect(warm_up=False)
+        prepare_task = asyncio.create_task(prepare_database())
+    await start_write_queues()
+    start_dispatcher()
+    try:
+        yield
+    finally:
+        if prepare_task is not None:
+            prepare_task.cancel()
+            prepare_task = None
+        await shutdown_db_client()
 
 # Create the main app without a prefix
-app = FastAPI(title="The Impacts API", version="1.0.0")
+app = FastAPI(title="The Impacts API", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -41,6 +182,17 @@ class BudgetRange(str, Enum):
     HIGH = "5k-10k"
     ENTERPRISE = "10k+"
 
+# Compact contact layout (see compact.py): the UUID is _id as 16-byte binary, enums are
+# stored as their position in these lists. Only ever append new enum members.
+CONTACT_CODEC = DocumentCodec(
+    fields={"id": "_id", "name": "n", "email": "e", "phone": "p", "service": "s", "budget": "b",
+            "message": "m", "created_at": "t"},
+    codes={"service": [s.value for s in ServiceType], "budget": [b.value for b in BudgetRange]},
+    uuids=["id"],
+)
+if CONTACT_STORAGE == 'compact':
+    database.store_compact("contacts", CONTACT_CODEC)
+
 # ============== Models ==============
 
 class ContactCreate(BaseModel):
@@ -69,6 +221,17 @@ class Newsletter(BaseModel):
     email: str
     subscribed_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ContactBulkDelete(BaseModel):
+    """Contact ids to delete, or a filter; when both are given only ids matching the filter are deleted"""
+    ids: Optional[List[str]] = Field(None, max_length=MAX_BULK_DELETE_KEYS)
+    created_before: Optional[datetime] = None
+    service: Optional[ServiceType] = None
+
+class NewsletterBulkUnsubscribe(BaseModel):
+    """Emails to unsubscribe, or a filter; when both are given only emails matching the filter are removed"""
+    emails: Optional[List[str]] = Field(None, max_length=MAX_BULK_DELETE_KEYS)
+    subscribed_before: Optional[datetime] = None
+
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_name: str
@@ -77,34 +240,208 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+# ============== Helpers ==============
+
+async def insert_document(collection: str, document: dict) -> None:
+    """Insert through the write-behind queue when one is running for the collection"""
+    queue = write_queues.get(collection)
+    if queue is not None:
+        with phase("mongo"):
+            await queue.put(document)
+    else:
+        await db[collection].insert_one(document)
+
+async def emit_event(kind: str, data: dict) -> None:
+    """Record a notification in the outbox; delivery happens in the background"""
+    if dispatcher is None:
+        return
+    from notifications import OUTBOX_COLLECTION, outbox_event
+
+    await insert_document(OUTBOX_COLLECTION, outbox_event(kind, data))
+    dispatcher.wake()
+
+def page_response(body: bytes, next_cursor: Optional[str], etag: str, encoding: Optional[str] = None) -> RawJSONResponse:
+    """Pre-encoded (and possibly pre-compressed) list page; skips response_model re-validation"""
+    if encoding is None:
+        response = RawJSONResponse(body, headers={ETAG_HEADER: etag})
+    else:
+        response = RawJSONResponse(body, headers={
+            ETAG_HEADER: weak_etag(etag), "Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+async def conditional_list(
+    collection: str,
+    version_sort: List[Tuple[str, int]],
+    key: str,
+    if_none_match: Optional[str],
+    load: Callable[[], Awaitable[Tuple[bytes, Optional[str]]]],
+):
+    """Serve a list response from the cache, or 304 it, before touching the full query.
+
+    The ETag is cached with the body, so a warm cache answers conditional
+    requests without any Mongo round trip. On a miss, the ETag comes from the
+    collection fingerprint, and a matching If-None-Match skips ``load``.
+    """
+    namespace = f"{collection}:list"
+    cached = await cache.get(namespace, key)
+    if cached is not None:
+        etag, cursor, body = cached.split(b"\n", 2)
+        etag, next_cursor = etag.decode(), cursor.decode() or None
+    else:
+        # Taken before the query: a write landing while it runs invalidates, and the stale page is not stored
+        generation = await cache.generation(namespace)
+        version = await collection_version(db[collection], version_sort)
+        etag = make_etag(collection, version, key)
+        held = matched_etag(if_none_match, etag)
+        if held is not None:
+            # The body is not loaded, so its size and encoding are unknown; answer with the tag the client holds
+            return not_modified(held)
+        body, next_cursor = await load()
+        await cache.set(namespace, key, b"\n".join([etag.encode(), (next_cursor or "").encode(), body]), generation)
+    encoding = compressor.encoding_for(len(body))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag if encoding is None else weak_etag(etag))
+    if encoding is not None:
+        body = await compressed_body(namespace, key, etag, body, encoding)
+    return page_response(body, next_cursor, etag, encoding)
+
+async def compressed_body(namespace: str, key: str, etag: str, body: bytes, encoding: str) -> bytes:
+    """Compressed list body, cached next to the plain one so repeat polls skip compression too"""
+    cache_key = f"{key}|{encoding}"
+    cached = await cache.get(namespace, cache_key)
+    if cached is not None:
+        cached_etag, _, payload = cached.partition(b"\n")
+        # The plain entry may have been reloaded since; only reuse bytes of the same representation
+        if cached_etag.decode() == etag:
+            return payload
+    payload = await compressor.compress(body, encoding)
+    await cache.set(namespace, cache_key, etag.encode() + b"\n" + payload)
+    return payload
+
+async def list_page(
+    collection: str,
+    model,
+    field: str,
+    limit: int,
+    after: Optional[str],
+    if_none_match: Optional[str],
+    filter: Optional[dict] = None,
+):
+    """Newest-first page of a collection with caching and conditional GET"""
+    async def load():
+        docs, next_cursor = await fetch_page(db[collection], field, limit, after, projection_for(model), filter)
+        return await dump_documents_async(docs, model, SERIALIZE_OFFLOAD_ROWS), next_cursor
+
+    sort = [(field, -1), ("id", -1)]
+    key = f"{limit}:{after or ''}"
+    if filter:
+        key += ":" + json.dumps(filter, sort_keys=True, default=str)
+    return await conditional_list(collection, sort, key, if_none_match, load)
+
+def export_response(collection: str, model, sort_field: str, since: Optional[datetime], format: str):
+    """Stream a whole collection as NDJSON or CSV with bounded memory"""
+    from export import EXPORT_MEDIA_TYPES, stream_export
+
+    stream = stream_export(db[collection], list(model.model_fields), sort_field, since, format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'},
+    )
+
 # ============== Routes ==============
 
 @api_router.get("/")
 async def root():
     return {"message": "The Impacts API is running"}
 
+@api_router.get("/health")
+async def health():
+    """Liveness: answers as soon as the worker is up, whether or not Mongo is reachable"""
+    return {"status": "ok", "mongo": mongo_status}
+
+@api_router.get("/ready")
+async def ready():
+    """Readiness: 503 until the Mongo pool is warm and indexes exist"""
+    if mongo_status != "ready":
+        return JSONResponse(status_code=503, content={"status": "starting", "mongo": mongo_status, "error": mongo_error})
+    return {"status": "ready", "mongo": mongo_status}
+
 # Contact Form Endpoints
 @api_router.post("/contact", response_model=Contact, status_code=201)
 async def create_contact(input: ContactCreate):
     """Submit a contact form inquiry"""
-    contact_dict = input.model_dump()
-    contact_obj = Contact(**contact_dict)
-    await db.contacts.insert_one(contact_obj.model_dump())
+    with phase("validation"):
+        contact_obj = Contact(**input.model_dump())
+    await insert_document("contacts", contact_obj.model_dump())
+    await emit_event("contact.created", contact_obj.model_dump())
+    await cache.invalidate("contacts:list")
     return contact_obj
 
 @api_router.get("/contact", response_model=List[Contact])
-async def get_contacts():
-    """Get all contact form submissions"""
-    contacts = await db.contacts.find().sort("created_at", -1).to_list(1000)
-    return [Contact(**contact) for contact in contacts]
+async def get_contacts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    service: Optional[ServiceType] = None,
+    budget: Optional[BudgetRange] = None,
+    email: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Get contact form submissions, newest first, one page at a time.
+
+    Optionally filtered by service, budget, exact email, a created_at range
+    (since inclusive, until exclusive) and a text search over name/message.
+    """
+    filter = contact_filter(
+        service.value if service else None, budget.value if budget else None, email, since, until, q
+    )
+    return await list_page("contacts", Contact, "created_at", limit, after, if_none_match, filter)
+
+@api_router.get("/contact/export")
+async def export_contacts(
+    since: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """Stream every contact submission, oldest first, as NDJSON or CSV"""
+    return export_response("contacts", Contact, "created_at", since, format)
+
+@api_router.get("/contact/stats", response_model=ContactStats)
+async def get_contact_stats(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: str = Query("day", pattern="^(day|week)$"),
+):
+    """Lead counts by service, budget and day/week for a window (default: last 30 days)"""
+    try:
+        return await contact_stats(db, as_utc(since), as_utc(until), bucket)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @api_router.get("/contact/{contact_id}", response_model=Contact)
-async def get_contact(contact_id: str):
+async def get_contact(contact_id: str, if_none_match: Optional[str] = Header(None)):
     """Get a specific contact submission by ID"""
-    contact = await db.contacts.find_one({"id": contact_id})
-    if not contact:
-        raise HTTPException(status_code=404, detail="Contact not found")
-    return Contact(**contact)
+    cached = await cache.get("contacts:item", contact_id)
+    if cached is not None:
+        etag, _, body = cached.partition(b"\n")
+        etag = etag.decode()
+    else:
+        generation = await cache.generation("contacts:item")
+        contact = await db.contacts.find_one({"id": contact_id}, projection_for(Contact))
+        if not contact:
+            raise HTTPException(status_code=404, detail="Contact not found")
+        # Contacts are immutable once stored, so id + creation time identify the representation
+        etag = make_etag("contact", contact["id"], contact["created_at"])
+        body = dump_document(contact, Contact)
+        await cache.set("contacts:item", contact_id, etag.encode() + b"\n" + body, generation)
+    if etag_matches(if_none_match, etag):
+        # CompressionMiddleware weakens the tag of the 200 when it compresses the body
+        return not_modified(etag if compressor.encoding_for(len(body)) is None else weak_etag(etag))
+    return RawJSONResponse(body, headers={ETAG_HEADER: etag})
 
 @api_router.delete("/contact/{contact_id}", status_code=204)
 async def delete_contact(contact_id: str):
@@ -112,26 +449,92 @@ async def delete_contact(contact_id: str):
     result = await db.contacts.delete_one({"id": contact_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await cache.delete("contacts:item", contact_id)
+    await cache.invalidate("contacts:list")
+    await invalidate_stats(db)
     return None
 
+@api_router.post("/contact/bulk-delete", response_model=BulkDeleteResult)
+async def bulk_delete_contacts(input: ContactBulkDelete):
+    """Delete many contact submissions at once, by id or by filter"""
+    filter = {}
+    if input.created_before is not None:
+        filter["created_at"] = {"$lt": input.created_before}
+    if input.service is not None:
+        filter["service"] = input.service.value
+    if input.ids is None and not filter:
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+
+    async def forget(ids: List[str]):
+        await cache.delete("contacts:item", *ids)
+
+    result = await bulk_delete(db.contacts, "id", input.ids, filter, on_deleted=forget)
+    if result.deleted:
+        await cache.invalidate("contacts:list")
+        await invalidate_stats(db)
+    return result
+
 # Newsletter Endpoints
 @api_router.post("/newsletter", response_model=Newsletter, status_code=201)
 async def subscribe_newsletter(input: NewsletterCreate):
     """Subscribe to newsletter"""
-    # Check if email already exists
-    existing = await db.newsletters.find_one({"email": input.email})
-    if existing:
+    with phase("validation"):
+        newsletter_obj = Newsletter(email=input.email)
+    # One conditional write: only inserts when the email is new. The unique
+    # index on email turns a lost race between concurrent upserts into a
+    # DuplicateKeyError, so both paths map to the same 409.
+    try:
+        result = await db.newsletters.update_one(
+            {"email": newsletter_obj.email},
+            {"$setOnInsert": newsletter_obj.model_dump()},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        result = None
+    if result is None or result.upserted_id is None:
         raise HTTPException(status_code=409, detail="Email already subscribed")
-    
-    newsletter_obj = Newsletter(email=input.email)
-    await db.newsletters.insert_one(newsletter_obj.model_dump())
+    await emit_event("newsletter.subscribed", newsletter_obj.model_dump())
+    await cache.invalidate("newsletters:list")
     return newsletter_obj
 
+@api_router.post("/newsletter/bulk", response_model=BulkImportResult)
+async def import_newsletter_subscribers(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+):
+    """Bulk-subscribe a streamed CSV or NDJSON upload of any size.
+
+    Addresses that are already subscribed, or repeated in the upload, are
+    counted as duplicates; malformed ones as invalid.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    result = await import_subscribers(
+        db.newsletters,
+        request.stream(),
+        format,
+        make_document=lambda email: Newsletter(email=email).model_dump(),
+    )
+    if result.inserted:
+        await cache.invalidate("newsletters:list")
+    return result
+
 @api_router.get("/newsletter", response_model=List[Newsletter])
-async def get_newsletter_subscribers():
-    """Get all newsletter subscribers"""
-    subscribers = await db.newsletters.find().sort("subscribed_at", -1).to_list(1000)
-    return [Newsletter(**sub) for sub in subscribers]
+async def get_newsletter_subscribers(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Get newsletter subscribers, newest first, one page at a time"""
+    return await list_page("newsletters", Newsletter, "subscribed_at", limit, after, if_none_match)
+
+@api_router.get("/newsletter/export")
+async def export_newsletter_subscribers(
+    since: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """Stream every newsletter subscriber, oldest first, as NDJSON or CSV"""
+    return export_response("newsletters", Newsletter, "subscribed_at", since, format)
 
 @api_router.delete("/newsletter/{email}", status_code=204)
 async def unsubscribe_newsletter(email: str):
@@ -139,24 +542,123 @@ async def unsubscribe_newsletter(email: str):
     result = await db.newsletters.delete_one({"email": email})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Email not found")
+    await cache.invalidate("newsletters:list")
     return None
 
-# Status Check Endpoints (existing)
+@api_router.post("/newsletter/bulk-unsubscribe", response_model=BulkDeleteResult)
+async def bulk_unsubscribe_newsletter(input: NewsletterBulkUnsubscribe):
+    """Unsubscribe many emails at once, by address or by filter"""
+    filter = {}
+    if input.subscribed_before is not None:
+        filter["subscribed_at"] = {"$lt": input.subscribed_before}
+    if input.emails is None and not filter:
+        raise HTTPException(status_code=400, detail="Provide emails or a filter")
+    result = await bulk_delete(db.newsletters, "email", input.emails, filter)
+    if result.deleted:
+        await cache.invalidate("newsletters:list")
+    return result
+
+# Status Check Endpoints
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.model_dump()
-    status_obj = StatusCheck(**status_dict)
-    await db.status_checks.insert_one(status_obj.model_dump())
+    with phase("validation"):
+        status_obj = StatusCheck(**input.model_dump())
+    await record_ping(db, status_obj.model_dump(), STATUS_RETENTION)
+    await cache.invalidate("status_clients:list")
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(if_none_match: Optional[str] = Header(None)):
+    """Latest ping of every client, oldest first"""
+    async def load():
+        docs = await latest_statuses(db, projection_for(StatusCheck))
+        return await dump_documents_async(docs, StatusCheck, SERIALIZE_OFFLOAD_ROWS), None
+
+    return await conditional_list("status_clients", [("timestamp", -1)], "all", if_none_match, load)
+
+@api_router.get("/status/history", response_model=StatusHistory)
+async def get_status_history(
+    client_name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resolution: str = Query("minute", pattern="^(minute|hour|day)$"),
+):
+    """Ping counts for one client per minute, hour or day (default: last 24 hours)"""
+    try:
+        return await status_history(db, client_name, as_utc(since), as_utc(until), resolution)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+# Cache Endpoints
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of the read-through cache, per namespace"""
+    return {"backend": CACHE_BACKEND, "namespaces": cache.stats.snapshot()}
+
+# Metrics
+def cache_metrics():
+    requests = Counter("cache_requests_total", "Read-through cache lookups by namespace and result.", ("namespace", "result"))
+    for namespace, counts in cache.stats.snapshot().items():
+        requests.inc(namespace, "hit", amount=counts["hits"])
+        requests.inc(namespace, "miss", amount=counts["misses"])
+    return [requests]
+
+REGISTRY.add_collector(cache_metrics)
+
+def rate_limit_metrics():
+    rejected = Counter("rate_limited_requests_total", "Public POST requests shed before validation, by rule.", ("route", "rule"))
+    for (path, rule), count in limiter.rejected.items():
+        rejected.inc(path, rule, amount=count)
+    return [rejected]
+
+REGISTRY.add_collector(rate_limit_metrics)
+
+def notification_metrics():
+    events = Counter("notifications_total", "Outbox events delivered or given up on by this worker.", ("result",))
+    if dispatcher is not None:
+        events.inc("delivered", amount=dispatcher.delivered)
+        events.inc("dead", amount=dispatcher.failed)
+    return [events]
+
+REGISTRY.add_collector(notification_metrics)
+
+def idempotency_metrics():
+    requests = Counter("idempotent_requests_total", "POSTs with an Idempotency-Key, by outcome.", ("outcome",))
+    for outcome, count in idempotency_store.outcomes.items():
+        requests.inc(outcome, amount=count)
+    return [requests]
+
+REGISTRY.add_collector(idempotency_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, phase and cache metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=limiter,
+    guards=[
+        Guard("/api/contact", email=RATE_LIMIT_PER_EMAIL, duplicate_window=CONTACT_DUPLICATE_WINDOW_SECONDS),
+        Guard("/api/newsletter", email=RATE_LIMIT_PER_EMAIL),
+    ],
+)
+# Outside the email and duplicate checks, so replayed retries neither spend email tokens nor count as duplicates
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    paths=["/api/contact", "/api/newsletter", "/api/status"],
+)
+# The IP bucket runs before a key is claimed, so a flood with a fresh key per request never reaches Mongo
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=limiter,
+    guards=[Guard("/api/contact", ip=RATE_LIMIT_PER_IP), Guard("/api/newsletter", ip=RATE_LIMIT_PER_IP)],
+    trust_forwarded=RATE_LIMIT_TRUST_FORWARDED,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -168,7 +670,10 @@ app.add_middleware(
     ],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],
 )
+app.add_middleware(CompressionMiddleware, compressor=compressor)
+app.add_middleware(MetricsMiddleware)
 
 
 # Configure logging
@@ -178,7 +683,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def create_indexes():
+    await ensure_indexes(db)
+
+async def prepare_database():
+    """Warm the pool and build indexes, retrying with backoff until Mongo answers"""
+    global mongo_status, mongo_error
+    delay = 1.0
+    while True:
+        try:
+            await database.warm_up()
+            await create_indexes()
+        except Exception as exc:
+            mongo_status, mongo_error = "unavailable", f"{type(exc).__name__}: {exc}"
+            logger.warning("Mongo is not ready, retrying in %.0fs: %s", delay, mongo_error)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        else:
+            mongo_status, mongo_error = "ready", None
+            return
+
+async def contacts_flushed(documents: List[dict]):
+    await cache.invalidate("contacts:list")
+    # A batch flushed just after midnight can hold contacts of a bucket that has since closed
+    await invalidate_stats(db, since=min(doc["created_at"] for doc in documents))
+
+async def start_write_queues():
+    if not WRITE_QUEUE_ENABLED:
+        return
+    # Cached pages are dropped once a batch is written; with WRITE_QUEUE_ACK=enqueue the
+    # handler's own invalidation runs before the documents exist and a read could re-cache the old page
+    from notifications import OUTBOX_COLLECTION
+
+    on_flush = {"contacts": contacts_flushed}
+    for collection in ("contacts", OUTBOX_COLLECTION):
+        queue = WriteBehindQueue(
+            db[collection],
+            max_batch=WRITE_QUEUE_BATCH_SIZE,
+            flush_interval_ms=WRITE_QUEUE_FLUSH_MS,
+            ack_on_flush=WRITE_QUEUE_ACK != 'enqueue',
+            on_flush=on_flush.get(collection),
+        )
+        queue.start()
+        write_queues[collection] = queue
+
+def start_dispatcher():
+    global dispatcher
+    if not NOTIFY_WEBHOOK_URL:
+        return
+    from notifications import OUTBOX_COLLECTION, OutboxDispatcher, WebhookNotifier
+
+    dispatcher = OutboxDispatcher(
+        db[OUTBOX_COLLECTION],
+        WebhookNotifier(NOTIFY_WEBHOOK_URL, timeout=NOTIFY_TIMEOUT_SECONDS),
+        batch_size=NOTIFY_BATCH_SIZE,
+        concurrency=NOTIFY_CONCURRENCY,
+        max_attempts=NOTIFY_MAX_ATTEMPTS,
+    )
+    dispatcher.start()
+
+def start_loop_monitor():
+    global loop_monitor
+    if LOOP_MONITOR_INTERVAL_MS <= 0 or loop_monitor is not None:
+        return
+    loop_monitor = LoopMonitor(
+        interval=LOOP_MONITOR_INTERVAL_MS / 1000,
+        block_threshold=LOOP_BLOCK_THRESHOLD_MS / 1000 if LOOP_BLOCK_THRESHOLD_MS > 0 else None,
+    )
+    loop_monitor.start()
 
+async def shutdown_db_client():
+    global dispatcher, loop_monitor
+    # Finish in-flight deliveries; undelivered events stay in the outbox for the next start
+    if dispatcher is not None:
+        await dispatcher.close()
+        await dispatcher.notifier.close()
+        dispatcher = None
+    # Drain buffered writes before the client goes away
+    for queue in write_queues.values():
+        await queue.close()
+    write_queues.clear()
+    await cache.close()
+    await limiter.close()
+    shutdown_validation_pool()
+    await database.close()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+        loop_monitor = None
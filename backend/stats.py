@@ -0,0 +1,179 @@
+"""Contact analytics: lead counts by service, budget and day/week of ``created_at``.
+
+Counts come from one aggregation that groups by (bucket, service, budget).
+The ``created_at_service_budget`` index covers it, so Mongo never loads the
+contact documents.
+
+Buckets that have closed (everything before the start of the current day or
+week) can only change when contacts are deleted. They are therefore
+materialised in the ``contact_stats`` collection, one document per bucket,
+including empty ones. Repeated dashboard queries only aggregate history that
+has not been materialised yet, plus the open bucket. Delete routes call
+:func:`invalidate_stats`, which drops the materialised buckets so they are
+rebuilt on the next query.
+
+A query that aggregated before a delete could otherwise write its old counts
+back after the drop, and they would stay. So every bucket is stamped with the
+stats generation that was current when its query started. Invalidation bumps
+the generation before dropping anything, and reads only trust buckets of the
+current generation. A late write from an older generation is ignored and
+overwritten by the next query.
+
+Buckets are in UTC and weeks start on Monday (see timebuckets.py). The
+requested window is widened to whole buckets.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pymongo import ReplaceOne
+
+from timebuckets import as_utc, bucket_expression, bucket_start as _bucket_start
+
+BUCKET_SIZES = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+DEFAULT_WINDOW = timedelta(days=30)
+MAX_BUCKETS = 1000
+STATS_COLLECTION = "contact_stats"
+GENERATION_ID = "generation"
+
+GroupKey = Tuple[str, Optional[str]]
+
+
+class StatsBucket(BaseModel):
+    start: datetime
+    count: int
+    by_service: Dict[str, int]
+    by_budget: Dict[str, int]
+
+
+class ContactStats(BaseModel):
+    since: datetime
+    until: datetime
+    bucket: str
+    total: int
+    by_service: Dict[str, int]
+    by_budget: Dict[str, int]
+    buckets: List[StatsBucket]
+
+
+def bucket_start(ts: datetime, unit: str) -> datetime:
+    return _bucket_start(ts, BUCKET_SIZES[unit])
+
+
+def _budget_label(budget: Optional[str]) -> str:
+    return budget or "none"
+
+
+async def aggregate_buckets(
+    collection, unit: str, start: datetime, end: datetime
+) -> Dict[datetime, Counter]:
+    """Count contacts in ``[start, end)`` per bucket, keyed by (service, budget)."""
+    bucket = bucket_expression("created_at", BUCKET_SIZES[unit])
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"bucket": bucket, "service": "$service", "budget": "$budget"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    buckets: Dict[datetime, Counter] = {}
+    async for row in collection.aggregate(pipeline):
+        key = row["_id"]
+        buckets.setdefault(key["bucket"], Counter())[(key["service"], key.get("budget"))] += row["count"]
+    return buckets
+
+
+async def _generation(store) -> int:
+    doc = await store.find_one({"_id": GENERATION_ID})
+    return doc["value"] if doc else 0
+
+
+async def _closed_buckets(db, unit: str, starts: List[datetime]) -> Dict[datetime, Counter]:
+    """Counts for closed buckets, aggregating and materialising any that are missing."""
+    if not starts:
+        return {}
+    store = db[STATS_COLLECTION]
+    # Read before aggregating: counts taken before an invalidation must not pass for newer ones
+    generation = await _generation(store)
+    ids = [f"{unit}:{start.isoformat()}" for start in starts]
+    buckets: Dict[datetime, Counter] = {}
+    async for doc in store.find({"_id": {"$in": ids}, "generation": generation}):
+        buckets[doc["start"]] = Counter({(c["service"], c["budget"]): c["count"] for c in doc["counts"]})
+
+    missing = [start for start in starts if start not in buckets]
+    if missing:
+        fresh = await aggregate_buckets(db.contacts, unit, missing[0], missing[-1] + BUCKET_SIZES[unit])
+        writes = []
+        for start in missing:
+            counts = fresh.get(start, Counter())
+            buckets[start] = counts
+            doc = {
+                "_id": f"{unit}:{start.isoformat()}",
+                "unit": unit,
+                "start": start,
+                "generation": generation,
+                "counts": [{"service": s, "budget": b, "count": n} for (s, b), n in counts.items()],
+            }
+            writes.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        await store.bulk_write(writes, ordered=False)
+    return buckets
+
+
+async def contact_stats(
+    db, since: Optional[datetime], until: Optional[datetime], unit: str, now: Optional[datetime] = None
+) -> ContactStats:
+    now = as_utc(now) or datetime.utcnow()
+    since, until = as_utc(since), as_utc(until)
+    size = BUCKET_SIZES[unit]
+    until = until or now
+    start = bucket_start(since or until - DEFAULT_WINDOW, unit)
+    end = bucket_start(until, unit)
+    if end < until:
+        end += size
+    if (end - start) / size > MAX_BUCKETS:
+        raise ValueError(f"window spans more than {MAX_BUCKETS} {unit} buckets")
+
+    starts = []
+    cursor = start
+    while cursor < end:
+        starts.append(cursor)
+        cursor += size
+    open_from = bucket_start(now, unit)
+    buckets = await _closed_buckets(db, unit, [s for s in starts if s < open_from])
+    if starts and starts[-1] >= open_from:
+        buckets.update(await aggregate_buckets(db.contacts, unit, max(start, open_from), end))
+
+    by_service: Counter = Counter()
+    by_budget: Counter = Counter()
+    rows = []
+    for bucket in starts:
+        counts = buckets.get(bucket, Counter())
+        services: Counter = Counter()
+        budgets: Counter = Counter()
+        for (service, budget), n in counts.items():
+            services[service] += n
+            budgets[_budget_label(budget)] += n
+        by_service.update(services)
+        by_budget.update(budgets)
+        rows.append(StatsBucket(start=bucket, count=sum(counts.values()),
+                                by_service=dict(services), by_budget=dict(budgets)))
+    return ContactStats(
+        since=start, until=end, bucket=unit, total=sum(by_service.values()),
+        by_service=dict(by_service), by_budget=dict(by_budget), buckets=rows,
+    )
+
+
+async def invalidate_stats(db, since: Optional[datetime] = None, now: Optional[datetime] = None) -> None:
+    """Forget every materialised bucket; called when contacts are deleted.
+
+    Buffered contacts written later call it with their oldest ``created_at``
+    as ``since``. Nothing happens unless that falls before today: the
+    current day and week are never materialised.
+    """
+    if since is not None and as_utc(since) >= bucket_start(as_utc(now) or datetime.utcnow(), "day"):
+        return
+    store = db[STATS_COLLECTION]
+    # Bump first, so a query that aggregated before the change can only write an outdated generation
+    await store.update_one({"_id": GENERATION_ID}, {"$inc": {"value": 1}}, upsert=True)
+    await store.delete_many({"_id": {"$ne": GENERATION_ID}})
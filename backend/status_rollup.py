@@ -0,0 +1,159 @@
+"""Health-ping storage: per-client, per-minute rollups with TTL retention.
+
+POST /api/status used to append one document per ping forever. Pings are now
+folded into two small collections, with one upsert each:
+
+* ``status_checks`` holds one bucket per (client_name, minute) with the ping
+  count and the first and last ping time;
+* ``status_clients`` holds one document per client with its latest ping.
+
+So reads do not depend on how many pings have been recorded. The latest
+status costs one document per client. History only reads the minute buckets
+of the requested window, and an aggregation downsamples them to
+minutes, hours or days.
+
+Both collections carry an ``expire_at`` date (last ping + retention) under a
+TTL index with ``expireAfterSeconds=0``. Changing the retention therefore
+only affects documents written afterwards and never needs an index rebuild.
+Raw pings stored before this layout have no ``minute`` field. Reads ignore
+them, and they can be removed with ``delete_many({"minute": {"$exists": False}})``.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+
+from timebuckets import as_utc, bucket_expression, bucket_start as _bucket_start
+
+BUCKETS_COLLECTION = "status_checks"
+CLIENTS_COLLECTION = "status_clients"
+RESOLUTIONS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_HISTORY_WINDOW = timedelta(hours=24)
+# A day at minute resolution
+MAX_POINTS = 1440
+MAX_CLIENTS = 1000
+
+
+class StatusPoint(BaseModel):
+    start: datetime
+    count: int
+    first: datetime
+    last: datetime
+
+
+class StatusHistory(BaseModel):
+    client_name: str
+    since: datetime
+    until: datetime
+    resolution: str
+    total: int
+    points: List[StatusPoint]
+
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    return _bucket_start(ts, RESOLUTIONS[resolution])
+
+
+async def _upsert(collection, filter: dict, update: dict) -> None:
+    # Two first pings racing on the unique key: the loser retries and updates the winner's document
+    try:
+        await collection.update_one(filter, update, upsert=True)
+    except DuplicateKeyError:
+        await collection.update_one(filter, update, upsert=True)
+
+
+async def record_ping(db, ping: dict, retention: timedelta) -> None:
+    """Fold one ping (``id``, ``client_name``, ``timestamp``) into its minute bucket and the client's latest status."""
+    ts = ping["timestamp"]
+    expire_at = ts + retention
+    await asyncio.gather(
+        _upsert(
+            db[BUCKETS_COLLECTION],
+            {"client_name": ping["client_name"], "minute": bucket_start(ts, "minute")},
+            {"$inc": {"count": 1}, "$min": {"first": ts}, "$max": {"last": ts, "expire_at": expire_at}},
+        ),
+        _upsert(
+            db[CLIENTS_COLLECTION],
+            {"client_name": ping["client_name"]},
+            {"$set": {"id": ping["id"], "timestamp": ts, "expire_at": expire_at}, "$inc": {"pings": 1}},
+        ),
+    )
+
+
+def rollup(pings: Iterable[dict], retention: timedelta) -> Tuple[List[dict], List[dict]]:
+    """Bucket and client documents for a batch of pings, as ``record_ping`` would leave them (for seeding)."""
+    buckets: Dict[Tuple[str, datetime], dict] = {}
+    clients: Dict[str, dict] = {}
+    for ping in pings:
+        ts = ping["timestamp"]
+        minute = bucket_start(ts, "minute")
+        bucket = buckets.get((ping["client_name"], minute))
+        if bucket is None:
+            bucket = buckets[(ping["client_name"], minute)] = {
+                "client_name": ping["client_name"], "minute": minute, "count": 0, "first": ts, "last": ts,
+            }
+        bucket["count"] += 1
+        bucket["first"] = min(bucket["first"], ts)
+        bucket["last"] = max(bucket["last"], ts)
+        bucket["expire_at"] = bucket["last"] + retention
+        client = clients.setdefault(ping["client_name"], {"client_name": ping["client_name"], "pings": 0})
+        client["pings"] += 1
+        if ts >= client.get("timestamp", ts):
+            client.update(id=ping["id"], timestamp=ts, expire_at=ts + retention)
+    return list(buckets.values()), list(clients.values())
+
+
+async def latest_statuses(db, projection: dict) -> List[dict]:
+    """The latest ping of the ``MAX_CLIENTS`` most recently seen clients still within retention, oldest first."""
+    # Newest first so the cap drops the clients that have been quiet longest, then back to oldest first.
+    # Clients pinging at the same instant are ordered by name, which every engine agrees on.
+    cursor = db[CLIENTS_COLLECTION].find({}, projection).sort([("timestamp", -1), ("client_name", -1)])
+    docs = await cursor.to_list(MAX_CLIENTS)
+    docs.reverse()
+    return docs
+
+
+async def status_history(
+    db,
+    client_name: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    resolution: str,
+    now: Optional[datetime] = None,
+) -> StatusHistory:
+    """Ping counts for one client per minute, hour or day. Only non-empty buckets are returned.
+
+    Without ``since`` the window is the ``DEFAULT_HISTORY_WINDOW`` ending with
+    the bucket that holds ``until``.
+    """
+    size = RESOLUTIONS[resolution]
+    since = as_utc(since)
+    until = as_utc(until) or as_utc(now) or datetime.utcnow()
+    end = bucket_start(until, resolution)
+    if end < until:
+        end += size
+    # Counted back from the rounded-up end, so the default window never spans one bucket too many
+    start = bucket_start(since or end - DEFAULT_HISTORY_WINDOW, resolution)
+    if (end - start) / size > MAX_POINTS:
+        raise ValueError(f"window spans more than {MAX_POINTS} {resolution} buckets")
+
+    pipeline = [
+        {"$match": {"client_name": client_name, "minute": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": bucket_expression("minute", size),
+            "count": {"$sum": "$count"},
+            "first": {"$min": "$first"},
+            "last": {"$max": "$last"},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    points = [
+        StatusPoint(start=row["_id"], count=row["count"], first=row["first"], last=row["last"])
+        async for row in db[BUCKETS_COLLECTION].aggregate(pipeline)
+    ]
+    return StatusHistory(
+        client_name=client_name, since=start, until=end, resolution=resolution,
+        total=sum(p.count for p in points), points=points,
+    )
@@ -0,0 +1,33 @@
+"""Fixed-size UTC time buckets shared by the contact stats and the status rollups.
+
+Dates are stored as naive UTC, which is what Motor returns. Query bounds
+may arrive timezone-aware, for example ``2026-10-01T00:00:00Z`` from a
+browser's ``toISOString()``. :func:`as_utc` converts them before any bucket
+math, because naive and aware datetimes cannot be subtracted or compared.
+
+Buckets are counted from a Monday, so week buckets line up with ISO weeks.
+Minute, hour and day buckets are unaffected, since the epoch falls on a
+midnight.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+EPOCH = datetime(1970, 1, 5)
+
+
+def as_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """``ts`` as naive UTC; naive values are taken to be UTC already."""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(ts: datetime, size: timedelta) -> datetime:
+    ts = as_utc(ts)
+    return ts - (ts - EPOCH) % size
+
+
+def bucket_expression(field: str, size: timedelta) -> dict:
+    """Aggregation expression for the start of ``$field``'s bucket, matching :func:`bucket_start`."""
+    size_ms = int(size.total_seconds() * 1000)
+    return {"$subtract": [f"${field}", {"$mod": [{"$subtract": [f"${field}", EPOCH]}, size_ms]}]}
@@ -0,0 +1,126 @@
+"""In-process write-behind queue that batches inserts into ``insert_many``.
+
+Handlers hand documents to :meth:`WriteBehindQueue.put` instead of calling
+``insert_one``. A single background task collects them and flushes with
+``insert_many(ordered=False)`` once ``max_batch`` documents are pending or
+``flush_interval_ms`` has passed since the first one arrived, whichever
+comes first.
+
+Two durability modes are supported:
+
+* ``ack_on_flush=True`` (default): ``put`` returns only after the batch
+  containing the document has been written, and re-raises that document's
+  write error. Requests still see a real Mongo ack, just a shared one.
+* ``ack_on_flush=False``: ``put`` returns as soon as the document is queued.
+  Write errors are logged. Documents still buffered when the process dies
+  are lost, so only use this where that is acceptable.
+
+``on_flush`` is called with the documents of every batch that was written,
+before the waiting ``put`` calls return. The server uses it to invalidate
+cached reads. In ack-on-enqueue mode those could otherwise be refilled with
+a page that predates the batch.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        collection,
+        max_batch: int = 500,
+        flush_interval_ms: float = 5.0,
+        ack_on_flush: bool = True,
+        max_pending: int = 10_000,
+        on_flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.ack_on_flush = ack_on_flush
+        # Upper bound on buffered documents in ack-on-enqueue mode; beyond it
+        # producers wait for a flush instead of growing the buffer.
+        self.max_pending = max_pending
+        self.on_flush = on_flush
+        self._pending: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def put(self, document: Dict[str, Any]) -> None:
+        if self._closing:
+            raise RuntimeError("write queue is closed")
+        wait = self.ack_on_flush or len(self._pending) >= self.max_pending
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._pending.append((document, future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        if future is not None:
+            await future
+
+    async def close(self) -> None:
+        """Stop accepting documents and flush everything still buffered."""
+        self._closing = True
+        self._has_items.set()
+        self._batch_full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_items.wait()
+            if not self._batch_full.is_set():
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[: self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            if len(self._pending) < self.max_batch and not self._closing:
+                self._batch_full.clear()
+            if not self._pending and not self._closing:
+                self._has_items.clear()
+            if batch:
+                await self._flush(batch)
+            if self._closing and not self._pending:
+                return
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]) -> None:
+        errors: Dict[int, Exception] = {}
+        try:
+            await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                errors[error["index"]] = exc
+        except Exception as exc:
+            # Anything else failed the whole batch; waiting producers must hear about it either way
+            errors = {index: exc for index in range(len(batch))}
+
+        if self.on_flush is not None and len(errors) < len(batch):
+            try:
+                await self.on_flush([doc for index, (doc, _) in enumerate(batch) if index not in errors])
+            except Exception:
+                logger.exception("on_flush for %s failed", self.collection.name)
+
+        for index, (_, future) in enumerate(batch):
+            error = errors.get(index)
+            if future is None:
+                if error is not None:
+                    logger.error("Buffered insert into %s failed: %s", self.collection.name, error)
+            elif not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
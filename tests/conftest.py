@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other by top-level name, as they do when uvicorn runs from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Tests post far more than one visitor may; the limiter has its own tests
+os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+
+
+@pytest.fixture
+def api():
+    """Run ``scenario(client, server)`` against the app on a fresh embedded database.
+
+    ``client`` is an ``httpx.AsyncClient`` talking to the app in-process.
+    """
+    import httpx
+
+    import server
+    from cache import build_cache
+    from embedded import EmbeddedDatabase
+
+    def run(scenario):
+        async def main():
+            server.database.use(EmbeddedDatabase("impacts_test"))
+            server.cache = build_cache("memory", server.CACHE_TTL_SECONDS, server.CACHE_MAX_ENTRIES)
+            async with server.app.router.lifespan_context(server.app):
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await scenario(client, server)
+
+        return asyncio.run(main())
+
+    return run
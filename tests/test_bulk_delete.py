@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from bulk_delete import bulk_delete
+from embedded import EmbeddedDatabase
+
+START = datetime(2026, 1, 1)
+
+
+def contacts(count: int):
+    services = ["seo", "meta", "social", "all"]
+    return [{"id": str(uuid.UUID(int=i + 1)), "name": f"Lead {i}", "email": f"lead{i}@example.com", "phone": None,
+             "service": services[i % 4], "budget": None, "message": "Please call me back.",
+             "created_at": START + timedelta(days=i)} for i in range(count)]
+
+
+def test_ids_report_every_item_across_chunks():
+    async def run():
+        db = EmbeddedDatabase("impacts_bulk_delete_test")
+        docs = contacts(10)
+        await db.contacts.insert_many(docs)
+        deleted_chunks = []
+
+        async def on_deleted(ids):
+            deleted_chunks.append(sorted(ids))
+
+        ids = [docs[0]["id"], "missing-1", docs[3]["id"], docs[0]["id"], docs[7]["id"], "missing-2"]
+        result = await bulk_delete(db.contacts, "id", ids, on_deleted=on_deleted, chunk_size=2)
+        remaining = sorted(d["id"] for d in await db.contacts.find({}).to_list(None))
+        return docs, result, deleted_chunks, remaining
+
+    docs, result, deleted_chunks, remaining = asyncio.run(run())
+    assert result.deleted == 3
+    assert result.not_found == ["missing-1", "missing-2"]
+    assert sorted(i for chunk in deleted_chunks for i in chunk) == sorted([docs[0]["id"], docs[3]["id"], docs[7]["id"]])
+    assert remaining == sorted(d["id"] for i, d in enumerate(docs) if i not in (0, 3, 7))
+
+
+def test_filter_only_walks_every_match():
+    async def run():
+        db = EmbeddedDatabase("impacts_bulk_delete_test")
+        await db.contacts.insert_many(contacts(20))
+        result = await bulk_delete(db.contacts, "id", None, {"service": "seo"}, chunk_size=2)
+        return result, await db.contacts.count_documents({"service": "seo"}), await db.contacts.count_documents({})
+
+    result, seo_left, total_left = asyncio.run(run())
+    assert (result.deleted, result.not_found) == (5, [])
+    assert (seo_left, total_left) == (0, 15)
+
+
+def test_contact_route_narrows_ids_by_filter_and_evicts_cached_items(api):
+    docs = contacts(8)
+
+    async def scenario(client, server):
+        await server.db.contacts.insert_many(docs)
+        # Cache one item that is about to go away
+        assert (await client.get(f"/api/contact/{docs[0]['id']}")).status_code == 200
+        response = await client.post("/api/contact/bulk-delete", json={
+            "ids": [docs[0]["id"], docs[1]["id"], docs[4]["id"], "missing"],
+            "service": "seo",
+        })
+        gone = await client.get(f"/api/contact/{docs[0]['id']}")
+        kept = await client.get(f"/api/contact/{docs[1]['id']}")
+        return response, gone.status_code, kept.status_code
+
+    response, gone, kept = api(scenario)
+    assert response.status_code == 200, response.text
+    # docs[0] and docs[4] are "seo"; docs[1] is "meta" and does not match the filter
+    assert response.json() == {"deleted": 2, "not_found": [docs[1]["id"], "missing"]}
+    assert (gone, kept) == (404, 200)
+
+
+def test_contact_route_deletes_by_date(api):
+    async def scenario(client, server):
+        await server.db.contacts.insert_many(contacts(6))
+        response = await client.post("/api/contact/bulk-delete",
+                                     json={"created_before": (START + timedelta(days=2)).isoformat()})
+        return response, await server.db.contacts.count_documents({})
+
+    response, left = api(scenario)
+    assert response.json() == {"deleted": 2, "not_found": []}
+    assert left == 4
+
+
+def test_contact_route_requires_ids_or_filter(api):
+    async def scenario(client, server):
+        return await client.post("/api/contact/bulk-delete", json={})
+
+    assert api(scenario).status_code == 400
+
+
+def test_bulk_unsubscribe(api):
+    async def scenario(client, server):
+        for i in range(3):
+            await client.post("/api/newsletter", json={"email": f"reader{i}@example.com"})
+        response = await client.post("/api/newsletter/bulk-unsubscribe", json={
+            "emails": ["reader0@example.com", "reader2@example.com", "nobody@example.com"]})
+        listed = await client.get("/api/newsletter")
+        return response, [s["email"] for s in listed.json()]
+
+    response, listed = api(scenario)
+    assert response.json() == {"deleted": 2, "not_found": ["nobody@example.com"]}
+    assert listed == ["reader1@example.com"]
@@ -0,0 +1,46 @@
+import asyncio
+
+from bulk_import import LineTooLong, iter_lines
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def lines(*chunks: bytes, max_length: int = 16):
+    async def run():
+        return [line async for line in iter_lines(stream(*chunks), max_length)]
+
+    return asyncio.run(run())
+
+
+def test_lines_split_across_chunks():
+    assert lines(b"a@x.io\r\nb@", b"x.io\n", b"c@x.io") == ["a@x.io", "b@x.io", "c@x.io"]
+    assert not any(isinstance(line, LineTooLong) for line in lines(b"a@x.io\n"))
+
+
+def test_line_without_newline_stops_growing_at_the_limit():
+    result = lines(*([b"x" * 10] * 1000), max_length=16)
+    assert result == ["x" * 16]
+    assert isinstance(result[0], LineTooLong)
+
+
+def test_reading_resumes_after_an_overlong_line():
+    result = lines(b"ok@x.io\n" + b"y" * 40, b"y" * 40, b"yy\nnext@x.io\n", b"z" * 20 + b"\nlast@x.io", max_length=16)
+    assert result == ["ok@x.io", "y" * 16, "next@x.io", "z" * 16, "last@x.io"]
+    assert [isinstance(line, LineTooLong) for line in result] == [False, True, False, True, False]
+
+
+def test_upload_with_an_overlong_line_reports_a_row_error(api):
+    upload = b"email\nfirst@example.com\n" + b"a" * 100_000 + b"\nsecond@example.com\n"
+
+    async def scenario(client, server):
+        return await client.post("/api/newsletter/bulk", params={"format": "csv"}, content=upload)
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["inserted"], body["duplicates"], body["invalid"]) == (2, 0, 1)
+    assert body["invalid_samples"][0]["line"] == 3
+    assert body["invalid_samples"][0]["error"].startswith("line longer than")
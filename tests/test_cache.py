@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from cache import MemoryCache
+
+CONTACT = {"name": "Lead", "email": "lead@example.com", "service": "seo",
+           "message": "Please get in touch about a campaign."}
+
+
+def test_set_is_dropped_once_the_namespace_moved_on():
+    async def run():
+        cache = MemoryCache(60)
+        before = await cache.generation("contacts:list")
+        await cache.invalidate("contacts:list")
+        await cache.set("contacts:list", "page", b"old", before)
+        dropped = await cache.get("contacts:list", "page")
+        await cache.set("contacts:list", "page", b"new", await cache.generation("contacts:list"))
+        return dropped, await cache.get("contacts:list", "page")
+
+    assert asyncio.run(run()) == (None, b"new")
+
+
+def test_list_read_racing_a_delete_does_not_cache_the_old_page(api, monkeypatch):
+    async def scenario(client, server):
+        fetch_page = server.fetch_page
+        fetched, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_fetch_page(*args, **kwargs):
+            page = await fetch_page(*args, **kwargs)
+            fetched.set()
+            await release.wait()
+            return page
+
+        start = datetime(2026, 10, 1)
+        await server.db.contacts.insert_many([{**CONTACT, "id": f"c{i}", "phone": None, "budget": None,
+                                               "created_at": start + timedelta(hours=i)} for i in range(3)])
+        monkeypatch.setattr(server, "fetch_page", slow_fetch_page)
+        racing = asyncio.ensure_future(client.get("/api/contact"))
+        await fetched.wait()
+        # The delete lands after the read queried but before it caches the page
+        deleted = await client.delete("/api/contact/c0")
+        release.set()
+        stale = await racing
+        monkeypatch.setattr(server, "fetch_page", fetch_page)
+        return deleted, stale, await client.get("/api/contact"), await client.get("/api/contact")
+
+    deleted, stale, fresh, cached = api(scenario)
+    assert deleted.status_code == 204
+    assert len(stale.json()) == 3
+    assert [c["id"] for c in fresh.json()] == [c["id"] for c in cached.json()] == ["c2", "c1"]
+    assert fresh.headers["ETag"] == cached.headers["ETag"] != stale.headers["ETag"]
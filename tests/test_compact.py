@@ -0,0 +1,41 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from compact import CompactCollection, compact_transform, expand_transform, migrate
+from embedded import EmbeddedDatabase
+from indexes import INDEXES
+from server import CONTACT_CODEC
+
+
+def contacts(count: int):
+    start = datetime(2026, 1, 1)
+    return [{"id": str(uuid.UUID(int=i + 1, version=4)), "name": f"Lead {i}", "email": f"lead{i}@example.com",
+             "phone": None, "service": "seo", "budget": "1k-3k" if i % 2 else None,
+             "message": "Please call me back.", "created_at": start + timedelta(minutes=i)} for i in range(count)]
+
+
+def test_compact_and_expand_migrations_can_be_rerun():
+    async def run():
+        db = EmbeddedDatabase("impacts_compact_test")
+        await db.contacts.insert_many(contacts(25))
+
+        assert await migrate(db.contacts, db.contacts_compact, compact_transform(CONTACT_CODEC), batch_size=10) == 25
+        assert await migrate(db.contacts, db.contacts_compact, compact_transform(CONTACT_CODEC), batch_size=10) == 0
+        assert await db.contacts_compact.count_documents({}) == 25
+
+        # As the CLI does for --expand: indexes first, so a rerun skips what is already copied
+        await db.contacts_full.create_indexes(INDEXES["contacts"])
+        expand = expand_transform(CONTACT_CODEC)
+        assert await migrate(db.contacts_compact, db.contacts_full, expand, batch_size=10) == 25
+        assert await migrate(db.contacts_compact, db.contacts_full, expand, batch_size=10) == 0
+        assert await db.contacts_full.count_documents({}) == 25
+
+        original = await db.contacts.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        expanded = await db.contacts_full.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        via_codec = await CompactCollection(db.contacts_compact, CONTACT_CODEC).find({}).sort("id", 1).to_list(None)
+        return original, expanded, via_codec
+
+    original, expanded, via_codec = asyncio.run(run())
+    assert expanded == original
+    assert [{k: v for k, v in doc.items() if v is not None} for doc in original] == via_codec
@@ -0,0 +1,205 @@
+"""The embedded engine must answer every API request exactly like Mongo.
+
+The app is booted in-process once per engine and fed the same seeded data
+and the same scripted requests: every read route with and without filters
+and cursors, then the write routes, then the reads again. Status codes, the
+``X-Next-Cursor`` header and the response bodies must match. Ids and
+timestamps generated by the server on POST are left out of the comparison.
+
+The reference is ``mongomock-motor``. Set ``PARITY_MONGO_URL`` to compare
+against a real mongod instead; that also runs the ``$text`` cases, which
+mongomock does not support. The scratch database is dropped afterwards.
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, List, Tuple
+
+import httpx
+
+from embedded import EmbeddedDatabase
+from status_rollup import rollup
+
+DOCS = 300
+DB_NAME = "impacts_engine_parity"
+SERVICES = ["seo", "meta", "social", "all"]
+BUDGETS = ["1k-3k", "3k-5k", "5k-10k", "10k+", None]
+WORDS = ["marketing", "growth", "seo", "ads", "brand", "launch", "audit", "content", "social", "budget"]
+SEED_START = datetime(2024, 3, 1)
+# Generated by the server on POST, so they differ between runs
+VOLATILE = {"id", "created_at", "subscribed_at", "timestamp"}
+
+Request = Tuple[str, str, dict]
+
+
+async def seed(db, docs: int) -> None:
+    rng = random.Random(0)
+    contacts, subscribers, pings = [], [], []
+    for i in range(docs):
+        # Every fifth document shares its timestamp with the previous one, to exercise the id tiebreak
+        ts = SEED_START + timedelta(minutes=37 * (i - i // 5))
+        contacts.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Lead {i}",
+            "email": f"lead{i % 40}@example.com",
+            "phone": None if i % 3 else "+1 555 0100",
+            "service": rng.choice(SERVICES),
+            "budget": rng.choice(BUDGETS),
+            "message": " ".join(rng.choices(WORDS, k=8)),
+            "created_at": ts,
+        })
+        subscribers.append({"id": str(uuid.UUID(int=rng.getrandbits(128))), "email": f"sub{i}@example.com",
+                            "subscribed_at": ts})
+        pings.append({"id": str(uuid.UUID(int=rng.getrandbits(128))), "client_name": f"client-{i % 7}",
+                      "timestamp": ts})
+    await db.contacts.insert_many(contacts)
+    await db.newsletters.insert_many(subscribers)
+    buckets, clients = rollup(pings, timedelta(days=3650))
+    await db.status_checks.insert_many(buckets)
+    await db.status_clients.insert_many(clients)
+
+
+def read_requests(docs: int, text_search: bool) -> List[Request]:
+    middle = (SEED_START + timedelta(minutes=37 * docs // 2)).isoformat()
+    late = (SEED_START + timedelta(minutes=37 * docs * 3 // 4)).isoformat()
+    requests: List[Request] = [
+        ("GET", "/api/", {}),
+        ("GET", "/api/contact", {"params": {"limit": 7}}),
+        ("GET", "/api/contact", {"params": {"limit": 1000}}),
+        ("GET", "/api/contact", {"params": {"service": "seo", "limit": 5}}),
+        ("GET", "/api/contact", {"params": {"budget": "10k+", "service": "meta"}}),
+        ("GET", "/api/contact", {"params": {"email": "lead3@example.com"}}),
+        ("GET", "/api/contact", {"params": {"since": middle, "until": late, "limit": 9}}),
+        ("GET", "/api/contact", {"params": {"after": "not-a-cursor"}}),
+        ("GET", "/api/contact/export", {}),
+        ("GET", "/api/contact/export", {"params": {"since": middle, "format": "csv"}}),
+        ("GET", "/api/contact/stats", {"params": {"since": SEED_START.isoformat(), "until": late}}),
+        ("GET", "/api/contact/stats", {"params": {"since": SEED_START.isoformat(), "until": late, "bucket": "week"}}),
+        ("GET", "/api/contact/missing", {}),
+        ("GET", "/api/newsletter", {"params": {"limit": 11}}),
+        ("GET", "/api/newsletter/export", {"params": {"since": middle}}),
+        ("GET", "/api/status", {}),
+        ("GET", "/api/status/history", {"params": {"client_name": "client-3", "since": SEED_START.isoformat(),
+                                                   "until": middle, "resolution": "hour"}}),
+        ("GET", "/api/status/history", {"params": {"client_name": "client-3", "until": late, "resolution": "day",
+                                                   "since": "2000-01-01T00:00:00"}}),
+    ]
+    if text_search:
+        requests += [
+            ("GET", "/api/contact", {"params": {"q": "growth"}}),
+            ("GET", "/api/contact", {"params": {"q": "audit brand", "service": "social", "limit": 4}}),
+        ]
+    return requests
+
+
+def write_requests(docs: int) -> List[Request]:
+    early = (SEED_START + timedelta(minutes=37 * docs // 10)).isoformat()
+    return [
+        ("POST", "/api/contact", {"json": {"name": "Parity", "email": "parity@example.com", "service": "seo",
+                                           "budget": "3k-5k", "message": "Checking both engines agree."}}),
+        ("POST", "/api/contact", {"json": {"name": "", "email": "not-an-email"}}),
+        ("POST", "/api/newsletter", {"json": {"email": "new@example.com"}}),
+        ("POST", "/api/newsletter", {"json": {"email": "sub1@example.com"}}),
+        ("POST", "/api/newsletter/bulk", {
+            "params": {"format": "csv"},
+            "content": "email\nbulk1@example.com\nsub2@example.com\nbad\nbulk1@example.com"}),
+        ("DELETE", "/api/newsletter/sub3@example.com", {}),
+        ("DELETE", "/api/newsletter/nobody@example.com", {}),
+        ("POST", "/api/newsletter/bulk-unsubscribe", {
+            "json": {"emails": [f"sub{i}@example.com" for i in range(4, 9)]}}),
+        ("POST", "/api/contact/bulk-delete", {"json": {"created_before": early, "service": "seo"}}),
+        ("POST", "/api/contact/bulk-delete", {"json": {}}),
+        ("POST", "/api/status", {"json": {"client_name": "parity"}}),
+    ]
+
+
+def strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: strip_volatile(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [strip_volatile(v) for v in value]
+    return value
+
+
+def body(response: httpx.Response, volatile: bool) -> Any:
+    media_type = response.headers.get("content-type", "").split(";")[0]
+    if media_type == "application/x-ndjson":
+        data = [json.loads(line) for line in response.text.splitlines()]
+    elif media_type == "text/csv":
+        data = list(csv.DictReader(io.StringIO(response.text)))
+    else:
+        try:
+            data = response.json()
+        except ValueError:
+            return response.text
+    return strip_volatile(data) if volatile else data
+
+
+async def replay(database, text_search: bool) -> List[Tuple[str, Any]]:
+    """Seed ``database``, run the script against it and return one (label, outcome) per request."""
+    import server
+
+    server.database.use(database)
+    server.cache = server.build_cache("none", 0)
+    await seed(server.db, DOCS)
+    outcomes = []
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://parity") as client:
+
+            async def call(method: str, url: str, kwargs: dict, volatile: bool) -> None:
+                response = await client.request(method, url, **kwargs)
+                cursor = response.headers.get("X-Next-Cursor")
+                outcomes.append((f"{method} {url} {kwargs.get('params', '')}",
+                                 (response.status_code, None if volatile else cursor, body(response, volatile))))
+                # Follow cursors to the end so keyset pagination is compared page by page
+                if cursor and not volatile:
+                    params = dict(kwargs.get("params", {}), after=cursor)
+                    await call(method, url, {**kwargs, "params": params}, volatile)
+
+            reads = read_requests(DOCS, text_search)
+            for method, url, kwargs in reads:
+                await call(method, url, kwargs, volatile=False)
+            for method, url, kwargs in write_requests(DOCS):
+                await call(method, url, kwargs, volatile=True)
+            # Reads after the writes see server-generated values
+            for method, url, kwargs in reads:
+                await call(method, url, kwargs, volatile=True)
+    return outcomes
+
+
+async def reference_outcomes(mongo_url: str) -> List[Tuple[str, Any]]:
+    if not mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+
+        return await replay(AsyncMongoMockClient()[DB_NAME], text_search=False)
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo = AsyncIOMotorClient(mongo_url)
+    try:
+        await mongo.drop_database(DB_NAME)
+        return await replay(mongo[DB_NAME], text_search=True)
+    finally:
+        await mongo.drop_database(DB_NAME)
+        mongo.close()
+
+
+def test_embedded_engine_answers_like_mongo():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    mongo_url = os.environ.get("PARITY_MONGO_URL", "")
+
+    async def run():
+        expected = await reference_outcomes(mongo_url)
+        actual = await replay(EmbeddedDatabase(DB_NAME), text_search=bool(mongo_url))
+        return expected, actual
+
+    expected, actual = asyncio.run(run())
+    assert [label for label, _ in actual] == [label for label, _ in expected]
+    mismatches = [label for (label, want), (_, got) in zip(expected, actual) if want != got]
+    assert mismatches == []
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+from etags import etag_matches, matched_etag
+
+CONTACT = {"name": "Lead", "email": "lead@example.com", "service": "seo",
+           "message": "Please get in touch about a campaign."}
+START = datetime(2026, 10, 1)
+
+
+async def seed(server, count: int) -> None:
+    await server.db.contacts.insert_many([{**CONTACT, "id": f"c{i}", "phone": None, "budget": None,
+                                           "created_at": START + timedelta(hours=i)} for i in range(count)])
+
+
+def test_if_none_match_comparison_is_weak_and_keeps_the_clients_form():
+    assert matched_etag('"a", W/"b"', '"b"') == 'W/"b"'
+    assert matched_etag('"b"', '"b"') == '"b"'
+    assert matched_etag("*", '"b"') == '"b"'
+    assert matched_etag('"a"', '"b"') is None
+    assert not etag_matches(None, '"b"')
+
+
+def test_matching_tag_is_answered_without_the_query(api, monkeypatch):
+    async def scenario(client, server):
+        await seed(server, 3)
+        first = await client.get("/api/contact")
+
+        async def no_query(*args, **kwargs):
+            raise AssertionError("the page query ran for a matching tag")
+
+        monkeypatch.setattr(server, "fetch_page", no_query)
+        monkeypatch.setattr(server, "dump_documents_async", no_query)
+        headers = {"If-None-Match": first.headers["ETag"]}
+        warm = await client.get("/api/contact", headers=headers)
+        await server.cache.invalidate("contacts:list")
+        cold = await client.get("/api/contact", headers=headers)
+        return first, warm, cold
+
+    first, warm, cold = api(scenario)
+    assert first.status_code == 200
+    for response in (warm, cold):
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == first.headers["ETag"]
+        assert response.headers["Vary"] == "Accept-Encoding"
+
+
+def test_tag_changes_after_an_insert_and_a_delete(api):
+    async def scenario(client, server):
+        await seed(server, 3)
+        tags = [(await client.get("/api/contact")).headers["ETag"]]
+        await client.post("/api/contact", json=CONTACT)
+        inserted = await client.get("/api/contact", headers={"If-None-Match": tags[0]})
+        tags.append(inserted.headers["ETag"])
+        await client.delete("/api/contact/c0")
+        deleted = await client.get("/api/contact", headers={"If-None-Match": tags[1]})
+        tags.append(deleted.headers["ETag"])
+        return tags, inserted, deleted
+
+    tags, inserted, deleted = api(scenario)
+    assert inserted.status_code == deleted.status_code == 200
+    assert len(set(tags)) == 3
+
+
+def test_compressed_pages_carry_a_weak_tag_and_304_with_it(api):
+    async def scenario(client, server):
+        # Large enough to be compressed
+        await seed(server, 20)
+        gzip = {"Accept-Encoding": "gzip"}
+        compressed = await client.get("/api/contact", headers=gzip)
+        plain = await client.get("/api/contact", headers={"Accept-Encoding": "identity"})
+        warm = await client.get("/api/contact", headers={**gzip, "If-None-Match": compressed.headers["ETag"]})
+        await server.cache.invalidate("contacts:list")
+        cold = await client.get("/api/contact", headers={**gzip, "If-None-Match": compressed.headers["ETag"]})
+        plain_304 = await client.get("/api/contact", headers={"Accept-Encoding": "identity",
+                                                              "If-None-Match": plain.headers["ETag"]})
+        return compressed, plain, warm, cold, plain_304
+
+    compressed, plain, warm, cold, plain_304 = api(scenario)
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == "W/" + plain.headers["ETag"]
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.json() == plain.json()
+    for response in (warm, cold):
+        assert response.status_code == 304
+        assert response.headers["ETag"] == compressed.headers["ETag"]
+        assert response.headers["Vary"] == "Accept-Encoding"
+    assert plain_304.status_code == 304
+    assert plain_304.headers["ETag"] == plain.headers["ETag"]
+
+
+def test_contact_lookup_304(api):
+    async def scenario(client, server):
+        await seed(server, 1)
+        first = await client.get("/api/contact/c0")
+        return first, await client.get("/api/contact/c0", headers={"If-None-Match": first.headers["ETag"]})
+
+    first, second = api(scenario)
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["ETag"] == first.headers["ETag"]
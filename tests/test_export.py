@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from embedded import EmbeddedDatabase
+from export import stream_export
+
+FIELDS = ["id", "name", "email", "phone", "budget", "created_at"]
+START = datetime(2026, 3, 1, 9, 30)
+
+
+def contacts():
+    # Inserted newest first, so the export has to sort
+    return [{"id": f"c{i}", "name": name, "email": f"lead{i}@example.com", "phone": phone, "budget": None,
+             "created_at": START + timedelta(hours=i), "internal": "not exported"}
+            for i, (name, phone) in reversed(list(enumerate([
+                ("Ada", "+1 555 0100"), ('Grace "Amazing" Hopper', None), ("Smith, John", None),
+                ("Zoë", "+44 20 7946 0000"), ("Line\nBreak", None)])))]
+
+
+def export(fmt: str, since=None, batch_size: int = 2):
+    async def run():
+        db = EmbeddedDatabase("impacts_export_test")
+        await db.contacts.insert_many(contacts())
+        chunks = [chunk async for chunk in stream_export(
+            db.contacts, FIELDS, "created_at", since, fmt, batch_size=batch_size)]
+        return chunks
+
+    return asyncio.run(run())
+
+
+def test_ndjson_is_oldest_first_with_only_the_model_fields():
+    chunks = export("ndjson")
+    # 5 rows in batches of 2
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [r["id"] for r in rows] == ["c0", "c1", "c2", "c3", "c4"]
+    assert list(rows[0]) == FIELDS
+    assert rows[0]["created_at"] == "2026-03-01T09:30:00"
+    assert rows[1]["phone"] is None and rows[1]["name"] == 'Grace "Amazing" Hopper'
+    assert rows[4]["name"] == "Line\nBreak"
+
+
+def test_csv_has_a_header_and_round_trips_awkward_values():
+    body = b"".join(export("csv")).decode()
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == FIELDS
+    assert [r[0] for r in rows[1:]] == ["c0", "c1", "c2", "c3", "c4"]
+    assert rows[2][1:4] == ['Grace "Amazing" Hopper', "lead1@example.com", ""]
+    assert rows[3][1] == "Smith, John"
+    assert rows[4][1:4] == ["Zoë", "lead3@example.com", "+44 20 7946 0000"]
+    assert rows[5][1] == "Line\nBreak"
+    assert rows[1][5] == "2026-03-01T09:30:00"
+
+
+def test_since_is_inclusive():
+    rows = b"".join(export("ndjson", since=START + timedelta(hours=3))).decode().splitlines()
+    assert [json.loads(r)["id"] for r in rows] == ["c3", "c4"]
+
+
+def test_equal_timestamps_export_in_id_order():
+    async def run():
+        db = EmbeddedDatabase("impacts_export_test")
+        await db.contacts.insert_many([{"id": f"t{i}", "created_at": START} for i in (3, 1, 4, 0, 2)])
+        chunks = [chunk async for chunk in stream_export(db.contacts, ["id"], "created_at", START)]
+        return b"".join(chunks).decode()
+
+    rows = [json.loads(line)["id"] for line in asyncio.run(run()).splitlines()]
+    assert rows == ["t0", "t1", "t2", "t3", "t4"]
+
+
+def test_empty_export():
+    async def run():
+        db = EmbeddedDatabase("impacts_export_empty")
+        ndjson = [c async for c in stream_export(db.contacts, FIELDS, "created_at", None, "ndjson")]
+        csv_chunks = [c async for c in stream_export(db.contacts, FIELDS, "created_at", None, "csv")]
+        return ndjson, csv_chunks
+
+    ndjson, csv_chunks = asyncio.run(run())
+    assert ndjson == []
+    assert b"".join(csv_chunks) == (",".join(FIELDS) + "\n").encode()
+
+
+def test_export_routes(api):
+    async def scenario(client, server):
+        for i in range(3):
+            await client.post("/api/newsletter", json={"email": f"reader{i}@example.com"})
+        ndjson = await client.get("/api/newsletter/export")
+        as_csv = await client.get("/api/newsletter/export", params={"format": "csv"})
+        invalid = await client.get("/api/contact/export", params={"format": "xml"})
+        return ndjson, as_csv, invalid
+
+    ndjson, as_csv, invalid = api(scenario)
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    assert ndjson.headers["content-disposition"] == 'attachment; filename="newsletters.ndjson"'
+    # Posted back to back, so subscribed_at may tie; only the set is certain
+    assert sorted(json.loads(line)["email"] for line in ndjson.text.splitlines()) == [
+        "reader0@example.com", "reader1@example.com", "reader2@example.com"]
+    assert as_csv.headers["content-type"].startswith("text/csv")
+    assert as_csv.text.splitlines()[0] == "id,email,subscribed_at"
+    assert len(as_csv.text.splitlines()) == 4
+    assert invalid.status_code == 422
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from filters import contact_filter
+
+START = datetime(2026, 10, 1)
+# (service, budget, email, message) per hour from START
+ROWS = [
+    ("seo", "1k-3k", "ada@example.com", "Need an SEO audit before launch"),
+    ("meta", "3k-5k", "bob@example.com", "Meta ads for a new brand"),
+    ("seo", "3k-5k", "ada@example.com", "Growth marketing and content"),
+    ("social", None, "cy@example.com", "Social media launch plan"),
+    ("seo", "3k-5k", "dee@example.com", "Local SEO for three shops"),
+    ("all", "10k+", "bob@example.com", "Full audit of every channel"),
+]
+
+
+def contacts():
+    return [{"id": f"c{i}", "name": f"Lead {i}", "email": email, "phone": None, "service": service,
+             "budget": budget, "message": message, "created_at": START + timedelta(hours=i)}
+            for i, (service, budget, email, message) in enumerate(ROWS)]
+
+
+def listed(api, *queries: dict):
+    async def scenario(client, server):
+        await server.db.contacts.insert_many(contacts())
+        return [await client.get("/api/contact", params=params) for params in queries]
+
+    responses = api(scenario)
+    for response in responses:
+        assert response.status_code == 200, response.text
+    return [[c["id"] for c in response.json()] for response in responses]
+
+
+def test_contact_filter_builds_equality_range_and_text_clauses():
+    assert contact_filter() == {}
+    assert contact_filter("seo", "3k-5k", "a@example.com", START, START + timedelta(days=1), "audit") == {
+        "service": "seo", "budget": "3k-5k", "email": "a@example.com",
+        "created_at": {"$gte": START, "$lt": START + timedelta(days=1)}, "$text": {"$search": "audit"},
+    }
+    assert contact_filter(until=START) == {"created_at": {"$lt": START}}
+
+
+def test_each_filter_narrows_the_listing(api):
+    results = listed(
+        api,
+        {},
+        {"service": "seo"},
+        {"budget": "3k-5k"},
+        {"email": "bob@example.com"},
+        {"since": (START + timedelta(hours=2)).isoformat()},
+        {"until": (START + timedelta(hours=2)).isoformat()},
+        {"q": "audit"},
+    )
+    assert results == [
+        ["c5", "c4", "c3", "c2", "c1", "c0"],
+        ["c4", "c2", "c0"],
+        ["c4", "c2", "c1"],
+        ["c5", "c1"],
+        # since is inclusive, until exclusive
+        ["c5", "c4", "c3", "c2"],
+        ["c1", "c0"],
+        ["c5", "c0"],
+    ]
+
+
+def test_filters_combine_and_page(api):
+    results = listed(
+        api,
+        {"service": "seo", "budget": "3k-5k"},
+        {"service": "seo", "email": "ada@example.com", "until": (START + timedelta(hours=2)).isoformat()},
+        {"q": "launch", "service": "social"},
+        {"since": START.isoformat(), "until": (START + timedelta(hours=5)).isoformat(), "limit": 2},
+        {"service": "meta", "budget": "10k+"},
+    )
+    assert results == [["c4", "c2"], ["c0"], ["c3"], ["c4", "c3"], []]
+
+
+def test_invalid_filter_values_are_rejected(api):
+    async def scenario(client, server):
+        return [await client.get("/api/contact", params=params)
+                for params in ({"service": "print"}, {"budget": "lots"}, {"since": "yesterday"}, {"q": ""})]
+
+    assert [r.status_code for r in api(scenario)] == [422] * 4
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import uuid
+from typing import List, Tuple
+
+from embedded import EmbeddedDatabase
+from idempotency import IDEMPOTENCY_COLLECTION, IdempotencyMiddleware, IdempotencyStore
+from rate_limit import MemoryLimiter
+
+CONTACT = {"name": "Lead", "email": "lead@example.com", "service": "seo", "message": "Please get in touch about a campaign."}
+
+
+async def call(app, key: str, body: bytes, path: str = "/api/contact") -> Tuple[int, dict, bytes]:
+    sent: List[dict] = []
+    scope = {"type": "http", "method": "POST", "path": path, "headers": [(b"idempotency-key", key.encode())]}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def counting_handler(status: int = 201, delay: float = 0.0):
+    executions = []
+
+    async def handler(scope, receive, send):
+        body = (await receive())["body"]
+        executions.append(body)
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps({"id": str(uuid.uuid4())}).encode()})
+
+    return handler, executions
+
+
+def middleware(handler, db=None, **kwargs):
+    store = IdempotencyStore(db or EmbeddedDatabase("impacts_idempotency_test"))
+    return IdempotencyMiddleware(handler, store, ["/api/contact"], **kwargs)
+
+
+def test_replay_returns_the_stored_response():
+    handler, executions = counting_handler()
+    app = middleware(handler)
+
+    async def run():
+        return await call(app, "k1", b'{"n":1}'), await call(app, "k1", b'{"n":1}')
+
+    (status, headers, body), (replay_status, replay_headers, replay_body) = asyncio.run(run())
+    assert len(executions) == 1
+    assert (replay_status, replay_body) == (status, body) == (201, body)
+    assert b"idempotent-replayed" not in headers
+    assert replay_headers[b"idempotent-replayed"] == b"true"
+    assert app.store.outcomes == {"stored": 1, "replayed": 1}
+
+
+def test_replay_from_the_store_in_another_worker():
+    handler, executions = counting_handler()
+    db = EmbeddedDatabase("impacts_idempotency_test")
+    first, second = middleware(handler, db), middleware(handler, db)
+
+    async def run():
+        return await call(first, "k2", b'{"n":1}'), await call(second, "k2", b'{"n":1}')
+
+    original, replayed = asyncio.run(run())
+    assert len(executions) == 1
+    assert replayed[2] == original[2]
+    assert second.store.outcomes == {"replayed_from_store": 1}
+
+
+def test_reused_key_with_a_different_body_is_rejected():
+    handler, executions = counting_handler()
+    app = middleware(handler)
+
+    async def run():
+        await call(app, "k3", b'{"n":1}')
+        return await call(app, "k3", b'{"n":2}')
+
+    status, _, body = asyncio.run(run())
+    assert status == 422
+    assert "different request" in json.loads(body)["detail"]
+    assert len(executions) == 1
+
+
+def test_server_errors_are_not_stored():
+    handler, executions = counting_handler(status=503)
+    app = middleware(handler)
+
+    async def run():
+        return [(await call(app, "k4", b"{}"))[0] for _ in range(2)]
+
+    assert asyncio.run(run()) == [503, 503]
+    assert len(executions) == 2
+
+
+def test_parallel_replays_across_workers_run_the_handler_once():
+    handler, executions = counting_handler(delay=0.02)
+    db = EmbeddedDatabase("impacts_idempotency_test")
+    apps = [middleware(handler, db, wait=10, poll_interval=0.005) for _ in range(4)]
+
+    async def run():
+        return await asyncio.gather(*(call(apps[i % 4], "k5", b'{"n":1}') for i in range(100)))
+
+    answers = asyncio.run(run())
+    assert len(executions) == 1
+    assert len({(status, body) for status, _, body in answers}) == 1
+
+
+def test_contact_endpoint_stores_one_contact_per_key(api):
+    async def scenario(client, server):
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        responses = await asyncio.gather(*(client.post("/api/contact", json=CONTACT, headers=headers)
+                                           for _ in range(50)))
+        reused = await client.post("/api/contact", json={**CONTACT, "name": "Someone else"}, headers=headers)
+        stored = await server.db.contacts.count_documents({"email": CONTACT["email"]})
+        return responses, reused, stored
+
+    responses, reused, stored = api(scenario)
+    assert {r.status_code for r in responses} == {201}
+    assert len({r.content for r in responses}) == 1
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 49
+    assert reused.status_code == 422
+    assert stored == 1
+
+
+def test_requests_shed_by_the_ip_bucket_never_touch_the_store(api, monkeypatch):
+    writes = []
+
+    async def scenario(client, server):
+        # The suite runs with limiting off; give this worker a real per-IP bucket (20 per minute)
+        monkeypatch.setattr(server.limiter, "hit", MemoryLimiter().hit)
+        store = server.idempotency_store
+        for name in ("claim", "complete", "release"):
+            method = getattr(store, name)
+
+            async def spy(*args, _method=method, _name=name):
+                writes.append(_name)
+                return await _method(*args)
+
+            monkeypatch.setattr(store, name, spy)
+        responses = [await client.post("/api/contact", json={**CONTACT, "email": f"lead{i}@example.com"},
+                                       headers={"Idempotency-Key": uuid.uuid4().hex})
+                     for i in range(60)]
+        keys = await server.db[IDEMPOTENCY_COLLECTION].count_documents({})
+        return responses, keys
+
+    responses, keys = api(scenario)
+    statuses = [r.status_code for r in responses]
+    assert statuses == [201] * 20 + [429] * 40
+    assert writes == ["claim", "complete"] * 20
+    assert keys == 20
+
+
+def test_in_flight_retry_in_the_same_worker_waits_for_the_first_request():
+    handler, executions = counting_handler(delay=0.05)
+    app = middleware(handler)
+
+    async def run():
+        first = asyncio.ensure_future(call(app, "k6", b'{"n":1}'))
+        # Let the first request claim the key and reach the handler
+        await asyncio.sleep(0.01)
+        second = await call(app, "k6", b'{"n":1}')
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert len(executions) == 1
+    assert (second[0], second[2]) == (first[0], first[2])
+    assert second[1][b"idempotent-replayed"] == b"true"
+
+
+def test_in_flight_request_in_another_worker_gets_409_after_waiting():
+    handler, executions = counting_handler(delay=0.3)
+    db = EmbeddedDatabase("impacts_idempotency_test")
+    first, second = middleware(handler, db), middleware(handler, db, wait=0.05, poll_interval=0.01)
+
+    async def run():
+        running = asyncio.ensure_future(call(first, "k7", b'{"n":1}'))
+        await asyncio.sleep(0.02)
+        blocked = await call(second, "k7", b'{"n":1}')
+        await running
+        after = await call(second, "k7", b'{"n":1}')
+        return blocked, after
+
+    (status, headers, _), (after_status, after_headers, _) = asyncio.run(run())
+    assert status == 409
+    assert headers[b"retry-after"] == b"1"
+    assert after_status == 201 and after_headers[b"idempotent-replayed"] == b"true"
+    assert len(executions) == 1
+
+
+def test_oversized_bodies_are_refused_before_buffering():
+    handler, executions = counting_handler()
+    app = middleware(handler, max_body=1024)
+    received = []
+
+    async def post(headers, chunks):
+        sent = []
+        scope = {"type": "http", "method": "POST", "path": "/api/contact",
+                 "headers": [(b"idempotency-key", b"k8")] + headers}
+
+        async def receive():
+            chunk = chunks[len(received)]
+            received.append(chunk)
+            return {"type": "http.request", "body": chunk, "more_body": len(received) < len(chunks)}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+        return sent[0]["status"]
+
+    async def run():
+        declared = await post([(b"content-length", b"5000")], [b"x" * 5000])
+        read_before_declared = len(received)
+        received.clear()
+        streamed = await post([], [b"x" * 600, b"x" * 600, b"x" * 600])
+        return declared, read_before_declared, streamed, len(received)
+
+    declared, read_before_declared, streamed, streamed_chunks = asyncio.run(run())
+    assert (declared, read_before_declared) == (413, 0)
+    # Stops reading at the chunk that crosses the limit
+    assert (streamed, streamed_chunks) == (413, 2)
+    assert executions == []
@@ -0,0 +1,35 @@
+import asyncio
+
+import indexes
+from database import Database
+from embedded import EmbeddedDatabase
+from server import CONTACT_CODEC
+
+
+def plan_failures(db) -> list:
+    async def run():
+        await indexes.ensure_indexes(db)
+        return await indexes.verify_query_plans(db)
+
+    return asyncio.run(run())
+
+
+def test_every_route_query_uses_an_index():
+    assert plan_failures(EmbeddedDatabase("impacts_plan_test")) == []
+
+
+def test_every_route_query_uses_an_index_in_the_compact_layout():
+    # Wrapped like the app does with CONTACT_STORAGE=compact, so indexes and plans use the compact field names
+    database = Database()
+    database.store_compact("contacts", CONTACT_CODEC)
+    database.use(EmbeddedDatabase("impacts_plan_test"))
+    assert plan_failures(database) == []
+
+
+def test_a_missing_index_is_reported(monkeypatch):
+    declared = {**indexes.INDEXES, "newsletters": [m for m in indexes.INDEXES["newsletters"]
+                                                   if m.document["name"] != "subscribed_at_id"]}
+    monkeypatch.setattr(indexes, "INDEXES", declared)
+    failures = plan_failures(EmbeddedDatabase("impacts_plan_test"))
+    assert failures
+    assert all(f.startswith(("GET /api/newsletter", "POST /api/newsletter")) and "COLLSCAN" in f for f in failures)
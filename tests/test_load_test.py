@@ -0,0 +1,20 @@
+import importlib.util
+from pathlib import Path
+
+LOAD_TEST = Path(__file__).resolve().parent.parent / "backend" / "benchmarks" / "load_test.py"
+
+
+def load_test_module():
+    spec = importlib.util.spec_from_file_location("load_test", LOAD_TEST)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_every_api_route_has_a_load_scenario():
+    import server
+
+    load_test = load_test_module()
+    factories = load_test.scenarios(load_test.Dataset())
+    missing = [route for route in load_test.api_routes(server.api_router) if route not in factories]
+    assert missing == []
@@ -0,0 +1,24 @@
+import asyncio
+import threading
+import time
+
+import loop_monitor
+from loop_monitor import LoopMonitor
+
+
+def test_stall_is_counted_on_the_loop_thread(monkeypatch, caplog):
+    increments = []
+    monkeypatch.setattr(loop_monitor.LOOP_BLOCKED, "inc", lambda *a, **k: increments.append(threading.get_ident()))
+
+    async def run():
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        time.sleep(0.3)  # hold the loop
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert increments == [loop_thread]
+    assert "time.sleep(0.3)" in caplog.text
@@ -0,0 +1,41 @@
+import asyncio
+from collections import Counter
+
+PARALLEL = 300
+
+
+def test_parallel_duplicate_subscribes_store_one_document(api):
+    async def scenario(client, server):
+        responses = await asyncio.gather(*(
+            client.post("/api/newsletter", json={"email": "race@example.com"}) for _ in range(PARALLEL)))
+        stored = await server.db.newsletters.count_documents({"email": "race@example.com"})
+        return Counter(r.status_code for r in responses), stored
+
+    statuses, stored = api(scenario)
+    assert statuses == {201: 1, 409: PARALLEL - 1}
+    assert stored == 1
+
+
+def test_parallel_subscribes_for_several_emails_store_one_each(api):
+    emails = [f"reader{i}@example.com" for i in range(10)]
+
+    async def scenario(client, server):
+        responses = await asyncio.gather(*(
+            client.post("/api/newsletter", json={"email": emails[i % len(emails)]}) for i in range(PARALLEL)))
+        stored = {email: await server.db.newsletters.count_documents({"email": email}) for email in emails}
+        return Counter(r.status_code for r in responses), stored
+
+    statuses, stored = api(scenario)
+    assert statuses == {201: len(emails), 409: PARALLEL - len(emails)}
+    assert set(stored.values()) == {1}
+
+
+def test_subscribe_again_after_unsubscribe(api):
+    async def scenario(client, server):
+        first = await client.post("/api/newsletter", json={"email": "back@example.com"})
+        again = await client.post("/api/newsletter", json={"email": "back@example.com"})
+        await client.delete("/api/newsletter/back@example.com")
+        resubscribed = await client.post("/api/newsletter", json={"email": "back@example.com"})
+        return first.status_code, again.status_code, resubscribed.status_code
+
+    assert api(scenario) == (201, 409, 201)
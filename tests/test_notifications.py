@@ -0,0 +1,137 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import httpx
+
+from embedded import EmbeddedDatabase
+from notifications import OUTBOX_COLLECTION, OutboxDispatcher, WebhookNotifier, outbox_event
+
+
+class Webhook:
+    """``httpx.MockTransport`` stand-in; ``answer(n)`` gives the status of the n-th request (from 1)."""
+
+    def __init__(self, answer: Callable[[int], int]):
+        self.answer = answer
+        self.requests = 0
+        self.received: List[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        status = self.answer(self.requests)
+        if status < 400:
+            self.received += [event["id"] for event in json.loads(request.content)["events"]]
+        return httpx.Response(status)
+
+    def notifier(self) -> WebhookNotifier:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        return WebhookNotifier("http://hook.test/events", client=client)
+
+
+def dispatcher(outbox, webhook: Webhook, **kwargs) -> OutboxDispatcher:
+    # No backoff, so a retried batch is due again at once
+    options = {"batch_size": 10, "concurrency": 2, "poll_interval": 0.01, "backoff": 0.0, **kwargs}
+    return OutboxDispatcher(outbox, webhook.notifier(), **options)
+
+
+async def settled(outbox, count: int, timeout: float = 5.0) -> List[dict]:
+    """Wait until ``count`` events are sent or dead."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        docs = await outbox.find({"status": {"$in": ["sent", "dead"]}}).to_list(None)
+        if len(docs) >= count or asyncio.get_running_loop().time() > deadline:
+            return docs
+        await asyncio.sleep(0.01)
+
+
+def events(count: int) -> List[dict]:
+    return [outbox_event("contact.created", {"email": f"lead{i}@example.com"}) for i in range(count)]
+
+
+def test_transient_failure_is_retried_and_delivered_once():
+    webhook = Webhook(lambda n: 503 if n == 1 else 204)
+
+    async def run():
+        outbox = EmbeddedDatabase("impacts_outbox_test")[OUTBOX_COLLECTION]
+        await outbox.insert_many(events(5))
+        worker = dispatcher(outbox, webhook)
+        worker.start()
+        docs = await settled(outbox, 5)
+        await worker.close()
+        return docs, worker
+
+    docs, worker = asyncio.run(run())
+    assert [d["status"] for d in docs] == ["sent"] * 5
+    assert {d["attempts"] for d in docs} == {2}
+    assert all(d["error"] == "webhook answered 503" for d in docs)
+    assert sorted(webhook.received) == sorted(d["_id"] for d in docs)
+    assert (worker.delivered, worker.failed) == (5, 0)
+
+
+def test_exhausted_retries_are_dead_lettered():
+    webhook = Webhook(lambda n: 503)
+
+    async def run():
+        outbox = EmbeddedDatabase("impacts_outbox_test")[OUTBOX_COLLECTION]
+        await outbox.insert_many(events(3))
+        worker = dispatcher(outbox, webhook, max_attempts=3)
+        worker.start()
+        docs = await settled(outbox, 3)
+        await worker.close()
+        return docs, worker
+
+    docs, worker = asyncio.run(run())
+    assert [d["status"] for d in docs] == ["dead"] * 3
+    assert {d["attempts"] for d in docs} == {3}
+    assert all(d["expire_at"] > datetime.utcnow() for d in docs)
+    assert webhook.requests == 3
+    assert webhook.received == []
+    assert (worker.delivered, worker.failed) == (0, 3)
+
+
+def test_client_errors_are_dead_lettered_without_retrying():
+    webhook = Webhook(lambda n: 400)
+
+    async def run():
+        outbox = EmbeddedDatabase("impacts_outbox_test")[OUTBOX_COLLECTION]
+        await outbox.insert_many(events(2))
+        worker = dispatcher(outbox, webhook)
+        worker.start()
+        docs = await settled(outbox, 2)
+        await worker.close()
+        return docs
+
+    docs = asyncio.run(run())
+    assert [(d["status"], d["attempts"]) for d in docs] == [("dead", 1)] * 2
+    assert webhook.requests == 1
+
+
+def test_expired_lease_is_reclaimed_and_sent_once():
+    webhook = Webhook(lambda n: 204)
+
+    async def run():
+        outbox = EmbeddedDatabase("impacts_outbox_test")[OUTBOX_COLLECTION]
+        now = datetime.utcnow()
+        # Claimed by a worker that died mid-delivery, and by one still within its lease
+        abandoned = [{**e, "status": "sending", "claim": "dead-worker", "lease_until": now - timedelta(seconds=1)}
+                     for e in events(6)]
+        leased = [{**e, "status": "sending", "claim": "live-worker", "lease_until": now + timedelta(minutes=5)}
+                  for e in events(2)]
+        await outbox.insert_many(abandoned + leased)
+        # Two workers share the outbox and race for the abandoned events
+        workers = [dispatcher(outbox, webhook, batch_size=2) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        docs = await settled(outbox, 6)
+        await asyncio.sleep(0.05)
+        for worker in workers:
+            await worker.close()
+        still_leased = await outbox.count_documents({"claim": "live-worker", "status": "sending"})
+        return abandoned, docs, still_leased
+
+    abandoned, docs, still_leased = asyncio.run(run())
+    assert sorted(webhook.received) == sorted(e["_id"] for e in abandoned)
+    assert len(webhook.received) == len(set(webhook.received))
+    assert [d["status"] for d in docs] == ["sent"] * 6
+    assert still_leased == 2
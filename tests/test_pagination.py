@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime, timedelta
+
+START = datetime(2026, 1, 1)
+
+
+def contacts(count: int):
+    # Pairs share a timestamp, so pages have to break ties on id
+    return [{"id": str(uuid.uuid4()), "name": f"Lead {i}", "email": f"lead{i}@example.com", "phone": None,
+             "service": "seo", "budget": None, "message": "Please call me back.",
+             "created_at": START + timedelta(minutes=i // 2)} for i in range(count)]
+
+
+def test_without_limit_the_list_returns_up_to_1000_rows(api):
+    async def scenario(client, server):
+        await server.db.contacts.insert_many(contacts(1005))
+        return await client.get("/api/contact")
+
+    response = api(scenario)
+    assert response.status_code == 200
+    assert len(response.json()) == 1000
+    assert "x-next-cursor" in response.headers
+
+
+def test_cursor_pages_cover_every_row_once_newest_first(api):
+    docs = contacts(25)
+
+    async def scenario(client, server):
+        await server.db.contacts.insert_many([dict(d) for d in docs])
+        pages, params = [], {"limit": 10}
+        while True:
+            response = await client.get("/api/contact", params=params)
+            pages.append(response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                return pages
+            params = {"limit": 10, "after": cursor}
+
+    pages = api(scenario)
+    assert [len(p) for p in pages] == [10, 10, 5]
+    rows = [row for page in pages for row in page]
+    expected = sorted(docs, key=lambda d: (d["created_at"], d["id"]), reverse=True)
+    assert [r["id"] for r in rows] == [d["id"] for d in expected]
+
+
+def test_invalid_cursor_is_a_400(api):
+    async def scenario(client, server):
+        return await client.get("/api/contact", params={"after": "not-a-cursor"})
+
+    assert api(scenario).status_code == 400
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from rate_limit import Guard, MemoryLimiter, RateLimitMiddleware
+
+PAYLOAD = {"name": "Lead", "email": "lead@example.com", "service": "seo", "message": "Please call me back."}
+
+
+def make_app(statuses):
+    """ASGI app answering each request with the next status from ``statuses``."""
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append((await receive())["body"])
+        await send({"type": "http.response.start", "status": statuses[len(calls) - 1], "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app, calls
+
+
+async def post(app, payload) -> int:
+    sent = []
+    scope = {"type": "http", "method": "POST", "path": "/api/contact", "headers": [], "client": ("10.0.0.1", 1)}
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(payload).encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+def guarded(app):
+    return RateLimitMiddleware(app, MemoryLimiter(), [Guard("/api/contact", duplicate_window=600)])
+
+
+def test_duplicate_of_stored_submission_is_rejected():
+    app, calls = make_app([201, 201])
+    middleware = guarded(app)
+
+    async def run():
+        return [await post(middleware, PAYLOAD), await post(middleware, PAYLOAD)]
+
+    assert asyncio.run(run()) == [201, 409]
+    assert len(calls) == 1
+
+
+def test_failed_submission_can_be_retried():
+    app, calls = make_app([500, 422, 201, 201])
+    middleware = guarded(app)
+
+    async def run():
+        return [await post(middleware, PAYLOAD) for _ in range(4)]
+
+    assert asyncio.run(run()) == [500, 422, 201, 409]
+    assert len(calls) == 3
+
+
+def test_submission_is_forgotten_when_the_app_raises():
+    attempts = []
+
+    async def failing(scope, receive, send):
+        attempts.append(await receive())
+        if len(attempts) == 1:
+            raise RuntimeError("database down")
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = guarded(failing)
+
+    async def run():
+        try:
+            await post(middleware, PAYLOAD)
+        except RuntimeError:
+            pass
+        return await post(middleware, PAYLOAD)
+
+    assert asyncio.run(run()) == 201
@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta
+
+
+def contact(created_at: datetime, service: str = "seo", budget=None) -> dict:
+    return {"id": str(uuid.uuid4()), "name": "Lead", "email": "lead@example.com", "phone": None,
+            "service": service, "budget": budget, "message": "Please call me back.", "created_at": created_at}
+
+
+def test_stats_accepts_z_suffixed_bounds(api):
+    async def scenario(client, server):
+        await server.db.contacts.insert_many([
+            contact(datetime(2026, 9, 30, 23, 59)),
+            contact(datetime(2026, 10, 1, 8), "meta", "1k-3k"),
+            contact(datetime(2026, 10, 2, 17)),
+            contact(datetime(2026, 10, 3)),
+        ])
+        aware = await client.get("/api/contact/stats", params={
+            "since": "2026-10-01T00:00:00Z", "until": "2026-10-03T00:00:00Z"})
+        naive = await client.get("/api/contact/stats", params={
+            "since": "2026-10-01T00:00:00", "until": "2026-10-03T00:00:00"})
+        return aware, naive
+
+    aware, naive = api(scenario)
+    assert aware.status_code == 200, aware.text
+    body = aware.json()
+    assert body["total"] == 2
+    assert body["by_service"] == {"meta": 1, "seo": 1}
+    assert [b["count"] for b in body["buckets"]] == [1, 1]
+    assert body == naive.json()
+
+
+def test_stats_converts_offset_bounds_to_utc(api):
+    async def scenario(client, server):
+        await server.db.contacts.insert_many([contact(datetime(2026, 10, 1, 22, 30))])
+        # Midnight on 2 October in UTC+2 is 22:00 on 1 October UTC
+        return await client.get("/api/contact/stats", params={
+            "since": "2026-10-02T00:00:00+02:00", "until": "2026-10-02T00:00:00Z", "bucket": "day"})
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    assert response.json()["since"].startswith("2026-10-01T00:00:00")
+    assert response.json()["total"] == 1
+
+
+def test_stats_rejects_too_wide_window(api):
+    async def scenario(client, server):
+        until = datetime(2026, 10, 1)
+        return await client.get("/api/contact/stats", params={
+            "since": (until - timedelta(days=2000)).isoformat() + "Z", "until": until.isoformat() + "Z"})
+
+    assert api(scenario).status_code == 400
+
+
+def test_stats_read_racing_a_delete_does_not_keep_old_counts(monkeypatch):
+    import asyncio
+
+    import stats
+    from embedded import EmbeddedDatabase
+
+    now = datetime(2026, 10, 10)
+    aggregate = stats.aggregate_buckets
+    aggregated, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_aggregate(*args, **kwargs):
+        counts = await aggregate(*args, **kwargs)
+        aggregated.set()
+        await release.wait()
+        return counts
+
+    async def totals(db):
+        result = await stats.contact_stats(db, datetime(2026, 10, 1), datetime(2026, 10, 2), "day", now=now)
+        return result.total
+
+    async def run():
+        db = EmbeddedDatabase("impacts_stats_race")
+        docs = [contact(datetime(2026, 10, 1, hour)) for hour in (8, 9, 10)]
+        await db.contacts.insert_many(docs)
+        monkeypatch.setattr(stats, "aggregate_buckets", slow_aggregate)
+        racing = asyncio.ensure_future(totals(db))
+        await aggregated.wait()
+        # The delete lands after the read aggregated but before it materialises its buckets
+        await db.contacts.delete_one({"id": docs[0]["id"]})
+        await stats.invalidate_stats(db)
+        release.set()
+        stale = await racing
+        monkeypatch.setattr(stats, "aggregate_buckets", aggregate)
+        return stale, await totals(db), await totals(db)
+
+    stale, fresh, materialised = asyncio.run(run())
+    assert stale == 3
+    assert fresh == materialised == 2
+
+
+def test_flushed_contacts_only_invalidate_closed_days(monkeypatch):
+    import asyncio
+
+    import stats
+    from embedded import EmbeddedDatabase
+
+    now = datetime(2026, 10, 10, 12)
+
+    async def run():
+        db = EmbeddedDatabase("impacts_stats_flush")
+        await db.contacts.insert_many([contact(datetime(2026, 10, 1))])
+        await stats.contact_stats(db, datetime(2026, 10, 1), datetime(2026, 10, 2), "day", now=now)
+        await stats.invalidate_stats(db, since=datetime(2026, 10, 10, 0, 5), now=now)
+        kept = await db[stats.STATS_COLLECTION].count_documents({"unit": "day"})
+        await stats.invalidate_stats(db, since=datetime(2026, 10, 9, 23, 59), now=now)
+        dropped = await db[stats.STATS_COLLECTION].count_documents({"unit": "day"})
+        return kept, dropped
+
+    assert asyncio.run(run()) == (1, 0)
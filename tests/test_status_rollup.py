@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import status_rollup
+from status_rollup import BUCKETS_COLLECTION, CLIENTS_COLLECTION, DEFAULT_HISTORY_WINDOW, rollup, status_history
+
+START = datetime(2026, 10, 1, 12)
+
+
+def pings(client_name: str, count: int):
+    return [{"id": f"{client_name}-{i}", "client_name": client_name, "timestamp": START + timedelta(seconds=20 * i)}
+            for i in range(count)]
+
+
+def test_history_accepts_z_suffixed_bounds(api):
+    async def scenario(client, server):
+        buckets, _ = rollup(pings("web-1", 9), timedelta(days=30))
+        await server.db[BUCKETS_COLLECTION].insert_many(buckets)
+        params = {"client_name": "web-1", "resolution": "hour"}
+        aware = await client.get("/api/status/history", params={
+            **params, "since": "2026-10-01T12:00:00Z", "until": "2026-10-01T14:00:00Z"})
+        offset = await client.get("/api/status/history", params={
+            **params, "since": "2026-10-01T14:00:00+02:00", "until": "2026-10-01T16:00:00+02:00"})
+        naive = await client.get("/api/status/history", params={
+            **params, "since": "2026-10-01T12:00:00", "until": "2026-10-01T14:00:00"})
+        return aware, offset, naive
+
+    aware, offset, naive = api(scenario)
+    assert aware.status_code == 200, aware.text
+    assert aware.json()["total"] == 9
+    assert [p["count"] for p in aware.json()["points"]] == [9]
+    assert aware.json() == offset.json() == naive.json()
+
+
+def test_history_minute_points(api):
+    async def scenario(client, server):
+        buckets, _ = rollup(pings("web-2", 7), timedelta(days=30))
+        await server.db[BUCKETS_COLLECTION].insert_many(buckets)
+        return await client.get("/api/status/history", params={
+            "client_name": "web-2", "since": "2026-10-01T12:00:00Z", "until": "2026-10-01T12:05:00Z"})
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    # Three pings a minute, 20 seconds apart
+    assert [p["count"] for p in response.json()["points"]] == [3, 3, 1]
+
+
+def test_history_default_window_off_a_minute_boundary(api):
+    async def scenario(client, server):
+        now = datetime.utcnow()
+        recent = [{"id": f"web-3-{i}", "client_name": "web-3", "timestamp": now - timedelta(minutes=i)}
+                  for i in range(3)]
+        buckets, _ = rollup(recent, timedelta(days=30))
+        await server.db[BUCKETS_COLLECTION].insert_many(buckets)
+        routed = await client.get("/api/status/history", params={"client_name": "web-3"})
+        # The route reads the clock itself; pin one off the minute to cover the rounding every time
+        pinned = await status_history(server.db, "web-3", None, None, "minute", now=START + timedelta(seconds=30))
+        return routed, pinned
+
+    routed, pinned = api(scenario)
+    assert routed.status_code == 200, routed.text
+    assert routed.json()["total"] == 3
+    assert pinned.until == START + timedelta(minutes=1)
+    assert pinned.since == pinned.until - DEFAULT_HISTORY_WINDOW
+
+
+def test_latest_statuses_keeps_the_most_recent_clients(api, monkeypatch):
+    monkeypatch.setattr(status_rollup, "MAX_CLIENTS", 3)
+
+    async def scenario(client, server):
+        _, clients = rollup([{"id": f"c-{i}", "client_name": f"client-{i}", "timestamp": START + timedelta(minutes=i)}
+                             for i in range(5)], timedelta(days=30))
+        await server.db[CLIENTS_COLLECTION].insert_many(clients)
+        return await client.get("/api/status")
+
+    response = api(scenario)
+    assert response.status_code == 200, response.text
+    assert [s["client_name"] for s in response.json()] == ["client-2", "client-3", "client-4"]
+
+
+def test_latest_statuses_order_clients_pinging_together_by_name(api):
+    async def scenario(client, server):
+        _, clients = rollup([{"id": f"t-{name}", "client_name": name, "timestamp": START} for name in "cab"],
+                            timedelta(days=30))
+        await server.db[CLIENTS_COLLECTION].insert_many(clients)
+        return await client.get("/api/status")
+
+    response = api(scenario)
+    assert [s["client_name"] for s in response.json()] == ["a", "b", "c"]
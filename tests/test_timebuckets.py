@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta, timezone
+
+from timebuckets import as_utc, bucket_start
+
+DAY = timedelta(days=1)
+WEEK = timedelta(weeks=1)
+
+
+def test_as_utc_converts_aware_values_and_keeps_naive_ones():
+    assert as_utc(datetime(2026, 10, 1, tzinfo=timezone.utc)) == datetime(2026, 10, 1)
+    assert as_utc(datetime(2026, 10, 1, 2, tzinfo=timezone(timedelta(hours=2)))) == datetime(2026, 10, 1)
+    assert as_utc(datetime(2026, 10, 1, 12)) == datetime(2026, 10, 1, 12)
+    assert as_utc(None) is None
+
+
+def test_aware_and_naive_bounds_land_in_the_same_bucket():
+    aware = datetime.fromisoformat("2026-10-01T13:45:00+00:00")
+    assert bucket_start(aware, DAY) == bucket_start(datetime(2026, 10, 1, 13, 45), DAY) == datetime(2026, 10, 1)
+    assert bucket_start(aware, timedelta(hours=1)) == datetime(2026, 10, 1, 13)
+
+
+def test_weeks_start_on_monday():
+    # 2026-10-01 is a Thursday
+    assert bucket_start(datetime(2026, 10, 1, 9), WEEK) == datetime(2026, 9, 28)
+    assert bucket_start(datetime(2026, 9, 28), WEEK) == datetime(2026, 9, 28)
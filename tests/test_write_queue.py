@@ -0,0 +1,90 @@
+import asyncio
+
+from write_queue import WriteBehindQueue
+
+
+class Collection:
+    """Records insert_many batches; raises ``error`` instead when one is set."""
+
+    name = "contacts"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(documents)
+
+
+def test_waiting_producers_get_any_flush_error():
+    async def run():
+        queue = WriteBehindQueue(Collection(error=RuntimeError("encoder failed")), flush_interval_ms=1)
+        queue.start()
+        results = await asyncio.wait_for(
+            asyncio.gather(*(queue.put({"n": i}) for i in range(3)), return_exceptions=True), timeout=2)
+        await queue.close()
+        return results
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError] * 3
+
+
+def test_on_flush_runs_with_the_written_documents_before_acks():
+    flushed = []
+
+    async def on_flush(documents):
+        flushed.append([doc["n"] for doc in documents])
+
+    async def run():
+        collection = Collection()
+        queue = WriteBehindQueue(collection, max_batch=2, flush_interval_ms=1, on_flush=on_flush)
+        queue.start()
+        await asyncio.gather(*(queue.put({"n": i}) for i in range(3)))
+        seen_at_ack = list(flushed)
+        await queue.close()
+        return collection, seen_at_ack
+
+    collection, seen_at_ack = asyncio.run(run())
+    assert [[d["n"] for d in batch] for batch in collection.batches] == [[0, 1], [2]]
+    assert seen_at_ack == flushed == [[0, 1], [2]]
+
+
+def test_on_flush_is_skipped_when_nothing_was_written():
+    calls = []
+
+    async def on_flush(documents):
+        calls.append(documents)
+
+    async def run():
+        queue = WriteBehindQueue(Collection(error=RuntimeError("down")), flush_interval_ms=1,
+                                 ack_on_flush=False, on_flush=on_flush)
+        queue.start()
+        await queue.put({"n": 1})
+        await queue.close()
+
+    asyncio.run(run())
+    assert calls == []
+
+
+def test_enqueue_ack_does_not_leave_a_stale_cached_list(api, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "WRITE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(server, "WRITE_QUEUE_ACK", "enqueue")
+    monkeypatch.setattr(server, "WRITE_QUEUE_FLUSH_MS", 20)
+
+    async def scenario(client, server):
+        assert (await client.get("/api/contact")).json() == []
+        for i in range(3):
+            response = await client.post("/api/contact", json={
+                "name": f"Lead {i}", "email": f"lead{i}@example.com", "service": "seo",
+                "message": "Please call me back about SEO."})
+            assert response.status_code == 201
+        # Read inside the flush window: may still be the old page, and caches it
+        await client.get("/api/contact")
+        await asyncio.sleep(0.2)
+        return (await client.get("/api/contact")).json()
+
+    assert len(api(scenario)) == 3